@@ -1,19 +1,46 @@
 import os
 import uuid
+import logging
 import tempfile
 import base64
 import modules.email_module as email_module
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session
 from modules.agent_orchestrator import run_agent
 from modules.groq import GroqAgent
 from modules.hf_agent import HFAgent
+from modules.conversation_module import conversation_window
+from modules.prewarm import start_prewarm, is_ready, get_prewarm_status
+from modules.draft_store import draft_store
+from modules.session_context import get_session_key
+from modules.translation_module import translation_jobs
+from modules.payloads import is_payload, payload_summary
+from modules.llm_failover import llm_failover
+from modules.speculative_drafts import speculative_drafts
+from modules.mail_mirror import mail_mirror, start_sync_worker
+from modules.outbox import outbox, start_outbox_worker
+from modules.tracing import span, start_request_trace, get_request_spans, server_timing_header, render_metrics
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+
 app = Flask(__name__)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your-secret-key-here')
 
+def start_background_workers():
+    start_prewarm()
+    start_sync_worker()
+    start_outbox_worker()
+
+# `python flaskapp.py` runs the debug reloader: this file is executed again in a child process
+# (WERKZEUG_RUN_MAIN=true) that does the serving, so the watching parent must not load models or start workers
+if __name__ != '__main__' or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    start_background_workers()
+
 @app.route('/')
 def index():
     if 'session_id' not in session:
@@ -22,13 +49,36 @@ def index():
         session['history'] = []
     if 'dark_mode' not in session:
         session['dark_mode'] = True
-    if 'email_draft' not in session:
-        session['email_draft'] = None
     if 'email_details' not in session:
         session['email_details'] = None
     session['provider'] = 'Groq'  # <-- default provider
     return render_template('index2.html')
 
+@app.before_request
+def begin_trace():
+    start_request_trace()
+
+@app.after_request
+def add_server_timing(response):
+    if request.path == '/send_message':
+        timing = server_timing_header(get_request_spans())
+        if timing:
+            response.headers['Server-Timing'] = timing
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    status = get_prewarm_status()
+    status['providers'] = llm_failover.snapshot()
+    status['speculative_drafts'] = speculative_drafts.stats()
+    status['mail_mirror'] = mail_mirror.status()
+    status['outbox'] = outbox.stats()
+    return jsonify(status), (200 if is_ready() else 503)
+
 @app.route('/toggle_theme', methods=['POST'])
 def toggle_theme():
     session['dark_mode'] = not session.get('dark_mode', True)
@@ -98,7 +148,8 @@ def send_message():
     ]
     if any(kw in user_input.lower() for kw in exit_keywords):
         session['history'] = []
-        session['email_draft'] = None
+        conversation_window.reset(get_session_key())
+        draft_store.delete(get_session_key())
         session['email_details'] = None
         return jsonify({
             'reset': True,
@@ -116,7 +167,6 @@ def send_message():
     session['history'].append(('You', display_input))
 
     import modules.email_module as email_module
-    email_module.current_draft = session.get('email_draft')
     email_module.current_email_details = session.get('email_details')
 
     # Pass only metadata and path to the agent
@@ -128,10 +178,15 @@ def send_message():
         agent_name = "groq_worker"
 
     try:
-        agent_response = run_agent(agent_name, user_input, suppress_output=True)
+        with span("agent"):
+            agent_response = run_agent(agent_name, user_input, suppress_output=True)
+        # Structured results are rendered by the browser; the cookie history keeps a short text summary
+        payload = None
+        if is_payload(agent_response):
+            payload = agent_response
+            agent_response = payload_summary(payload)
         session['history'].append(('Agent', agent_response))
 
-        session['email_draft'] = email_module.current_draft
         session['email_details'] = email_module.current_email_details
 
         # Clean up attachments from session after processing
@@ -148,9 +203,12 @@ def send_message():
             'response': agent_response,
             'history': session['history']
         }
+        if payload:
+            response_data['payload'] = payload
 
-        if session.get('email_draft'):
-            response_data['email_draft'] = session['email_draft']
+        email_draft = email_module.get_current_draft()
+        if email_draft:
+            response_data['email_draft'] = email_draft
         elif session.get('email_details'):
             response_data['email_details'] = session['email_details']
 
@@ -163,6 +221,15 @@ def send_message():
             'history': session['history']
         })
 
+@app.route('/translation_job/<job_id>', methods=['GET'])
+def translation_job(job_id):
+    """Batch translation results finished since the client's last poll"""
+    since = request.args.get('since', 0, type=int)
+    status = translation_jobs.poll(get_session_key(), job_id, since)
+    if status is None:
+        return jsonify({'error': 'Unknown translation job'}), 404
+    return jsonify(status)
+
 @app.route('/get_history', methods=['GET'])
 def get_history():
     return jsonify({'history': session.get('history', [])})
@@ -170,20 +237,28 @@ def get_history():
 @app.route('/reset_chat', methods=['POST'])
 def reset_chat():
     session['history'] = []
-    session['email_draft'] = None
+    conversation_window.reset(get_session_key())
+    draft_store.delete(get_session_key())
     session['email_details'] = None
     import modules.email_module as email_module
-    email_module.current_draft = None
     email_module.current_email_details = None
     return jsonify({'message': 'Chat reset successfully'})
 
 @app.route('/get_email_status', methods=['GET'])
 def get_email_status():
-    draft = session.get('email_draft')
+    session_key = get_session_key()
+    outbox_id = request.args.get('outbox_id')
+    if outbox_id:
+        entry = outbox.get(session_key, outbox_id)
+        if entry is None:
+            return jsonify({'error': 'Unknown outbox entry'}), 404
+        return jsonify(entry)
+    draft = draft_store.get(session_key)
     details = session.get('email_details')
     status = {
         'has_draft': draft is not None,
-        'has_email_selected': details is not None
+        'has_email_selected': details is not None,
+        'outbox': outbox.list_entries(session_key)
     }
     if draft:
         status['draft'] = {
@@ -1,20 +1,27 @@
 # main.py (only for CLI testing, for UI run "python flaskapp.py" in terminal)
 
-from modules.agent_orchestrator import run_agent
+import os
+import logging
 from modules.groq import GroqAgent
+from modules.prewarm import start_prewarm
+from modules.mail_mirror import start_sync_worker
+from modules.outbox import start_outbox_worker
+from modules.payloads import render_text
 import modules.email_module as email_module
 
-def warm_up_llm(agent_name):
-    try:
-        run_agent(agent_name, "Hello! (warm-up)", suppress_output=True)
-    except Exception as e:
-        print(f"Warm-up failed: {e}")
+logging.basicConfig(
+    level=os.getenv('LOG_LEVEL', 'WARNING').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
 
 def main():
     print("💼 LLM Knowledge Worker Initialized.")
     agent_name = "memory_worker"
 
-    warm_up_llm(agent_name)  
+    # Warm models and connections in the background so the prompt shows up immediately
+    start_prewarm()
+    start_sync_worker()
+    start_outbox_worker()
 
     # Create a persistent agent instance
     agent = GroqAgent(agent_name="memory_worker")
@@ -32,7 +39,7 @@ def main():
             print("\n📤 Response:")
             
             response = agent.run(user_input)
-            print(response)
+            print(render_text(response))
             
         except Exception as e:
             print(f"❌ Error: {e}")
@@ -1,8 +1,11 @@
 # modules/agent_orchestrator.py
 
+from typing import Union
+from modules.payloads import render_text
+
 _agent_instances = {}
 
-def run_agent(agent_name: str, user_input: str, suppress_output: bool = False) -> str:
+def run_agent(agent_name: str, user_input: str, suppress_output: bool = False) -> Union[str, dict]:
     global _agent_instances
     
     # Reuse existing agent instance to maintain state
@@ -26,7 +29,7 @@ def run_agent(agent_name: str, user_input: str, suppress_output: bool = False) -
     try:
         response = agent.run(user_input)
         if not suppress_output:
-            print(response)
+            print(render_text(response))
         return response
     except Exception as e:
         error_msg = f"❌ Error: {e}"
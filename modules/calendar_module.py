@@ -1,15 +1,12 @@
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
 from datetime import datetime, timedelta
-import dateparser
-import pytz  
-
-SCOPES = ['https://www.googleapis.com/auth/calendar.events',
-          'https://www.googleapis.com/auth/calendar.readonly']
+import pytz
+from modules.tracing import traced
+from modules.temporal_parser import parse_datetime
+from modules.google_services import google_services, get_calendar_service, paginate
 
+@traced("calendar.create_event")
 def create_event(summary, start_time, attendees=None):
-    creds = Credentials.from_authorized_user_file('credentials/token.json', SCOPES)
-    service = build('calendar', 'v3', credentials=creds)
+    service = get_calendar_service()
 
     # Convert start_time (ISO string) to IST
     dt_utc = datetime.fromisoformat(start_time)
@@ -49,7 +46,7 @@ def create_event(summary, start_time, attendees=None):
 
 
 def create_event_nlp(summary, natural_date):
-    dt = dateparser.parse(natural_date)
+    dt = parse_datetime(natural_date)
     if not dt:
         return {
             'status': 'error',
@@ -59,20 +56,18 @@ def create_event_nlp(summary, natural_date):
     return create_event(summary, dt.strftime("%Y-%m-%d"), dt.strftime("%H:%M"))
 
 
+@traced("calendar.list_upcoming_events")
 def list_upcoming_events(max_results=5):
-    creds = Credentials.from_authorized_user_file('credentials/token.json', SCOPES)
-    service = build('calendar', 'v3', credentials=creds)
+    service = get_calendar_service()
 
     now = datetime.utcnow().isoformat() + 'Z' 
-    events_result = service.events().list(
+    events = list(paginate(
+        service.events().list, 'items', limit=max_results,
         calendarId='primary',
         timeMin=now,
-        maxResults=max_results,
         singleEvents=True,
         orderBy='startTime'
-    ).execute()
-
-    events = events_result.get('items', [])
+    ))
     if not events:
         return {
             'status': 'success',
@@ -108,9 +103,9 @@ def list_upcoming_events(max_results=5):
         'data': formatted_events
     }
 
+@traced("calendar.delete_event")
 def delete_event(event_id):
-    creds = Credentials.from_authorized_user_file('credentials/token.json', SCOPES)
-    service = build('calendar', 'v3', credentials=creds)
+    service = get_calendar_service()
     try:
         service.events().delete(calendarId='primary', eventId=event_id).execute()
         return {
@@ -125,31 +120,33 @@ def delete_event(event_id):
             'data': None
         }
 
+@traced("calendar.delete_all_events")
 def delete_all_events():
-    creds = Credentials.from_authorized_user_file('credentials/token.json', SCOPES)
-    service = build('calendar', 'v3', credentials=creds)
+    service = get_calendar_service()
     now = datetime.utcnow().isoformat() + 'Z'
-    events_result = service.events().list(
-        calendarId='primary',
-        timeMin=now,
-        singleEvents=True,
-        orderBy='startTime'
-    ).execute()
-    events = events_result.get('items', [])
-    if not events:
+    # Every page, not just the first; ids are collected before deleting so pages don't shift under us.
+    # Recurring events are listed (and deleted) as one series rather than expanded into endless instances;
+    # modified instances of a series go with it.
+    event_ids = [
+        event['id'] for event in paginate(
+            service.events().list, 'items', page_size=250,
+            calendarId='primary',
+            timeMin=now,
+            singleEvents=False,
+            fields='items(id,recurringEventId),nextPageToken'
+        )
+        if not event.get('recurringEventId')
+    ]
+    if not event_ids:
         return {
             'status': 'success',
             'message': 'No upcoming events to delete.',
             'data': {'deleted_count': 0}
         }
     
-    deleted_ids = []
-    for event in events:
-        try:
-            service.events().delete(calendarId='primary', eventId=event['id']).execute()
-            deleted_ids.append(event['id'])
-        except Exception:
-            continue
+    requests = [service.events().delete(calendarId='primary', eventId=event_id) for event_id in event_ids]
+    results = google_services.execute_batch(service, requests)
+    deleted_ids = [event_id for event_id, (_, error) in zip(event_ids, results) if error is None]
     
     return {
         'status': 'success',
@@ -161,10 +158,9 @@ def delete_all_events():
 
 def get_all_holiday_calendars():
     """Get all holiday-related calendars (Indian + International)"""
-    creds = Credentials.from_authorized_user_file('credentials/token.json', SCOPES)
-    service = build('calendar', 'v3', credentials=creds)
+    service = get_calendar_service()
 
-    calendar_list = service.calendarList().list().execute().get('items', [])
+    calendar_list = paginate(service.calendarList().list, 'items')
     holiday_calendars = {}
 
     for calendar in calendar_list:
@@ -181,8 +177,7 @@ def get_all_holiday_calendars():
 
 def list_remaining_events_this_month_from_calendar(calendar_id):
     """List events from a given calendar for the remaining days of the current month"""
-    creds = Credentials.from_authorized_user_file('credentials/token.json', SCOPES)
-    service = build('calendar', 'v3', credentials=creds)
+    service = get_calendar_service()
 
     now = datetime.now(pytz.UTC)
     start_time = now
@@ -191,16 +186,16 @@ def list_remaining_events_this_month_from_calendar(calendar_id):
     else:
         end_of_month = now.replace(month=now.month + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
 
-    events_result = service.events().list(
+    return list(paginate(
+        service.events().list, 'items',
         calendarId=calendar_id,
         timeMin=start_time.isoformat(),
         timeMax=end_of_month.isoformat(),
         singleEvents=True,
         orderBy='startTime'
-    ).execute()
-
-    return events_result.get('items', [])
+    ))
 
+@traced("calendar.list_holidays")
 def list_holidays():
     """Display upcoming holidays from Indian + International calendars for the rest of the current month"""
     calendars = get_all_holiday_calendars()
@@ -253,10 +248,10 @@ def list_holidays():
         'data': all_holidays
     }
 
+@traced("calendar.list_holidays_next_month")
 def list_holidays_next_month():
     """Display holidays for next month"""
-    creds = Credentials.from_authorized_user_file('credentials/token.json', SCOPES)
-    service = build('calendar', 'v3', credentials=creds)
+    service = get_calendar_service()
     
     calendars = get_all_holiday_calendars()
     if not calendars:
@@ -282,15 +277,14 @@ def list_holidays_next_month():
     all_holidays = {}
     
     for region, cal_id in calendars.items():
-        events_result = service.events().list(
+        events = list(paginate(
+            service.events().list, 'items',
             calendarId=cal_id,
             timeMin=next_month_start.isoformat(),
             timeMax=next_month_end.isoformat(),
             singleEvents=True,
             orderBy='startTime'
-        ).execute()
-        
-        events = events_result.get('items', [])
+        ))
         if not events:
             continue
 
@@ -0,0 +1,143 @@
+# modules/conversation_module.py
+
+import os
+import logging
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import has_request_context, session
+
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "4"))  # user+assistant pairs kept verbatim
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+HISTORY_TURN_CHAR_LIMIT = 1200
+SUMMARY_MAX_SESSIONS = 256
+
+ROLE_MAP = {"You": "user", "Agent": "assistant"}
+
+logger = logging.getLogger(__name__)
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for budgeting"""
+    return max(1, len(text) // 4)
+
+def clean_turn_text(text):
+    """Strip the HTML the agents render and cap the size of a single turn"""
+    text = re.sub(r"(?i)<br\s*/?>", "\n", str(text))
+    text = re.sub(r"(?s)<[^>]+>", "", text)
+    text = re.sub(r"[ \t]+", " ", text)
+    text = re.sub(r"\n\s*\n+", "\n", text).strip()
+    if len(text) > HISTORY_TURN_CHAR_LIMIT:
+        text = text[:HISTORY_TURN_CHAR_LIMIT] + "..."
+    return text
+
+class ConversationWindow:
+    """Keeps prompts bounded: recent turns verbatim, older turns as a rolling summary"""
+
+    def __init__(self, max_turns=HISTORY_MAX_TURNS, token_budget=HISTORY_TOKEN_BUDGET):
+        self.max_turns = max_turns
+        self.token_budget = token_budget
+        self._summaries = OrderedDict()  # session_key -> {"summary": str, "covered": int}
+        self._pending = set()
+        self._local_histories = {}  # CLI sessions have no Flask history
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+
+    def get_history(self, session_key):
+        """Previous turns as (speaker, text) pairs, excluding the message being answered"""
+        if has_request_context():
+            history = list(session.get('history', []))
+            # flaskapp appends the current input before calling the agent
+            if history and history[-1][0] == 'You':
+                history = history[:-1]
+            return history
+        return list(self._local_histories.get(session_key, []))
+
+    def record_turn(self, session_key, user_input, reply):
+        """Remember a turn outside Flask; inside a request flaskapp owns the history"""
+        if has_request_context():
+            return
+        history = self._local_histories.setdefault(session_key, [])
+        history.append(('You', user_input))
+        history.append(('Agent', reply))
+
+    def build_messages(self, session_key, summarize_fn, history=None):
+        """Return chat messages for the summary of older turns plus the recent window"""
+        if history is None:
+            history = self.get_history(session_key)
+        turns = [(ROLE_MAP[speaker], clean_turn_text(text)) for speaker, text in history if speaker in ROLE_MAP]
+
+        # Walk back from the newest turn until the turn count or token budget is hit
+        recent = []
+        used = 0
+        for role, text in reversed(turns):
+            cost = estimate_tokens(text)
+            if len(recent) >= self.max_turns * 2 or (recent and used + cost > self.token_budget):
+                break
+            recent.append({"role": role, "content": text})
+            used += cost
+        recent.reverse()
+        older = turns[:len(turns) - len(recent)]
+
+        messages = []
+        summary = self._summary_for(session_key, older, summarize_fn)
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        messages.extend(recent)
+        return messages
+
+    def reset(self, session_key):
+        with self._lock:
+            self._summaries.pop(session_key, None)
+            self._local_histories.pop(session_key, None)
+
+    def _summary_for(self, session_key, older, summarize_fn):
+        """Return the cached summary and schedule an incremental update if turns were added"""
+        with self._lock:
+            entry = self._summaries.get(session_key)
+            if entry and entry["covered"] > len(older):
+                # History was reset or trimmed underneath us
+                entry = None
+                self._summaries.pop(session_key, None)
+            if entry:
+                self._summaries.move_to_end(session_key)
+
+            covered = entry["covered"] if entry else 0
+            if covered < len(older) and session_key not in self._pending:
+                self._pending.add(session_key)
+                previous = entry["summary"] if entry else ""
+                self._executor.submit(self._update_summary, session_key, previous, older[covered:], len(older), summarize_fn)
+
+            return entry["summary"] if entry else ""
+
+    def _update_summary(self, session_key, previous_summary, new_turns, covered, summarize_fn):
+        try:
+            transcript = "\n".join(f"{role}: {text}" for role, text in new_turns)
+            summary = summarize_fn(previous_summary, transcript)
+            if summary:
+                with self._lock:
+                    self._summaries[session_key] = {"summary": summary.strip(), "covered": covered}
+                    self._summaries.move_to_end(session_key)
+                    while len(self._summaries) > SUMMARY_MAX_SESSIONS:
+                        self._summaries.popitem(last=False)
+        except Exception as e:
+            logger.warning("History summarization failed: %s", e)
+        finally:
+            with self._lock:
+                self._pending.discard(session_key)
+
+def build_summary_prompt(previous_summary, new_turns):
+    """Messages asking the LLM to fold new turns into the running summary"""
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You maintain a running summary of a conversation between a user and an assistant. "
+                "Merge the new turns into the existing summary. Keep names, email addresses, dates, "
+                "decisions and open requests. Reply with the updated summary only, under 150 words."
+            )
+        },
+        {"role": "user", "content": f"Existing summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{new_turns}"}
+    ]
+
+conversation_window = ConversationWindow()
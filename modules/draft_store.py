@@ -0,0 +1,89 @@
+# modules/draft_store.py
+
+import os
+import copy
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+DRAFT_STORE_MAX_SESSIONS = int(os.getenv("DRAFT_STORE_MAX_SESSIONS", "256"))
+DRAFT_STORE_DB = os.getenv("DRAFT_STORE_DB")  # optional SQLite file for drafts that survive restarts
+
+class DraftConflictError(Exception):
+    """Raised when a draft was changed by another request since it was read"""
+
+class DraftStore:
+    """Email drafts keyed by session: in-process LRU with an optional SQLite backend"""
+
+    def __init__(self, max_sessions=DRAFT_STORE_MAX_SESSIONS, db_path=DRAFT_STORE_DB):
+        self.max_sessions = max_sessions
+        self._drafts = OrderedDict()
+        self._lock = threading.RLock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS drafts ("
+                "session_key TEXT PRIMARY KEY, version INTEGER NOT NULL, "
+                "data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, session_key):
+        """Return a copy of the session's draft (with its "version"), or None"""
+        with self._lock:
+            draft = self._drafts.get(session_key)
+            if draft is None and self._db is not None:
+                row = self._db.execute("SELECT data FROM drafts WHERE session_key = ?", (session_key,)).fetchone()
+                if row:
+                    draft = json.loads(row[0])
+                    self._remember(session_key, draft)
+            if draft is None:
+                return None
+            self._drafts.move_to_end(session_key)
+            return copy.deepcopy(draft)
+
+    def exists(self, session_key):
+        with self._lock:
+            if session_key in self._drafts:
+                return True
+        return self.get(session_key) is not None
+
+    def save(self, session_key, draft, expected_version=None):
+        """Store a draft; with expected_version, refuse to overwrite a newer edit"""
+        with self._lock:
+            current = self.get(session_key)
+            current_version = current.get("version", 0) if current else 0
+            if expected_version is not None and expected_version != current_version:
+                raise DraftConflictError(
+                    f"Draft was modified by another request (version {current_version}, expected {expected_version})"
+                )
+            saved = copy.deepcopy(draft)
+            saved["version"] = current_version + 1
+            saved["updated_at"] = time.time()
+            self._remember(session_key, saved)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO drafts (session_key, version, data, updated_at) VALUES (?, ?, ?, ?)",
+                    (session_key, saved["version"], json.dumps(saved), saved["updated_at"])
+                )
+                self._db.commit()
+            return copy.deepcopy(saved)
+
+    def delete(self, session_key):
+        with self._lock:
+            self._drafts.pop(session_key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM drafts WHERE session_key = ?", (session_key,))
+                self._db.commit()
+
+    def _remember(self, session_key, draft):
+        self._drafts[session_key] = draft
+        self._drafts.move_to_end(session_key)
+        # The LRU only bounds memory; evicted drafts remain in SQLite when configured
+        while len(self._drafts) > self.max_sessions:
+            self._drafts.popitem(last=False)
+
+draft_store = DraftStore()
@@ -1,44 +1,56 @@
 # modules/email_module.py
 import os
 import json
-import base64
-import traceback
+import logging
 import re
-import mimetypes
 import math
 from datetime import datetime
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email.mime.image import MIMEImage
-from email.mime.audio import MIMEAudio
-from email import encoders
-import openai
 from dotenv import load_dotenv
+from modules.llm_client import chat_completion
+from modules.llm_scheduler import PRIORITY_BACKGROUND
+from modules.model_router import MODEL_TIERS
+from modules.draft_store import draft_store, DraftConflictError
+from modules.session_context import get_session_key
+from modules.tracing import traced
+from modules.google_services import google_services, get_gmail_service, paginate
+from modules.mail_mirror import mail_mirror
+from modules.mail_body import extract_body
+from modules.outbox import outbox, start_outbox_worker
+from modules.mail_query import describe_query, to_gmail_query, SEARCH_RESULT_LIMIT
+from modules.speculative_drafts import speculative_drafts, is_generic_reply_instruction
+from modules.prompt_compaction import compact_email_body, apply_edit_reply, EDIT_FORMAT_INSTRUCTIONS
 
 load_dotenv()
 
-# Initialize OpenAI client for Groq
-client = openai.OpenAI(
-    api_key=os.getenv("GROQ_API_KEY"),
-    base_url="https://api.groq.com/openai/v1"
-)
+# Drafts are short, well-specified generations: always use the small fast tier
+EMAIL_MODEL = MODEL_TIERS["groq"]["small"]
 
-# Global variable to store draft email
-current_draft = None
+logger = logging.getLogger(__name__)
+
+# Drafts are kept per session in modules.draft_store
 current_email_details = None  # For storing email details when replying
 temp_attachments_file = None  # For storing temporary attachment file path
 
 # Ensure global variables are properly initialized
-if 'current_draft' not in globals():
-    current_draft = None
 if 'current_email_details' not in globals():
     current_email_details = None
 if 'temp_attachments_file' not in globals():
     temp_attachments_file = None
 
+# List views only show sender, subject, date and snippet: fetch those and nothing else
+LIST_METADATA_HEADERS = ['From', 'Subject', 'Date']
+LIST_PAGE_FIELDS = "messages/id,nextPageToken"
+LIST_MESSAGE_FIELDS = "id,threadId,snippet,payload/headers"
+FULL_MESSAGE_FIELDS = "id,threadId,snippet,payload"
+
+def get_current_draft():
+    """Return the draft of the current session, or None"""
+    return draft_store.get(get_session_key())
+
+def has_active_draft():
+    """Cheap in-memory check used by the intent parsers on every prompt"""
+    return draft_store.exists(get_session_key())
+
 def get_label_mapping():
     """Map user-friendly category names to Gmail labels"""
     return {
@@ -83,8 +95,9 @@ def detect_hinglish_context(text):
     
     return hinglish_count >= 2 or any(word in text_lower for word in ['ji', 'sahab', 'maam'])
 
-def generate_smart_email_content(to_email, subject, context="", previous_content="", is_edit=False, is_reply=False, original_email=None):
-    """Generate email content using AI with proper context understanding"""
+def generate_smart_email_content(to_email, subject, context="", previous_content="", is_edit=False, is_reply=False, original_email=None,
+                                  session_key=None, fallback=True):
+    """Generate email content using AI with proper context understanding (fallback=False re-raises LLM errors)"""
     try:
         # Detect language preference
         full_context = f"{subject} {context}".lower()
@@ -114,6 +127,12 @@ def generate_smart_email_content(to_email, subject, context="", previous_content
             5. NEVER include phrases like "Here is the updated content" or "Updated email content"  
             6. Return ONLY the email body content, nothing else"""
         
+        # Edits first ask for just the changed passages; a full rewrite is the fallback
+        if is_edit and previous_content:
+            edited = _edit_with_diff(system_prompt, previous_content, context, session_key)
+            if edited:
+                return _tidy_email_content(edited, use_hinglish)
+
         # Create context-aware prompts
         if is_edit and previous_content:
             # This is an edit request
@@ -130,7 +149,7 @@ Provide ONLY the updated email body content (no extra text or explanations)."""
 
 From: {original_email.get('sender', 'Unknown')}
 Subject: {original_email.get('subject', 'No Subject')}
-Original Message: {original_email.get('body', original_email.get('snippet', ''))}
+Original Message: {compact_email_body(original_email.get('body') or original_email.get('snippet', ''))}
 
 Reply context: {context}
 
@@ -159,47 +178,24 @@ Context: {context}
 
 Provide ONLY the email body content (no headers, no extra explanations)."""
         
-        response = client.chat.completions.create(
-            model="llama3-8b-8192",
-            messages=[
+        content = chat_completion(
+            "groq",
+            EMAIL_MODEL,
+            [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             max_tokens=400,
-            temperature=0.7
-        )
-        
-        content = response.choices[0].message.content.strip()
-        
-        # Clean up any unwanted prefixes
-        unwanted_prefixes = [
-            "here is the updated email content:",
-            "here's the updated email content:",
-            "updated email content:",
-            "here is the email:",
-            "here's the email:",
-            "email content:",
-            "dear"
-        ]
-        
-        content_lower = content.lower()
-        for prefix in unwanted_prefixes:
-            if content_lower.startswith(prefix):
-                content = content[len(prefix):].strip()
-                break
-        
-        # Ensure proper signature if missing
-        if "best regards" not in content.lower() and "dhanyawad" not in content.lower():
-            if use_hinglish:
-                content += "\n\nDhanyawad,\nRMM"
-            else:
-                content += "\n\nBest regards,\nRMM"
-        elif "[your name]" in content.lower() or "RMM" not in content.lower():
-            content = re.sub(r'\[your name\]', 'RMM', content, flags=re.IGNORECASE)
+            temperature=0.7,
+            priority=PRIORITY_BACKGROUND,
+            session_key=session_key
+        ).strip()
         
-        return content
+        return _tidy_email_content(content, use_hinglish)
         
     except Exception as e:
+        if not fallback:
+            raise
         # Fallback based on context
         if "kal mat aana" in context.lower() or "holiday" in subject.lower():
             return f"""Dear Mahvish Ma'am,
@@ -220,102 +216,205 @@ Please let me know your thoughts.
 Best regards,
 RMM"""
 
-def get_email_body(msg_data):
-    """Extract and concatenate all plain text parts from Gmail message data, fallback to stripped HTML if needed."""
-    def extract_all_plain_text(payload):
-        texts = []
-        if payload.get('mimeType', '').startswith('multipart/'):
-            parts = payload.get('parts', [])
-            for part in parts:
-                texts.extend(extract_all_plain_text(part))
-        elif payload.get('mimeType') == 'text/plain':
-            data = payload.get('body', {}).get('data', '')
-            if data:
-                try:
-                    decoded = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
-                    texts.append(decoded)
-                except Exception:
-                    pass
-        return texts
-
-    def extract_first_html(payload):
-        if payload.get('mimeType', '').startswith('multipart/'):
-            parts = payload.get('parts', [])
-            for part in parts:
-                html = extract_first_html(part)
-                if html:
-                    return html
-        elif payload.get('mimeType') == 'text/html':
-            data = payload.get('body', {}).get('data', '')
-            if data:
-                try:
-                    decoded = base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
-                    return decoded
-                except Exception:
-                    pass
-        return None
+def _tidy_email_content(content, use_hinglish):
+    """Strip preambles the model adds and make sure the draft is signed"""
+    # Clean up any unwanted prefixes
+    unwanted_prefixes = [
+        "here is the updated email content:",
+        "here's the updated email content:",
+        "here is the updated email:",
+        "here's the updated email:",
+        "updated email content:",
+        "here is the email:",
+        "here's the email:",
+        "email content:",
+        "dear"
+    ]
+
+    content_lower = content.lower()
+    for prefix in unwanted_prefixes:
+        if content_lower.startswith(prefix):
+            content = content[len(prefix):].strip()
+            break
+
+    # Ensure proper signature if missing
+    if "best regards" not in content.lower() and "dhanyawad" not in content.lower():
+        if use_hinglish:
+            content += "\n\nDhanyawad,\nRMM"
+        else:
+            content += "\n\nBest regards,\nRMM"
+    elif "[your name]" in content.lower() or "RMM" not in content.lower():
+        content = re.sub(r'\[your name\]', 'RMM', content, flags=re.IGNORECASE)
+    return content
 
-    def strip_html(html):
-        # Remove script/style tags and all HTML tags
-        html = re.sub(r'(?is)<(script|style).*?>.*?(</\1>)', '', html)
-        html = re.sub(r'(?s)<.*?>', '', html)
-        html = re.sub(r'\s+', ' ', html)
-        return html.strip()
+def _edit_with_diff(system_prompt, content, instruction, session_key=None):
+    """Apply an edit instruction as find/replace blocks; None if the model's reply doesn't apply cleanly"""
+    try:
+        reply = chat_completion(
+            "groq",
+            EMAIL_MODEL,
+            [
+                {"role": "system", "content": f"{system_prompt}\n\n{EDIT_FORMAT_INSTRUCTIONS}"},
+                {"role": "user", "content": f"Instruction: {instruction}\n\nCurrent email:\n{content}"}
+            ],
+            max_tokens=300,
+            temperature=0.3,
+            priority=PRIORITY_BACKGROUND,
+            session_key=session_key
+        )
+    except Exception as e:
+        logger.warning("Diff edit failed, regenerating the full draft: %s", e)
+        return None
+    edited = apply_edit_reply(content, reply)
+    if edited is None:
+        logger.debug("Diff edit reply did not apply, regenerating the full draft")
+    return edited
+
+def reply_subject_for(email):
+    subject = email.get('subject', '')
+    return f"Re: {subject}" if not subject.startswith('Re:') else subject
+
+def _speculate_reply(email):
+    """Pre-generate a generic reply while the user is still reading the email"""
+    session_key = get_session_key()
+    email = dict(email)
+    speculative_drafts.schedule(
+        email.get("id"),
+        lambda: generate_smart_email_content(
+            email.get("sender", ""), reply_subject_for(email), "", is_reply=True,
+            original_email=email, session_key=session_key, fallback=False
+        )
+    )
 
+def get_email_body(msg_data):
+    """Plain text of a Gmail message (text parts, else its HTML as text, else the snippet), capped in size"""
+    snippet = msg_data.get('snippet', 'No plain text content available')
     try:
-        payload = msg_data.get('payload', {})
-        text_parts = extract_all_plain_text(payload)
-        if text_parts:
-            return "\n\n---\n\n".join(text_parts)
-        # Fallback: try to get HTML and strip tags
-        html_content = extract_first_html(payload)
-        if html_content:
-            return strip_html(html_content)
-        # Final fallback: Gmail snippet
-        return msg_data.get('snippet', 'No plain text content available')
+        return extract_body(msg_data.get('payload', {}), fallback=snippet)
     except Exception:
-        return msg_data.get('snippet', 'No plain text content available')
+        logger.exception("Could not extract body of message %s", msg_data.get('id'))
+        return snippet
+
+@traced("gmail.fetch_messages")
+def fetch_messages(service, message_ids, format='full', **params):
+    """Get many messages in batch requests; order is kept and messages that fail are skipped"""
+    requests = [
+        service.users().messages().get(userId='me', id=message_id, format=format, **params)
+        for message_id in message_ids
+    ]
+    messages = []
+    for message_id, (msg_data, error) in zip(message_ids, google_services.execute_batch(service, requests)):
+        if error is not None:
+            logger.warning("Could not fetch message %s: %s", message_id, error)
+            continue
+        messages.append(msg_data)
+    return messages
+
+@traced("gmail.get_bodies")
+def get_email_bodies(message_ids):
+    """Full plain-text bodies for message_ids, fetched on demand: {message_id: body}"""
+    message_ids = [message_id for message_id in message_ids if message_id]
+    bodies = mail_mirror.get_bodies(message_ids)
+    missing = [message_id for message_id in message_ids if message_id not in bodies]
+    if missing:
+        for msg_data in fetch_messages(get_gmail_service(), missing, fields=FULL_MESSAGE_FIELDS):
+            bodies[msg_data['id']] = get_email_body(msg_data)
+            mail_mirror.store_body(msg_data['id'], bodies[msg_data['id']])
+    return bodies
+
+def list_email_summaries(service, message_ids):
+    """Sender, subject, date and snippet of message_ids; bodies are loaded when an email is opened"""
+    listed = fetch_messages(
+        service, message_ids, format='metadata', metadataHeaders=LIST_METADATA_HEADERS, fields=LIST_MESSAGE_FIELDS
+    )
+    emails = []
+    for msg_data in listed:
+        headers = msg_data.get('payload', {}).get('headers', [])
+        emails.append({
+            "id": msg_data['id'],
+            "sender": next((h['value'] for h in headers if h['name'] == 'From'), '(Unknown Sender)'),
+            "subject": next((h['value'] for h in headers if h['name'] == 'Subject'), '(No Subject)'),
+            "snippet": msg_data.get('snippet', ''),
+            "date": next((h['value'] for h in headers if h['name'] == 'Date'), '')
+        })
+    return emails
+
+@traced("gmail.query")
+def query_gmail(q, count=SEARCH_RESULT_LIMIT, page_token=None):
+    """One page of messages matching a Gmail search string: (emails, next_page_token)"""
+    service = get_gmail_service()
+    response = service.users().messages().list(
+        userId='me', q=q, maxResults=count, pageToken=page_token, fields=LIST_PAGE_FIELDS
+    ).execute()
+    message_ids = [msg['id'] for msg in response.get('messages', [])]
+    return list_email_summaries(service, message_ids), response.get('nextPageToken')
+
+def _query_labels(query):
+    labels = ["UNREAD"] if query.get("unread") else []
+    if query.get("category") == "primary":
+        labels.append("CATEGORY_PERSONAL")
+    elif query.get("category"):
+        labels.append(f"CATEGORY_{query['category'].upper()}")
+    return labels
+
+@traced("gmail.search")
+def search_emails(query, limit=SEARCH_RESULT_LIMIT, page_token=None, offset=0):
+    """
+    Search with mail_query.parse_mail_query constraints: the local mirror when it can answer,
+    otherwise Gmail with the constraints compiled into `q`. The result carries what the next page needs.
+    """
+    result = {"action": "search_emails", "query": describe_query(query), "search": query}
+    # The mirror doesn't track attachments, and a Gmail page token can only continue on Gmail
+    if page_token is None and not query.get("has_attachment"):
+        emails = mail_mirror.search(
+            query.get("terms", []), sender=query.get("sender"), subject=query.get("subject"),
+            after=query.get("after"), before=query.get("before"), labels=_query_labels(query),
+            limit=limit, offset=offset
+        )
+        if emails is not None:
+            more = len(emails) == limit
+            return {**result, "emails": emails, "total": len(emails), "source": "mirror",
+                    "next_offset": offset + limit if more else None}
+        if offset:
+            # Page 1 came from the mirror; Gmail can't continue from an offset and would start over
+            return {"error": "These search results are out of date. Please search again."}
+    try:
+        emails, next_page_token = query_gmail(to_gmail_query(query), count=limit, page_token=page_token)
+    except Exception as e:
+        logger.exception("Error searching emails")
+        return {"error": f"Error searching emails: {str(e)}"}
+    return {**result, "emails": emails, "total": len(emails), "source": "gmail", "next_page_token": next_page_token}
 
+@traced("gmail.read_emails")
 def read_emails_by_category(count=5, label="INBOX"):
     """Read emails from specific category/label"""
     try:
-        token_path = os.path.join("credentials", "token.json")
-        with open(token_path, 'r') as token_file:
-            token_data = json.load(token_file)
-
-        creds = Credentials(
-            token=token_data["token"],
-            refresh_token=token_data.get("refresh_token"),
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=token_data.get("client_id"),
-            client_secret=token_data.get("client_secret")
-        )
-
-        service = build('gmail', 'v1', credentials=creds)
-        
         # Map label names
         label_mapping = get_label_mapping()
         gmail_label = label_mapping.get(label, "INBOX")
+
+        # Served from the local mirror while it is fresh
+        mirrored = mail_mirror.list_messages(gmail_label, count)
+        if mirrored is not None:
+            return {
+                "action": "read_emails",
+                "emails": mirrored,
+                "category": get_category_display_name(label),
+                "total": len(mirrored),
+                "label": label
+            }
+
+        service = get_gmail_service()
         
         # Get emails from specific category
-        query = ""
         if gmail_label.startswith("CATEGORY_"):
-            query = f"category:{gmail_label.split('_')[1].lower()}"
-        
-        if query:
-            response = service.users().messages().list(
-                userId='me', 
-                q=query, 
-                maxResults=count
-            ).execute()
+            filters = {"q": f"category:{gmail_label.split('_')[1].lower()}"}
         else:
-            response = service.users().messages().list(
-                userId='me', 
-                labelIds=[gmail_label], 
-                maxResults=count
-            ).execute()
+            filters = {"labelIds": [gmail_label]}
         
-        messages = response.get('messages', [])
+        messages = list(paginate(
+            service.users().messages().list, 'messages', limit=count, userId='me', fields=LIST_PAGE_FIELDS, **filters
+        ))
 
         if not messages:
             category_name = get_category_display_name(label)
@@ -327,25 +426,7 @@ def read_emails_by_category(count=5, label="INBOX"):
                 "label": label
             }
 
-        emails = []
-        for msg in messages:
-            msg_data = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
-            headers = msg_data.get('payload', {}).get('headers', [])
-            
-            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '(No Subject)')
-            from_email = next((h['value'] for h in headers if h['name'] == 'From'), '(Unknown Sender)')
-            date = next((h['value'] for h in headers if h['name'] == 'Date'), '')
-            snippet = msg_data.get('snippet', '')
-            body = get_email_body(msg_data)
-            
-            emails.append({
-                "id": msg['id'],
-                "sender": from_email,
-                "subject": subject,
-                "snippet": snippet,
-                "body": body,
-                "date": date
-            })
+        emails = list_email_summaries(service, [msg['id'] for msg in messages])
         
         display_name = get_category_display_name(label)
         
@@ -358,15 +439,15 @@ def read_emails_by_category(count=5, label="INBOX"):
         }
 
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Error reading emails")
         return {"error": f"Error reading emails: {str(e)}"}
 
+@traced("gmail.get_email")
 def get_email_details(email_id):
     """Get full email details for viewing/replying"""
     try:
-        # If email_id is a number, we need to get the actual Gmail message ID
+        # A number is an index the agents could not resolve against a stored list: count from the inbox
         if email_id and email_id.isdigit():
-            # First, get recent emails to find the one at the specified index
             recent_emails_result = read_emails_by_category(count=20, label="INBOX")
             if recent_emails_result.get("action") == "read_emails":
                 emails = recent_emails_result.get("emails", [])
@@ -379,26 +460,19 @@ def get_email_details(email_id):
             else:
                 return {"error": "Could not retrieve emails to find the specified email."}
         
-        token_path = os.path.join("credentials", "token.json")
-        with open(token_path, 'r') as token_file:
-            token_data = json.load(token_file)
-
-        creds = Credentials(
-            token=token_data["token"],
-            refresh_token=token_data.get("refresh_token"),
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=token_data.get("client_id"),
-            client_secret=token_data.get("client_secret")
-        )
-
-        service = build('gmail', 'v1', credentials=creds)
-        msg_data = service.users().messages().get(userId='me', id=email_id, format='full').execute()
-        
-        headers = msg_data.get('payload', {}).get('headers', [])
-        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '(No Subject)')
-        from_email = next((h['value'] for h in headers if h['name'] == 'From'), '(Unknown Sender)')
-        date = next((h['value'] for h in headers if h['name'] == 'Date'), '')
-        body = get_email_body(msg_data)
+        mirrored = mail_mirror.get_message(email_id)
+        if mirrored:
+            subject, from_email, date, body = mirrored["subject"], mirrored["sender"], mirrored["date"], mirrored["body"]
+        else:
+            service = get_gmail_service()
+            msg_data = service.users().messages().get(userId='me', id=email_id, format='full', fields=FULL_MESSAGE_FIELDS).execute()
+            
+            headers = msg_data.get('payload', {}).get('headers', [])
+            subject = next((h['value'] for h in headers if h['name'] == 'Subject'), '(No Subject)')
+            from_email = next((h['value'] for h in headers if h['name'] == 'From'), '(Unknown Sender)')
+            date = next((h['value'] for h in headers if h['name'] == 'Date'), '')
+            body = get_email_body(msg_data)
+            mail_mirror.store_body(email_id, body)
         
         global current_email_details
         current_email_details = {
@@ -408,6 +482,7 @@ def get_email_details(email_id):
             "body": body,
             "date": date
         }
+        _speculate_reply(current_email_details)
         
         return {
             "action": "email_details",
@@ -421,7 +496,7 @@ def get_email_details(email_id):
         }
         
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Error getting email details")
         return {"error": f"Error getting email details: {str(e)}"}
 
 def format_file_size(bytes):
@@ -447,39 +522,14 @@ def get_file_icon(filename):
     }
     return icons.get(ext, '📎')
 
-def add_attachments_to_email(message, attachments):
-    """Attach files to the email message using file paths from Flask session."""
-    import os
-    from email.mime.base import MIMEBase
-    from email import encoders
-
-    for att in attachments:
-        filename = att.get('name')
-        content_type = att.get('type', 'application/octet-stream')
-        file_path = att.get('path')
-        if not filename or not file_path or not os.path.exists(file_path):
-            print(f"Attachment missing or file not found: {filename} ({file_path})")
-            continue
-
-        with open(file_path, 'rb') as f:
-            file_data = f.read()
-
-        # Create MIME part
-        part = MIMEBase('application', 'octet-stream')
-        part.set_payload(file_data)
-        encoders.encode_base64(part)
-        part.add_header('Content-Disposition', f'attachment; filename="{filename}"')
-        message.attach(part)
-        print(f"Attached file: {filename} from {file_path}")
-
 def create_email_draft(to, subject, content=None, context="", attachments=[], cc=[], bcc=[]):
     """Create an email draft with AI-generated content and multiple attachments"""
-    global current_draft, temp_attachments_file
+    global temp_attachments_file
     
-    print(f"🔍 DEBUG: create_email_draft called")
-    print(f"🔍 DEBUG: CC: {cc}, BCC: {bcc}")
-    print(f"🔍 DEBUG: Attachments received: {len(attachments)}")
-    print(f"🔍 DEBUG: temp_attachments_file: {temp_attachments_file}")
+    logger.debug("create_email_draft called")
+    logger.debug("CC: %s, BCC: %s", cc, bcc)
+    logger.debug("Attachments received: %s", len(attachments))
+    logger.debug("temp_attachments_file: %s", temp_attachments_file)
     
     if not to:
         return {"action": "chat", "response": "❌ Please specify recipient email address."}
@@ -494,9 +544,9 @@ def create_email_draft(to, subject, content=None, context="", attachments=[], cc
                         temp_attachments = json.load(f)
                         if isinstance(temp_attachments, list):
                             attachments = temp_attachments
-                            print(f"🔍 DEBUG: Loaded {len(attachments)} attachments from temp file: {temp_attachments_file}")
+                            logger.debug("Loaded %s attachments from temp file: %s", len(attachments), temp_attachments_file)
                 except Exception as e:
-                    print(f"🔍 DEBUG: Failed to load from temp file: {e}")
+                    logger.debug("Failed to load from temp file: %s", e)
             
             # Method 2: Check Flask session (fallback)
             if not attachments:
@@ -508,13 +558,13 @@ def create_email_draft(to, subject, content=None, context="", attachments=[], cc
                             attachments = session_attachments
                         elif session_attachments:
                             attachments = [session_attachments]
-                        print(f"🔍 DEBUG: Found {len(attachments)} attachments in Flask session")
+                        logger.debug("Found %s attachments in Flask session", len(attachments))
                 except Exception as e:
-                    print(f"🔍 DEBUG: Could not access Flask session: {e}")
+                    logger.debug("Could not access Flask session: %s", e)
         
-        print(f"🔍 DEBUG: Final attachment count: {len(attachments)}")
+        logger.debug("Final attachment count: %s", len(attachments))
         if attachments:
-            print(f"🔍 DEBUG: Attachment filenames: {[att.get('name', 'unknown') for att in attachments]}")
+            logger.debug("Attachment filenames: %s", [att.get('name', 'unknown') for att in attachments])
         
         # Generate email content if not provided
         if not content:
@@ -528,7 +578,7 @@ def create_email_draft(to, subject, content=None, context="", attachments=[], cc
             content = generate_smart_email_content(to, subject, context + attachment_context)
         
         # Create the draft
-        current_draft = {
+        draft = {
             "to": to,
             "cc": cc if cc else [],
             "bcc": bcc if bcc else [],
@@ -538,16 +588,8 @@ def create_email_draft(to, subject, content=None, context="", attachments=[], cc
             "created_at": datetime.now().isoformat()
         }
         
-        print(f"🔍 DEBUG: Draft created successfully with {len(attachments)} attachments")
-        
-        # Save the state
-        import pickle
-        try:
-            with open('temp_draft.pkl', 'wb') as f:
-                pickle.dump(current_draft, f)
-            print("🔍 DEBUG: Draft saved to file")
-        except Exception as e:
-            print(f"🔍 DEBUG: Failed to save draft: {e}")
+        draft_store.save(get_session_key(), draft)
+        logger.debug("Draft created successfully with %s attachments", len(attachments))
         
         # Format the response with detailed attachment info
         response = f"📝 Email draft created!<br><br><strong>To:</strong> {to}"
@@ -581,35 +623,45 @@ def create_email_draft(to, subject, content=None, context="", attachments=[], cc
         }
         
     except Exception as e:
-        import traceback
-        print(f"🔍 DEBUG: Full traceback:")
-        traceback.print_exc()
+        logger.exception("Error creating draft")
         return {"action": "chat", "response": f"❌ Error creating draft: {str(e)}"}
 
 def create_reply_draft(context=""):
     """Create a reply draft to the current email"""
-    global current_email_details, current_draft
+    global current_email_details
     
     if not current_email_details:
         return {"action": "chat", "response": "❌ No email selected to reply to. Please view an email first."}
     
     try:
         # Extract reply information
-        original_subject = current_email_details.get('subject', '')
-        reply_subject = f"Re: {original_subject}" if not original_subject.startswith('Re:') else original_subject
+        reply_subject = reply_subject_for(current_email_details)
         to_email = current_email_details.get('sender', '')
         
-        # Generate reply content
-        content = generate_smart_email_content(
-            to_email, 
-            reply_subject, 
-            context, 
-            is_reply=True, 
-            original_email=current_email_details
-        )
+        # Generate reply content, starting from the speculative draft when one was prepared
+        speculative = speculative_drafts.take(current_email_details.get('id'))
+        if speculative and is_generic_reply_instruction(context):
+            content = speculative
+        elif speculative:
+            speculative_drafts.record_refined()
+            content = generate_smart_email_content(
+                to_email,
+                reply_subject,
+                context,
+                previous_content=speculative,
+                is_edit=True
+            )
+        else:
+            content = generate_smart_email_content(
+                to_email, 
+                reply_subject, 
+                context, 
+                is_reply=True, 
+                original_email=current_email_details
+            )
         
         # Create reply draft
-        current_draft = {
+        draft = {
             "to": to_email,
             "cc": [],
             "bcc": [],
@@ -620,6 +672,7 @@ def create_reply_draft(context=""):
             "is_reply": True,
             "original_email_id": current_email_details.get('id')
         }
+        draft_store.save(get_session_key(), draft)
         
         response = f"""📧 Reply draft created!<br><br>
 <strong>To:</strong> {to_email}<br>
@@ -636,17 +689,10 @@ def create_reply_draft(context=""):
 
 def edit_email_draft(instruction):
     """Edit the current email draft"""
-    global current_draft
-    
+    session_key = get_session_key()
+    current_draft = draft_store.get(session_key)
     if not current_draft:
-        # Try to load from file
-        try:
-            import pickle
-            with open('temp_draft.pkl', 'rb') as f:
-                current_draft = pickle.load(f)
-                print("🔍 DEBUG: Draft loaded from file for editing")
-        except:
-            return {"action": "chat", "response": "❌ No email draft to edit. Create a draft first."}
+        return {"action": "chat", "response": "❌ No email draft to edit. Create a draft first."}
     
     try:
         # Handle CC/BCC additions
@@ -687,13 +733,8 @@ def edit_email_draft(instruction):
             current_draft['content'] = new_content
             response = f"✏️ Email content updated!<br><br>"
         
-        # Save updated draft
-        import pickle
-        try:
-            with open('temp_draft.pkl', 'wb') as f:
-                pickle.dump(current_draft, f)
-        except Exception as e:
-            print(f"🔍 DEBUG: Failed to save updated draft: {e}")
+        # Save updated draft; fails if another request changed it while we were editing
+        current_draft = draft_store.save(session_key, current_draft, expected_version=current_draft.get("version"))
         
         # Format updated draft display
         response += f"<strong>To:</strong> {current_draft.get('to', '')}"
@@ -719,124 +760,48 @@ def edit_email_draft(instruction):
         
         return {"action": "email_draft", "message": response}
         
+    except DraftConflictError:
+        return {"action": "chat", "response": "⚠️ The draft was changed by another request. Please review it and try your edit again."}
     except Exception as e:
         return {"action": "chat", "response": f"❌ Error editing draft: {str(e)}"}
 
+@traced("gmail.send_email")
 def send_email():
-    """Send the current draft email"""
-    global current_draft
-    
+    """Queue the current draft in the outbox; the background worker sends it"""
+    session_key = get_session_key()
+    current_draft = draft_store.get(session_key)
     if not current_draft:
-        # Try to load from file
-        try:
-            import pickle
-            with open('temp_draft.pkl', 'rb') as f:
-                current_draft = pickle.load(f)
-                print("🔍 DEBUG: Draft loaded from file for sending")
-        except:
-            return {"action": "chat", "response": "❌ No email draft to send. Create a draft first."}
+        return {"action": "chat", "response": "❌ No email draft to send. Create a draft first."}
     
     try:
-        # Load credentials
-        token_path = os.path.join("credentials", "token.json")
-        with open(token_path, 'r') as token_file:
-            token_data = json.load(token_file)
-
-        creds = Credentials(
-            token=token_data["token"],
-            refresh_token=token_data.get("refresh_token"),
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=token_data.get("client_id"),
-            client_secret=token_data.get("client_secret")
-        )
-
-        service = build('gmail', 'v1', credentials=creds)
+        entry = outbox.enqueue(session_key, current_draft)
+        start_outbox_worker()
+        logger.debug("Draft queued as outbox entry %s", entry['id'])
         
-        # Create the email message
-        message = MIMEMultipart()
-        message['to'] = current_draft['to']
-        message['subject'] = current_draft['subject']
-        
-        # Add CC and BCC if present
         cc_list = current_draft.get('cc', [])
         bcc_list = current_draft.get('bcc', [])
-        
-        if cc_list:
-            message['cc'] = ', '.join(cc_list)
-            print(f"🔍 DEBUG: Added CC: {message['cc']}")
-        if bcc_list:
-            message['bcc'] = ', '.join(bcc_list)
-            print(f"🔍 DEBUG: Added BCC: {message['bcc']}")
-        
-        # Add the email body
-        body = current_draft['content']
-        message.attach(MIMEText(body, 'plain'))
-        
-        # Add attachments if any
         attachments = current_draft.get('attachments', [])
-        if attachments:
-            print(f"🔍 DEBUG: Adding {len(attachments)} attachments")
-            add_attachments_to_email(message, attachments)
-        
-        print(f"🔍 DEBUG: Email message created successfully")
-        
-        # Encode message
-        raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-        
-        # Send the email
-        result = service.users().messages().send(
-            userId='me',
-            body={'raw': raw_message}
-        ).execute()
-        
-        print(f"🔍 DEBUG: Email sent successfully with ID: {result.get('id', 'Unknown')}")
-        
-        # Store sent email info before clearing draft
-        recipient = current_draft['to']
         cc_info = f"<br>📧 CC: {', '.join(cc_list)}" if cc_list else ""
         bcc_info = f"<br>📧 BCC: {', '.join(bcc_list)}" if bcc_list else ""
         attachment_info = f" with {len(attachments)} attachments" if attachments else ""
         
-        # Clear the draft after successful send
-        current_draft = None
-
-        # Remove temp file
-        try:
-            if os.path.exists('temp_draft.pkl'):
-                os.remove('temp_draft.pkl')
-                print("🔍 DEBUG: Temp draft file removed")
-            # Remove attachment files
-            for att in attachments:
-                file_path = att.get('path')
-                if file_path and os.path.exists(file_path):
-                    os.remove(file_path)
-                    print(f"🔍 DEBUG: Attachment file removed: {file_path}")
-        except Exception as e:
-            print(f"🔍 DEBUG: Failed to remove temp file or attachments: {e}")
+        # The outbox owns the message (and its attachment files) from here on
+        draft_store.delete(session_key)
         
         return {
-            "action": "email_sent",
-            "message": f"✅ Email sent successfully{attachment_info}!<br>📧 To: {recipient}{cc_info}{bcc_info}<br>📧 Message ID: {result.get('id', 'Unknown')}"
+            "action": "email_queued",
+            "outbox_id": entry['id'],
+            "message": f"📤 Email queued for sending{attachment_info}!<br>📧 To: {current_draft['to']}{cc_info}{bcc_info}<br>🆔 Outbox ID: {entry['id']}"
         }
         
     except Exception as e:
-        traceback.print_exc()
+        logger.exception("Failed to queue email")
         return {"action": "chat", "response": f"❌ Failed to send email: {str(e)}"}
 
 def cancel_draft():
     """Cancel the current draft"""
-    global current_draft
-    
-    current_draft = None
-    
-    # Remove temp file
-    try:
-        import os
-        if os.path.exists('temp_draft.pkl'):
-            os.remove('temp_draft.pkl')
-            print("🔍 DEBUG: Draft cancelled and temp file removed")
-    except Exception as e:
-        print(f"🔍 DEBUG: Failed to remove temp file: {e}")
+    draft_store.delete(get_session_key())
+    logger.debug("Draft cancelled")
     
     return {"action": "chat", "response": "❌ Email draft cancelled."}
 
@@ -882,22 +847,24 @@ def handle_gmail_query(parsed_response):
 
 def set_email_state(draft=None, details=None):
     """Set email state - for use with Flask sessions"""
-    global current_draft, current_email_details
-    current_draft = draft
+    global current_email_details
+    if draft:
+        draft_store.save(get_session_key(), draft)
+    else:
+        draft_store.delete(get_session_key())
     current_email_details = details
 
 def get_email_state():
     """Get current email state"""
-    return current_draft, current_email_details
+    return get_current_draft(), current_email_details
 
 def preserve_draft_state():
     """Debug function to check draft state"""
-    global current_draft
-    print(f"🔍 PRESERVE: current_draft = {current_draft}")
+    current_draft = get_current_draft()
+    logger.debug("Preserve: current_draft = %s", current_draft)
     return current_draft
 
 def restore_draft_state(draft):
     """Debug function to restore draft state"""
-    global current_draft
-    current_draft = draft
-    print(f"🔍 RESTORE: current_draft = {current_draft}")
\ No newline at end of file
+    draft_store.save(get_session_key(), draft)
+    logger.debug("Restore: current_draft = %s", draft)
\ No newline at end of file
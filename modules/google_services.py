@@ -0,0 +1,226 @@
+# modules/google_services.py
+
+import os
+import json
+import queue
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+import httplib2
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import HttpRequest
+
+TOKEN_PATH = os.path.join("credentials", "token.json")
+GOOGLE_HTTP_TIMEOUT = float(os.getenv("GOOGLE_HTTP_TIMEOUT", "30"))
+GOOGLE_HTTP_POOL_SIZE = int(os.getenv("GOOGLE_HTTP_POOL_SIZE", "8"))
+GOOGLE_BATCH_SIZE = int(os.getenv("GOOGLE_BATCH_SIZE", "50"))  # Gmail allows 100, but throttles large batches
+GOOGLE_PAGE_SIZE = int(os.getenv("GOOGLE_PAGE_SIZE", "100"))
+RETRYABLE_STATUSES = (429, 500, 503)
+TOKEN_REFRESH_MARGIN_SECONDS = 60  # refresh slightly early so a request never races the expiry
+
+logger = logging.getLogger(__name__)
+
+def _load_discovery_document(api, version):
+    """Parsed discovery document bundled with google-api-python-client (no network, parsed once)"""
+    document = get_static_doc(api, version)
+    if document is None:
+        raise ValueError(f"No discovery document for {api} {version}")
+    return json.loads(document)
+
+class GoogleServices:
+    """
+    Shared Gmail / Calendar clients.
+
+    Credentials are loaded once per token file and refreshed under a lock, with the new token
+    written back atomically. Service objects are built once from a cached discovery document;
+    every request they issue borrows an authorized httplib2 connection from a pool, since a
+    single httplib2.Http must never be used by two threads at once.
+    """
+
+    def __init__(self, pool_size=GOOGLE_HTTP_POOL_SIZE, timeout=GOOGLE_HTTP_TIMEOUT):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._lock = threading.RLock()
+        self._documents = {}    # (api, version) -> parsed discovery document
+        self._credentials = {}  # token_path -> (mtime, Credentials)
+        self._services = {}     # (token_path, api, version) -> Resource
+        self._pools = {}        # token_path -> LifoQueue of AuthorizedHttp
+
+    def get_credentials(self, token_path=TOKEN_PATH):
+        """Cached credentials for token_path, reloaded if the file changes and refreshed when expired"""
+        mtime = os.path.getmtime(token_path)
+        with self._lock:
+            cached = self._credentials.get(token_path)
+            if cached is None or cached[0] != mtime:
+                with open(token_path, "r") as token_file:
+                    creds = Credentials.from_authorized_user_info(json.load(token_file))
+                self._credentials[token_path] = (mtime, creds)
+                self._pools.pop(token_path, None)  # connections bound to the old credentials
+            else:
+                creds = cached[1]
+            self._refresh_if_needed(token_path, creds)
+            return creds
+
+    def _refresh_if_needed(self, token_path, creds):
+        # Called with self._lock held, so concurrent callers refresh once
+        if creds.token and not self._expires_soon(creds):
+            return
+        if not creds.refresh_token:
+            return
+        logger.info("Refreshing Google OAuth token")
+        creds.refresh(Request())
+        self._write_token(token_path, creds)
+
+    @staticmethod
+    def _expires_soon(creds):
+        if creds.expiry is None:
+            return False
+        # google-auth keeps expiry as naive UTC
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return creds.expiry - timedelta(seconds=TOKEN_REFRESH_MARGIN_SECONDS) <= now
+
+    def _write_token(self, token_path, creds):
+        """Write the refreshed token next to the old one and swap it in, so readers never see half a file"""
+        directory = os.path.dirname(token_path) or "."
+        fd, temp_path = tempfile.mkstemp(prefix=".token-", suffix=".json", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as temp_file:
+                temp_file.write(creds.to_json())
+            os.replace(temp_path, token_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._credentials[token_path] = (os.path.getmtime(token_path), creds)
+
+    def _discovery_document(self, api, version):
+        key = (api, version)
+        with self._lock:
+            if key not in self._documents:
+                self._documents[key] = _load_discovery_document(api, version)
+            return self._documents[key]
+
+    def _new_http(self, token_path):
+        return AuthorizedHttp(self.get_credentials(token_path), http=httplib2.Http(timeout=self.timeout))
+
+    @contextmanager
+    def http(self, token_path=TOKEN_PATH):
+        """Borrow an authorized connection; it goes back to the pool for keep-alive reuse"""
+        self.get_credentials(token_path)  # refresh before the request rather than on a 401
+        with self._lock:
+            pool = self._pools.setdefault(token_path, queue.LifoQueue())
+        try:
+            authorized_http = pool.get_nowait()
+        except queue.Empty:
+            authorized_http = self._new_http(token_path)
+        try:
+            yield authorized_http
+        finally:
+            with self._lock:
+                if self._pools.get(token_path) is pool and pool.qsize() < self.pool_size:
+                    pool.put(authorized_http)
+
+    def get_service(self, api, version, token_path=TOKEN_PATH):
+        """Shared, thread-safe service object for api/version"""
+        key = (token_path, api, version)
+        with self._lock:
+            service = self._services.get(key)
+            if service is not None:
+                return service
+
+        def request_builder(http, *args, **kwargs):
+            return PooledHttpRequest(self, token_path, http, *args, **kwargs)
+
+        # Requests never run on this http: PooledHttpRequest swaps in a pooled, authorized one
+        service = build_from_document(
+            self._discovery_document(api, version), http=httplib2.Http(timeout=self.timeout), requestBuilder=request_builder
+        )
+        with self._lock:
+            return self._services.setdefault(key, service)
+
+    def execute_batch(self, service, requests, token_path=TOKEN_PATH, batch_size=GOOGLE_BATCH_SIZE):
+        """
+        Send requests as batch requests: one HTTP exchange per batch_size items.
+        Returns [(response, error)] in request order; a failed item never fails the others.
+        """
+        results = [(None, None)] * len(requests)
+
+        def callback(request_id, response, exception):
+            results[int(request_id)] = (response, exception)
+
+        for start in range(0, len(requests), batch_size):
+            batch = service.new_batch_http_request(callback=callback)
+            for position in range(start, min(start + batch_size, len(requests))):
+                batch.add(requests[position], request_id=str(position))
+            with self.http(token_path) as authorized_http:
+                batch.execute(http=authorized_http)
+
+        # Gmail rate-limits individual items of a batch (429) rather than the batch: retry those on their own
+        for position, (_, error) in enumerate(results):
+            if error is not None and getattr(getattr(error, "resp", None), "status", None) in RETRYABLE_STATUSES:
+                try:
+                    results[position] = (requests[position].execute(num_retries=2), None)
+                except Exception as e:
+                    results[position] = (None, e)
+        return results
+
+    def get_gmail_service(self, token_path=TOKEN_PATH):
+        return self.get_service("gmail", "v1", token_path)
+
+    def get_calendar_service(self, token_path=TOKEN_PATH):
+        return self.get_service("calendar", "v3", token_path)
+
+class PooledHttpRequest(HttpRequest):
+    """HttpRequest that runs on a connection borrowed from GoogleServices for each call"""
+
+    def __init__(self, services, token_path, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._services = services
+        self._token_path = token_path
+
+    def execute(self, http=None, num_retries=0):
+        if http is not None:
+            return super().execute(http=http, num_retries=num_retries)
+        with self._services.http(self._token_path) as pooled_http:
+            return super().execute(http=pooled_http, num_retries=num_retries)
+
+    def next_chunk(self, http=None, num_retries=0):
+        if http is not None:
+            return super().next_chunk(http=http, num_retries=num_retries)
+        with self._services.http(self._token_path) as pooled_http:
+            return super().next_chunk(http=pooled_http, num_retries=num_retries)
+
+def paginate(list_method, items_key, limit=None, page_size=GOOGLE_PAGE_SIZE, **params):
+    """
+    Lazily yield the items of a Google list call, following nextPageToken.
+
+    list_method is e.g. service.users().messages().list; params are passed on every page.
+    Stops after limit items (never asking for more than needed) or when the caller stops iterating,
+    so only one page is held in memory at a time.
+    """
+    yielded, page_token = 0, None
+    while limit is None or yielded < limit:
+        page_limit = page_size if limit is None else min(page_size, limit - yielded)
+        response = list_method(pageToken=page_token, maxResults=page_limit, **params).execute()
+        for item in response.get(items_key, []):
+            yield item
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return
+
+google_services = GoogleServices()
+
+def get_gmail_service():
+    return google_services.get_gmail_service()
+
+def get_calendar_service():
+    return google_services.get_calendar_service()
@@ -2,10 +2,22 @@ import os
 import re
 import sys
 import json
+import logging
 import base64
-import requests
 from dotenv import load_dotenv
-from modules.memory_module import store_text_memory, search_similar_memory
+from modules.memory_module import store_text_memory, search_similar_memory, embed_text
+from modules.response_cache import response_cache, is_cacheable_query
+from modules.session_context import get_session_key, remember_email_list, email_list_ids
+from modules.conversation_module import conversation_window, build_summary_prompt
+from modules.llm_failover import llm_failover
+from modules.llm_scheduler import PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
+from modules.model_router import model_router
+from modules.translation_module import translate_text, translate_batch, translation_jobs, TRANSLATION_BATCH_MAX_EMAILS
+from modules.tracing import span
+from modules.temporal_parser import parse_datetime
+from modules.mail_query import is_search_request, parse_mail_query, query_to_state, query_from_state
+from modules.payloads import email_list_payload, event_list_payload, holiday_list_payload, multi_payload
+from modules.intent_planner import plan_intents, execute_plan
 from modules.travel_module import get_flight_info
 from modules.calendar_module import create_event, list_upcoming_events, delete_event, delete_all_events, list_holidays, list_holidays_next_month
 
@@ -13,23 +25,24 @@ sys.path.append('.')
 from modules.email_module import (
     read_emails_by_category, 
     get_email_details, 
+    get_email_bodies,
+    search_emails,
     create_email_draft, 
     send_email, 
     edit_email_draft,
-    current_draft,
+    has_active_draft,
     current_email_details,
     cancel_draft,
     create_reply_draft  
 )
 from datetime import datetime, timedelta
-import dateparser
 import pytz
-from flask import session  
+from flask import session, has_request_context
 
 load_dotenv()
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+logger = logging.getLogger(__name__)
+
 GROQ_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
 
 DEFAULT_TIME_MAP = {
@@ -41,6 +54,10 @@ DEFAULT_TIME_MAP = {
     "tonight": "9pm",
 }
 
+CALENDAR_KEYWORDS = [
+    "calendar", "event", "meeting", "appointment", "reminder", "call", "holiday", "holidays", "festival", "festivals"
+]
+
 SYNONYMS = {
     "create": ["add", "schedule", "set", "make", "arrange", "book", "organize"],
     "event": ["meeting", "appointment", "reminder", "call", "session", "meetup", "note"],
@@ -52,11 +69,15 @@ def normalize_action(text):
             text = re.sub(rf"\b{syn}\b", canonical, text, flags=re.IGNORECASE)
     return text
 
+# Read More on a list sends "email 2 details from list 1a2b3c4d"
+LIST_REF_PATTERN = re.compile(r"\b(?:from|in)\s+list\s+([0-9a-f]{8})\b")
+MORE_RESULTS_PATTERN = re.compile(r"\b(?:more|next)\s+(?:e?-?mails|messages|results)\b|\bnext\s+page\b")
+
 def extract_range(text):
-    m = re.search(r"between (.+?) and (.+?)(?:\s|$)", text)
+    m = re.search(r"between (.+?) and (.+?)(?=\s+(?:emails?|mails?|messages?|in|from)\b|[?.!]*$)", text)
     if m:
-        start = dateparser.parse(m.group(1))
-        end = dateparser.parse(m.group(2))
+        start = parse_datetime(m.group(1))
+        end = parse_datetime(m.group(2))
         if start and end:
             end = end.replace(hour=23, minute=59, second=59, microsecond=999999)
         return start, end
@@ -79,67 +100,40 @@ class GroqAgent:
         self.model = model
 
     def run(self, user_input):
-        print(f"🔍 DEBUG: GroqAgent.run() called with: '{user_input}'")
-        print(f"🔍 DEBUG: current_draft exists: {current_draft is not None}")
-        print(f"🔍 DEBUG: _is_email_request result: {self._is_email_request(user_input)}")
-        
+        logger.debug("GroqAgent.run() called with: %r", user_input)
+
+        # Compound tool requests ("show my events and my social emails"): reads run concurrently, writes in order
+        with span("route.plan"):
+            steps = plan_intents(user_input, self._is_tool_request)
+        if len(steps) > 1:
+            logger.debug("Planned %d steps: %s", len(steps), steps)
+            with span("tools.plan"):
+                return multi_payload(execute_plan(steps, self.run))
+
         # Enhanced email processing with natural language understanding
-        if self._is_email_request(user_input):
-            print(f"🔍 DEBUG: Routing to email handler")
+        with span("route"):
+            is_email = self._is_email_request(user_input)
+        logger.debug("_is_email_request result: %s", is_email)
+        if is_email:
+            logger.debug("Routing to email handler")
             return self._handle_email_request(user_input)
 
-        # Email date range filtering - UPDATED TO USE email_module2
+        # Email date ranges are compiled into a Gmail search (or answered by the local mirror)
         if any(word in user_input.lower() for word in ["email", "inbox", "mail", "mails", "message", "messages"]):
             range_start, range_end = extract_range(user_input.lower())
             if range_start and range_end:
-                # Use email_module2 function instead
-                email_result = read_emails_by_category(count=50, label="INBOX")  # Get more emails for filtering
-                if email_result.get("action") == "read_emails":
-                    emails = email_result.get("emails", [])
-                    filtered_emails = []
-                    for email in emails:
-                        try:
-                            email_dt = dateparser.parse(email.get('date', ''))
-                            if email_dt and range_start <= email_dt <= range_end:
-                                filtered_emails.append(email)
-                        except Exception:
-                            continue
-                    if not filtered_emails:
-                        return f"❌ No emails found between {range_start.strftime('%Y-%m-%d')} and {range_end.strftime('%Y-%m-%d')}."
-                    
-                    response = f"📧 <strong>Emails between {range_start.strftime('%b %d, %Y')} and {range_end.strftime('%b %d, %Y')}:</strong><br><br>"
-                    for i, email in enumerate(filtered_emails, 1):
-                        sender = email.get('sender', 'Unknown')
-                        subject = email.get('subject', '(No Subject)')
-                        snippet = email.get('snippet', '')
-                        date = email.get('date', '')
-                        
-                        if len(snippet) > 150:
-                            snippet = snippet[:150] + "..."
-                        
-                        response += f"<strong>📨 Email {i}:</strong><br>"
-                        response += f"<strong>From:</strong> {sender}<br>"
-                        response += f"<strong>Subject:</strong> {subject}<br>"
-                        response += f"<strong>Date:</strong> {date}<br>"
-                        response += f"<strong>Preview:</strong> {snippet}<br>"
-                        response += "─" * 50 + "<br><br>"
-                    
-                    return response.strip()
+                return self._handle_email_request(user_input)
 
-        # 🔍 Step 1: Memory recall
-        similar_memories = search_similar_memory(user_input)
-        memory_context = "\n".join([m.payload["text"] for m in similar_memories])
-
-        # 🛠️ Step 2: Tool trigger based on user input
+        # 🛠️ Step 1: Tool trigger based on user input
         if "flight" in user_input.lower():
             info = get_flight_info(user_input)
-            if info.startswith("❌ Could not resolve IATA codes"):
+            if isinstance(info, str) and info.startswith("❌ Could not resolve IATA codes"):
                 pass
             else:
                 return info
 
         # Calendar logic with improved NLP robustness
-        if "calendar" in user_input.lower() or "event" in user_input.lower() or any(word in user_input.lower() for word in ["meeting", "appointment", "reminder", "call", "holiday", "holidays", "festival", "festivals"]):
+        if any(word in user_input.lower() for word in CALENDAR_KEYWORDS):
             try:
                 text = normalize_action(user_input.lower())
 
@@ -161,24 +155,14 @@ class GroqAgent:
                         result = list_holidays_next_month()
                         if result['status'] == 'error':
                             return f"❌ <b>Error:</b> {result['message']}<br>"
-                        holidays_text = f"🎉 <b>Holidays for {result['data']['month']}:</b><br>"
-                        for region, holidays in result['data']['holidays'].items():
-                            holidays_text += f"<b>🌍 {region}:</b><br>"
-                            for holiday in holidays:
-                                holidays_text += f"🎊 {holiday['title']} - <b>{holiday['date']}</b><br>"
-                        return holidays_text.strip()
+                        return holiday_list_payload(result['data']['holidays'], f"🎉 Holidays for {result['data']['month']}")
                     else:
                         result = list_holidays()
                         if result['status'] == 'error':
                             return f"❌ <b>Error:</b> {result['message']}<br>"
                         if not result['data']:
                             return f"🎉 <b>{result['message']}</b><br>"
-                        holidays_text = "<b>🎉 Upcoming Holidays This Month:</b><br>"
-                        for region, holidays in result['data'].items():
-                            holidays_text += f"<b>🌍 {region}:</b><br>"
-                            for holiday in holidays:
-                                holidays_text += f"🎊 {holiday['title']} - <b>{holiday['date']}</b><br>"
-                        return holidays_text.strip()
+                        return holiday_list_payload(result['data'], "🎉 Upcoming Holidays This Month")
 
                 # 4. List events
                 if any(word in text for word in ["list", "show", "display", "upcoming"]) and not any(word in text for word in ["holiday", "holidays", "festival", "festivals"]):
@@ -187,17 +171,12 @@ class GroqAgent:
                         return f"❌ <b>Error:</b> {result['message']}<br>"
                     if not result['data']:
                         return f"📅 <b>{result['message']}</b><br>"
-                    events_text = "<b>📅 Upcoming Events:</b><br>"
-                    for i, event in enumerate(result['data'], 1):
-                        events_text += f"<b>{i}. 📋 Event:</b> {event['title']}<br>"
-                        events_text += f"<b>🕒 Date:</b> {event['date']}<br>"
-                        events_text += f"<b>🆔 ID:</b> {event['event_id']}<br>"
-                        events_text += "─" * 40 + "<br>"
-                    return events_text.strip()
+                    return event_list_payload(result['data'])
 
                 # 5. Delete by title or time
                 del_title_match = re.search(r"(?:delete|remove|cancel) (?:event|meeting|appointment|reminder|call) (?:called|named|about|titled|with title|regarding)\s*['\"]?([^'\"]+)['\"]?", text)
-                del_time = dateparser.parse(user_input)
+                # Only delete requests may be resolved by time; a create prompt can parse as a bare date too
+                del_time = parse_datetime(user_input) if re.search(r"\b(delete|remove|cancel)\b", text) else None
                 if del_title_match or del_time:
                     if del_title_match:
                         result = delete_event(del_title_match.group(1))
@@ -233,7 +212,7 @@ class GroqAgent:
 
                     cleaned_input = cleaned_input.strip(" ,.")
 
-                    dt = dateparser.parse(cleaned_input, settings={"PREFER_DATES_FROM": "future"})
+                    dt = parse_datetime(cleaned_input, prefer_future=True)
 
                     # --- Add this block for "today" time check ---
                     if "today" in user_input.lower():
@@ -331,7 +310,7 @@ class GroqAgent:
                 # Fallback: try to extract title and time anyway
                 title_match = re.search(r"(?:called|named|about|titled|with title|regarding)\s*['\"]?([^'\"]+)['\"]?", text)
                 title = title_match.group(1).strip() if title_match else "New Event"
-                dt = dateparser.parse(user_input, settings={"PREFER_DATES_FROM": "future"})
+                dt = parse_datetime(user_input, prefer_future=True)
                 if dt:
                     ist = pytz.timezone("Asia/Kolkata")
                     dt_ist = dt.astimezone(ist) if dt.tzinfo else ist.localize(dt)
@@ -371,7 +350,7 @@ class GroqAgent:
                     count = self._extract_count(user_input)
                     category = self._extract_category(user_input)
                     
-                    print(f"🔍 DEBUG: Category-specific request - Category: {category}, Count: {count}")
+                    logger.debug("Category-specific request - Category: %s, Count: %s", category, count)
                     
                     # Use email_module2 function
                     email_result = read_emails_by_category(count=count, label=category)
@@ -379,39 +358,31 @@ class GroqAgent:
                     if email_result.get("action") != "read_emails":
                         return f"❌ Failed to read {category.lower()} emails."
                     
-                    emails = email_result.get("emails", [])
-                    category_name = email_result.get("category", category)
-                    
-                    if not emails:
-                        return f"📭 No emails found in {category_name}."
-                    
-                    # Format the response
-                    response = f"📧 <strong>{category_name} Emails ({len(emails)} found):</strong><br>"
-                    
-                    for i, email in enumerate(emails, 1):
-                        sender = email.get('sender', 'Unknown')
-                        subject = email.get('subject', '(No Subject)')
-                        snippet = email.get('snippet', email.get('body', ''))
-                        date = email.get('date', 'Unknown')
-                        
-                        # Truncate long content
-                        if len(snippet) > 150:
-                            snippet = snippet[:150] + "..."
-                        
-                        response += f"<strong>📨 Email {i}:</strong><br>"
-                        response += f"<strong>From:</strong> {sender}<br>"
-                        response += f"<strong>Subject:</strong> {subject}<br>"
-                        response += f"<strong>Date:</strong> {date}<br>"
-                        response += f"<strong>Preview:</strong> {snippet}<br>"
-                        response += "─" * 50 + "<br>"
-                    
-                    response += "<em>💡 Click 'Read More' to view full content.</em>"
-                    return response.strip()
+                    # Remembered so Read More on this list opens these emails
+                    email_result["list_id"] = remember_email_list(email_result.get("emails", []))
+                    return self._format_email_list(email_result)
                     
                 except Exception as e:
                     return f"❌ Failed to read {category} emails: {e}<br>"
 
-        # 💬 Step 3: Call LLM with context
+        # 🔍 Step 2: Semantic cache + memory recall (one embedding serves both)
+        with span("memory.encode"):
+            query_vector = embed_text(user_input)
+        tenant = get_session_key()
+        cacheable = is_cacheable_query(user_input)
+        if cacheable:
+            cached_reply = response_cache.lookup(tenant, self.model, user_input, query_vector)
+            if cached_reply is not None:
+                logger.debug("Semantic cache hit for: '%s'", user_input)
+                conversation_window.record_turn(tenant, user_input, cached_reply)
+                return cached_reply
+
+        with span("memory.search"):
+            similar_memories = search_similar_memory(user_input, query_vector=query_vector)
+        memory_context = "\n".join([m.payload["text"] for m in similar_memories])
+
+        # 💬 Step 3: Call LLM with context and the recent conversation
+        history_messages = conversation_window.build_messages(tenant, self._summarize_history)
         messages = [
             {
                 "role": "system",
@@ -421,30 +392,54 @@ class GroqAgent:
                     "If a tool fails (e.g., city not found), fall back to providing helpful suggestions, airline options, websites, or sample flights."
                 )
             },
+            *history_messages,
             {"role": "user", "content": f"Context:\n{memory_context}\n\nQuery: {user_input}"}
         ]
 
         try:
-            res = requests.post(
-                GROQ_API_URL,
-                headers={
-                    "Authorization": f"Bearer {GROQ_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json={"model": self.model, "messages": messages}
+            # Easy queries go to the small model; low-confidence answers escalate to self.model
+            reply = model_router.complete(
+                "groq",
+                user_input,
+                lambda model: self._chat_completion(messages, model=model),
+                large_model=self.model
             )
-            res.raise_for_status()
-            reply = res.json()["choices"][0]["message"]["content"]
 
             # 🧠 Step 4: Store conversation in memory
-            store_text_memory(user_input, {"role": "user", "agent": self.agent_name})
-            store_text_memory(reply, {"role": "assistant", "agent": self.agent_name})
+            with span("memory.store"):
+                store_text_memory(user_input, {"role": "user", "agent": self.agent_name}, vector=query_vector)
+                store_text_memory(reply, {"role": "assistant", "agent": self.agent_name})
+
+            if cacheable:
+                response_cache.store(tenant, self.model, user_input, query_vector, reply)
+            conversation_window.record_turn(tenant, user_input, reply)
 
             return reply
 
         except Exception as e:
             return f"❌ Groq API Error: {e}<br>"
 
+    def _chat_completion(self, messages, max_tokens=None, priority=PRIORITY_INTERACTIVE, model=None, session_key=None):
+        """Send a chat completion to Groq, hedging to / failing over to the other provider when it lags or fails"""
+        return llm_failover.complete(
+            "groq", model or self.model, messages, max_tokens=max_tokens, priority=priority, session_key=session_key
+        )
+
+    def _summarize_history(self, previous_summary, new_turns):
+        """Fold older conversation turns into the running summary (runs in the background)"""
+        return self._chat_completion(
+            build_summary_prompt(previous_summary, new_turns), max_tokens=250, priority=PRIORITY_BACKGROUND
+        )
+
+    def _is_tool_request(self, user_input):
+        """True when the input is answered by a tool branch of run() rather than the LLM"""
+        user_lower = user_input.lower()
+        if "flight" in user_lower:
+            return True
+        if any(word in user_lower for word in CALENDAR_KEYWORDS):
+            return True
+        return self._is_email_request(user_input)
+
     def _is_email_request(self, user_input):
         """Check if the request is email-related"""
         email_keywords = [
@@ -474,38 +469,30 @@ class GroqAgent:
             r'(?:email|message)\s+\d+(?:\s+details?)?',  # "email 1" or "email 1 details"
             r'(?:show|display|open|view)\s+(?:email|message)\s+\d+',  # "show email 1"
             r'details?\s+(?:of\s+)?(?:email|message)\s+\d+',  # "details of email 1"
+            r'translate\s+(?:the\s+)?(?:emails|messages)\s+\d+',  # "translate emails 1-5 to spanish"
         ]
         for pattern in email_detail_patterns:
             if re.search(pattern, user_lower):
-                print(f"🔍 DEBUG: Detected email details pattern in _is_email_request")
+                logger.debug("Detected email details pattern in _is_email_request")
                 return True
 
         # Check for email keywords
         if any(keyword in user_lower for keyword in email_keywords):
             return True
+
+        if is_search_request(user_input) or MORE_RESULTS_PATTERN.search(user_lower):
+            return True
         
         # Check for attachment context
         if self._has_attachments_context(user_input):
             return True
         
-        # Check if there's a saved draft file
-        draft_exists = False
-        try:
-            import pickle
-            import os
-            if os.path.exists('temp_draft.pkl'):
-                with open('temp_draft.pkl', 'rb') as f:
-                    saved_draft = pickle.load(f)
-                    draft_exists = saved_draft is not None
-                    print(f"🔍 DEBUG: Found saved draft: {draft_exists}")
-        except Exception as e:
-            print(f"🔍 DEBUG: Error checking saved draft: {e}")
-        
-        # Check for email context when there's a draft (either in memory or saved)
-        if current_draft or draft_exists:
+        # Check for email context when the session has a draft
+        draft_exists = has_active_draft()
+        if draft_exists:
             # Single word responses when draft exists should be treated as email commands
             if user_lower.strip() in ["ok", "send", "yes", "y", "no", "cancel", "n"]:
-                print(f"🔍 DEBUG: Detected email confirmation command: {user_lower}")
+                logger.debug("Detected email confirmation command: %s", user_lower)
                 return True
             # Edit commands when draft exists
             if user_lower.startswith("edit ") or "change" in user_lower or "modify" in user_lower:
@@ -515,18 +502,18 @@ class GroqAgent:
                 return True
             
         # Check for email context clues
-        return self._has_email_context(user_input)
+        return self._has_email_context(user_input, draft_exists)
 
-    def _has_email_context(self, user_input):
+    def _has_email_context(self, user_input, draft_exists=False):
         """Check for email context clues"""
         user_lower = user_input.lower()
         
         # Check for email-related responses when draft exists
-        if current_draft and any(word in user_lower for word in ["ok", "send", "yes", "no", "cancel"]):
+        if draft_exists and any(word in user_lower for word in ["ok", "send", "yes", "no", "cancel"]):
             return True
             
         # Check for edit instructions when draft exists
-        if current_draft and (user_lower.startswith("edit ") or "change" in user_lower or "modify" in user_lower):
+        if draft_exists and (user_lower.startswith("edit ") or "change" in user_lower or "modify" in user_lower):
             return True
             
         # Check for CC/BCC additions
@@ -538,10 +525,12 @@ class GroqAgent:
     def _handle_email_request(self, user_input):
         """Handle email requests with natural language processing"""
         try:
-            parsed_request = self._parse_email_request(user_input)
-            print(f"🔍 DEBUG: Parsed email request: {parsed_request}")
+            with span("route.email"):
+                parsed_request = self._parse_email_request(user_input)
+            logger.debug("Parsed email request: %s", parsed_request)
             result = self._execute_email_action(parsed_request)
-            return self._format_email_response(result)
+            with span("format"):
+                return self._format_email_response(result)
         except Exception as e:
             return f"❌ Email Error: {str(e)}"
 
@@ -551,44 +540,46 @@ class GroqAgent:
 
         # Check for read emails request
         if user_lower in ["email", "emails", "show my emails", "read my emails", "show emails", "read emails", "my inbox", "read my inbox"]:
-            print(f"🔍 DEBUG: Parsing as read emails (primary inbox) for: {user_lower}")
+            logger.debug("Parsing as read emails (primary inbox) for: %s", user_lower)
             return {"action": "read_emails", "count": 5, "label": "INBOX"}
 
-        # Check if there's a saved draft file first
-        draft_exists = False
-        try:
-            import pickle
-            import os
-            if os.path.exists('temp_draft.pkl'):
-                with open('temp_draft.pkl', 'rb') as f:
-                    saved_draft = pickle.load(f)
-                    draft_exists = saved_draft is not None
-                    print(f"🔍 DEBUG: Found saved draft in parse: {draft_exists}")
-        except Exception as e:
-            print(f"🔍 DEBUG: Error checking saved draft in parse: {e}")
+        # Drafts are per session and held in memory, so this check is cheap
+        draft_exists = has_active_draft()
         
         # PRIORITY 1: Handle email confirmations when draft exists
-        if (current_draft or draft_exists) and user_lower in ["ok", "send", "yes", "y"]:
-            print(f"🔍 DEBUG: Parsing as email confirmation - YES")
+        if draft_exists and user_lower in ["ok", "send", "yes", "y"]:
+            logger.debug("Parsing as email confirmation - YES")
             return {"action": "email_confirmation", "response": "yes"}
-        elif (current_draft or draft_exists) and user_lower in ["no", "cancel", "don't send", "n"]:
-            print(f"🔍 DEBUG: Parsing as email confirmation - NO")
+        elif draft_exists and user_lower in ["no", "cancel", "don't send", "n"]:
+            logger.debug("Parsing as email confirmation - NO")
             return {"action": "email_confirmation", "response": "no"}
         
         # PRIORITY 2: Handle edit instructions when draft exists
-        if (current_draft or draft_exists) and (user_lower.startswith("edit ") or "change" in user_lower or "modify" in user_lower):
+        if draft_exists and (user_lower.startswith("edit ") or "change" in user_lower or "modify" in user_lower):
             instruction = re.sub(r'^edit\s+', '', user_input, flags=re.IGNORECASE).strip()
-            print(f"🔍 DEBUG: Parsing as edit instruction: {instruction}")
+            logger.debug("Parsing as edit instruction: %s", instruction)
             return {"action": "edit_email", "instruction": instruction}
         
         # PRIORITY 3: Handle CC/BCC additions when draft exists
-        if (current_draft or draft_exists) and ("add cc" in user_lower or "cc:" in user_lower):
-            print(f"🔍 DEBUG: Parsing as CC addition")
+        if draft_exists and ("add cc" in user_lower or "cc:" in user_lower):
+            logger.debug("Parsing as CC addition")
             return {"action": "edit_email", "instruction": user_input}
-        if (current_draft or draft_exists) and ("add bcc" in user_lower or "bcc:" in user_lower):
-            print(f"🔍 DEBUG: Parsing as BCC addition")
+        if draft_exists and ("add bcc" in user_lower or "bcc:" in user_lower):
+            logger.debug("Parsing as BCC addition")
             return {"action": "edit_email", "instruction": user_input}
 
+        # Batch translation: "translate emails 1-5 to spanish", "translate emails 1, 3 and 4 in french"
+        batch_match = re.search(
+            r'translate\s+(?:the\s+)?(?:emails?|messages?)\s+((?:\d+\s*(?:-|to|,|and|&)?\s*)+?)\s*(?:to|in|into)\s+([a-zA-Z]+)$',
+            user_lower
+        )
+        if batch_match:
+            indices = self._parse_email_indices(batch_match.group(1))
+            if len(indices) > 1:
+                lang = batch_match.group(2).strip().capitalize()
+                logger.debug("Parsing as batch translate: %s to %s", indices, lang)
+                return {"action": "translate_emails", "email_indices": indices, "target_language": lang}
+
         # Translation patterns (improved)
         translate_patterns = [
             r'(?:translate|show|display)?\s*(?:the\s*)?(?:email|message)?\s*(\d+|first|1st|second|2nd|third|3rd|fourth|4th|fifth|5th)\s*(?:email|message)?\s*(?:to|in)\s*([a-zA-Z]+)$',
@@ -622,20 +613,34 @@ class GroqAgent:
                 except Exception:
                     idx = 1
                 lang = lang.strip().capitalize()
-                print(f"🔍 DEBUG: Parsing as translate email: {idx} to {lang}")
+                logger.debug("Parsing as translate email: %s to %s", idx, lang)
                 return {"action": "translate_email", "email_index": idx, "target_language": lang}
 
         # PRIORITY 4: Handle composing new emails
         if any(phrase in user_lower for phrase in ["send email", "compose email", "write email", "email to", "create email"]) or \
            re.search(r'email\s+[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}', user_input, re.IGNORECASE):
-            print(f"🔍 DEBUG: Parsing as compose request")
+            logger.debug("Parsing as compose request")
             return self._parse_compose_request(user_input)
 
+        # Search: "emails from hr about leave last month", "search emails for invoice", "emails between X and Y"
+        range_start, range_end = extract_range(user_lower) if "between" in user_lower else (None, None)
+        if is_search_request(user_input) or (range_start and range_end):
+            logger.debug("Parsing as email search")
+            query = parse_mail_query(user_input)
+            if range_start and range_end:
+                query["after"], query["before"] = range_start, range_end + timedelta(seconds=1)
+            return {"action": "search_emails", "query": query}
+
+        # Next page of the last search: "more emails", "next page"
+        if MORE_RESULTS_PATTERN.search(user_lower):
+            logger.debug("Parsing as next page of email search")
+            return {"action": "more_emails"}
+
         # PRIORITY 5: Handle reading emails by category
         if any(phrase in user_lower for phrase in ["read emails", "check emails", "show emails", "inbox", "latest emails"]):
             count = self._extract_count(user_input)
             category = self._extract_category(user_input)
-            print(f"🔍 DEBUG: Parsing as read emails: {category}, count: {count}")
+            logger.debug("Parsing as read emails: %s, count: %s", category, count)
             return {"action": "read_emails", "count": count, "label": category}
 
         # PRIORITY 6: Handle email details - IMPROVED PATTERN
@@ -647,36 +652,40 @@ class GroqAgent:
             r'(?:email|message)\s+(\w+)\s+details?'  # "email abc123 details"
         ]
         
+        list_match = LIST_REF_PATTERN.search(user_lower)
         for pattern in email_detail_patterns:
             match = re.search(pattern, user_lower)
             if match:
                 email_id = match.group(1)
+                if list_match and email_id.isdigit():
+                    logger.debug("Parsing as email details: %s of list %s", email_id, list_match.group(1))
+                    return {"action": "show_email_details", "email_index": int(email_id), "list_id": list_match.group(1)}
                 # Make sure it's not an email address
                 if not re.search(r'@', email_id):
-                    print(f"🔍 DEBUG: Parsing as email details: {email_id}")
+                    logger.debug("Parsing as email details: %s", email_id)
                     return {"action": "email_details", "email_id": email_id}
         
         # Handle generic "details" command
         if "details" in user_lower and not any(word in user_lower for word in ["create", "send", "compose"]):
-            print(f"🔍 DEBUG: Parsing as email details (no ID)")
+            logger.debug("Parsing as email details (no ID)")
             return {"action": "email_details", "email_id": None}
 
         # PRIORITY 7: Handle replies
         if any(phrase in user_lower for phrase in ["reply", "respond", "answer"]):
             context = re.sub(r'reply\s+', '', user_input, flags=re.IGNORECASE).strip()
-            print(f"🔍 DEBUG: Parsing as reply: {context}")
+            logger.debug("Parsing as reply: %s", context)
             return {"action": "reply_email", "context": context}
 
         # Check for "email X details" or "show email X" pattern
         match = re.search(r"(?:email|show email)\s*(\d+)\s*(?:details|content)?", user_input, re.IGNORECASE)
         if match:
             email_index = int(match.group(1))
-            print(f"🔍 DEBUG: Detected email details request for index {email_index}")
+            logger.debug("Detected email details request for index %s", email_index)
             return {"action": "show_email_details", "email_index": email_index}
 
         # DEFAULT: Default to reading emails if no specific action detected
         category = self._extract_category(user_input)
-        print(f"🔍 DEBUG: Parsing as default read emails - Category: {category}")
+        logger.debug("Parsing as default read emails - Category: %s", category)
         return {"action": "read_emails", "count": 5, "label": category}
 
     def _parse_compose_request(self, user_input):
@@ -717,7 +726,7 @@ class GroqAgent:
         try:
             from flask import session, has_request_context
             if has_request_context() and 'current_attachments' in session:
-                print(f"🔍 DEBUG: session['current_attachments']: {session['current_attachments']}")
+                logger.debug("session['current_attachments']: %s", session['current_attachments'])
                 session_attachments = session['current_attachments']
                 if isinstance(session_attachments, list):
                     attachments = session_attachments
@@ -725,7 +734,7 @@ class GroqAgent:
                     attachments = [session_attachments]
                 else:
                     attachments = []
-                print(f"🔍 DEBUG: Loaded {len(attachments)} attachments from Flask session")
+                logger.debug("Loaded %s attachments from Flask session", len(attachments))
             else:
                 # Fallback: Try temp file only if session is not available
                 import modules.email_module as email_module
@@ -735,11 +744,11 @@ class GroqAgent:
                         loaded = json.load(f)
                         if isinstance(loaded, list):
                             attachments = loaded
-                            print(f"🔍 DEBUG: Loaded {len(attachments)} attachments from temp file")
+                            logger.debug("Loaded %s attachments from temp file", len(attachments))
         except Exception as e:
-            print(f"🔍 DEBUG: Error loading attachments: {e}")
+            logger.debug("Error loading attachments: %s", e)
 
-        print(f"🔍 DEBUG: Final result - CC: {cc_emails}, BCC: {bcc_emails}, Attachments: {len(attachments)}")
+        logger.debug("Final result - CC: %s, BCC: %s, Attachments: %s", cc_emails, bcc_emails, len(attachments))
 
         return {
             "action": "draft_email",
@@ -834,20 +843,32 @@ class GroqAgent:
         if action == "read_emails":
             count = parsed_request.get("count", 5)
             label = parsed_request.get("label", "INBOX")
-            print(f"🔍 DEBUG: Executing email action: read_emails")
+            logger.debug("Executing email action: read_emails")
             result = read_emails_by_category(count=count, label=label)
             # Store email list in session for later details lookup
-            try:
-                session["last_email_list"] = result.get("emails", [])
-            except:
-                pass  # Session might not be available
+            result["list_id"] = remember_email_list(result.get("emails", []))
             return result
             
         elif action == "show_email_details" or action == "email_details":
             email_index = parsed_request.get("email_index")
             email_id = parsed_request.get("email_id")
             
-            print(f"🔍 DEBUG: Executing email details - Index: {email_index}, ID: {email_id}")
+            logger.debug("Executing email details - Index: %s, ID: %s", email_index, email_id)
+            
+            # "email 2 details" (what Read More sends) means the 2nd email of the last list shown,
+            # whether that was the inbox, a category or search results
+            if not email_index and email_id and email_id.isdigit() and has_request_context() and session.get("last_email_list"):
+                email_index, email_id = int(email_id), None
+            
+            # Read More names the list it belongs to; several lists may be on screen at once
+            list_id = parsed_request.get("list_id")
+            if email_index and list_id:
+                ids = email_list_ids(list_id)
+                if ids is None:
+                    return {"error": "That email list has expired. Please list emails again."}
+                if not 1 <= email_index <= len(ids):
+                    return {"error": f"Email {email_index} not found in that list."}
+                email_id, email_index = ids[email_index - 1], None
             
             # If we have an index, use it to get the email ID from the last list
             if email_index:
@@ -855,7 +876,7 @@ class GroqAgent:
                     email_list = session.get("last_email_list", [])
                     if 1 <= email_index <= len(email_list):
                         email_id = email_list[email_index - 1].get("id")
-                        print(f"🔍 DEBUG: Found email ID: {email_id}")
+                        logger.debug("Found email ID: %s", email_id)
                     else:
                         return {"error": f"Email {email_index} not found. Please list emails first."}
                 except:
@@ -905,8 +926,9 @@ class GroqAgent:
                 session["last_email_list"] = email_list
             if 1 <= email_index <= len(email_list):
                 email = email_list[email_index - 1]
-                original_text = email.get("body", "")
-                translated_text = self._translate_text(original_text, target_language)
+                # Listed emails carry metadata only: load the body now
+                original_text = get_email_bodies([email.get("id")]).get(email.get("id"), "")
+                translated_text = self._translate_text(original_text, target_language, message_id=email.get("id"))
                 sender = email.get("sender", "Unknown")
                 subject = email.get("subject", "(No Subject)")
                 date = email.get("date", "")
@@ -923,6 +945,18 @@ class GroqAgent:
                 }
             else:
                 return {"error": f"Email {email_index} not found. Please list emails first."}
+
+        elif action == "search_emails":
+            return self._search_emails(parsed_request.get("query", {}))
+
+        elif action == "more_emails":
+            state = session.get("last_email_search") if has_request_context() else None
+            if not state or not (state.get("page_token") or state.get("offset")):
+                return {"error": "No more results. Search or list emails first."}
+            return self._search_emails(query_from_state(state["query"]), page_token=state.get("page_token"), offset=state.get("offset") or 0)
+
+        elif action == "translate_emails":
+            return self._translate_emails(parsed_request.get("email_indices", []), parsed_request.get("target_language"))
         
         return {"error": "Unknown email action"}
 
@@ -942,44 +976,36 @@ class GroqAgent:
                 return result.get("message", "📝 Email draft created!")
             elif action == "email_sent":
                 return result.get("message", "✅ Email sent successfully!")
+            elif action == "email_queued":
+                return result.get("message", "📤 Email queued for sending!")
             elif action == "chat":
                 return result.get("response", "")
             elif action == "translated_email":
                 return self._format_translated_email(result)
+            elif action == "translated_emails":
+                return self._format_translated_batch(result)
+            elif action == "search_emails":
+                emails = result.get("emails", [])
+                if not emails:
+                    return f"📭 No emails found {result.get('query', '')}."
+                title = f"🔎 Emails {result.get('query', '')} ({len(emails)} shown)"
+                if result.get("next_page_token") or result.get("next_offset"):
+                    title += " - say \"more emails\" for the next page"
+                return email_list_payload(emails, title, list_id=result.get("list_id"))
             
         return str(result)
 
     def _format_email_list(self, result):
-        """Format email list for clean HTML display"""
+        """Email list payload; index2.html renders it and adds the Read More buttons"""
         emails = result.get("emails", [])
         category = result.get("category", "Emails")
         
         if not emails:
             return f"📭 No emails found in {category}."
         
-        response = f"📧 <strong>{category} ({len(emails)} emails):</strong><br>"
-        
-        for i, email in enumerate(emails, 1):
-            sender = email.get("sender", "Unknown")
-            subject = email.get("subject", "(No Subject)")
-            snippet = email.get("snippet", "")
-            date = email.get("date", "")
-            
-            # Truncate long content
-            if len(snippet) > 100:
-                snippet = snippet[:100] + "..."
-            
-            response += f"<strong>📨 Email {i}:</strong><br>"
-            response += f"<strong>From:</strong> {sender}<br>"
-            response += f"<strong>Subject:</strong> {subject}<br>"
-            response += f"<strong>Date:</strong> {date}<br>"
-            response += f"<strong>Preview:</strong> {snippet}<br>"
-            # Add Read More button with email index
-            response += f"""<button class='read-more-btn' data-email-index='{i}'>Read More</button><br>"""
-            response += "─" * 50 + "<br>"
-
-        response += "<em>💡 Click 'Read More' to view full content.</em>"
-        return response
+        return email_list_payload(
+            emails, f"📧 {category} ({len(emails)} emails)", snippet_chars=100, list_id=result.get("list_id")
+        )
 
     def _format_email_details(self, details):
         """Format email details for display"""
@@ -1031,25 +1057,102 @@ class GroqAgent:
         user_lower = user_input.lower()
         return any(keyword in user_lower for keyword in attachment_keywords)
 
-    def _translate_text(self, text, target_language):
-        """Translate text to the target language using Groq/OpenAI API."""
-        try:
-            # Use Groq/OpenAI translation prompt
-            prompt = f"Translate the following email to {target_language}:\n\n{text}"
+    def _search_emails(self, query, page_token=None, offset=0):
+        """Run a search and remember it so Read More and "more emails" refer to these results"""
+        result = search_emails(query, page_token=page_token, offset=offset)
+        if result.get("action") == "search_emails" and has_request_context():
+            result["list_id"] = remember_email_list(result.get("emails", []))
+            session["last_email_search"] = {
+                "query": query_to_state(query),
+                "page_token": result.get("next_page_token"),
+                "offset": result.get("next_offset"),
+            }
+        return result
+
+    def _parse_email_indices(self, text):
+        """Turn "1-3, 5 and 7" into [1, 2, 3, 5, 7], capped at TRANSLATION_BATCH_MAX_EMAILS"""
+        indices = []
+        for start, end in re.findall(r'(\d+)(?:\s*(?:-|to)\s*(\d+))?', text):
+            start = int(start)
+            end = int(end) if end else start
+            for idx in range(start, min(end, start + TRANSLATION_BATCH_MAX_EMAILS - 1) + 1):
+                if idx >= 1 and idx not in indices:
+                    indices.append(idx)
+        return indices[:TRANSLATION_BATCH_MAX_EMAILS]
+
+    def _translation_fn(self):
+        """Chunk translator bound to the current session (workers run outside the request context)"""
+        session_key = get_session_key()
+
+        def translate_chunk(chunk, language):
             messages = [
-                {"role": "system", "content": "You are a professional translator."},
-                {"role": "user", "content": prompt}
+                {"role": "system", "content": "You are a professional translator. Reply with the translation only, preserving paragraph breaks."},
+                {"role": "user", "content": f"Translate the following email text to {language}:\n\n{chunk}"}
             ]
-            res = requests.post(
-                GROQ_API_URL,
-                headers={
-                    "Authorization": f"Bearer {GROQ_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json={"model": self.model, "messages": messages}
-            )
-            res.raise_for_status()
-            reply = res.json()["choices"][0]["message"]["content"]
-            return reply.strip()
+            return self._chat_completion(messages, priority=PRIORITY_BACKGROUND, session_key=session_key)
+
+        return translate_chunk
+
+    def _translate_text(self, text, target_language, message_id=None):
+        """Translate text to the target language using the Groq API (cached, chunked in parallel)."""
+        try:
+            return translate_text(text, target_language, self._translation_fn(), message_id=message_id)
         except Exception as e:
-            return f"❌ Translation error: {e}"
\ No newline at end of file
+            return f"❌ Translation error: {e}"
+
+    def _translate_emails(self, email_indices, target_language):
+        """Translate several listed emails concurrently; the web UI receives results as they finish"""
+        email_list = session.get("last_email_list", []) if has_request_context() else []
+        if not email_list or len(email_list) < max(email_indices):
+            email_result = read_emails_by_category(count=max(20, max(email_indices)), label="INBOX")
+            email_list = email_result.get("emails", [])
+            if has_request_context():
+                session["last_email_list"] = email_list
+
+        selected = [(idx, email_list[idx - 1]) for idx in email_indices if 1 <= idx <= len(email_list)]
+        if not selected:
+            return {"error": "None of those emails were found. Please list emails first."}
+        bodies = get_email_bodies([email.get("id") for _, email in selected])
+        items = [(email.get("id"), bodies.get(email.get("id"), "")) for _, email in selected]
+        language = target_language.title()
+
+        def details(position, translated, error):
+            idx, email = selected[position]
+            return {
+                "action": "translated_email",
+                "email_index": idx,
+                "email": {
+                    "sender": email.get("sender", "Unknown"),
+                    "subject": email.get("subject", "(No Subject)"),
+                    "date": email.get("date", ""),
+                    "original_body": bodies.get(email.get("id"), ""),
+                    "translated_body": translated if error is None else f"❌ Translation error: {error}",
+                    "target_language": language
+                }
+            }
+
+        if has_request_context():
+            job_id = translation_jobs.start(
+                get_session_key(), items, target_language, self._translation_fn(),
+                lambda position, translated, error: self._format_translated_email(details(position, translated, error))
+            )
+            return {"action": "translated_emails", "job_id": job_id, "email_indices": [idx for idx, _ in selected], "target_language": language}
+
+        # CLI: no polling client, so collect everything and keep the original order
+        results = sorted(translate_batch(items, target_language, self._translation_fn()))
+        return {
+            "action": "translated_emails",
+            "results": [details(position, translated, error) for position, translated, error in results],
+            "email_indices": [idx for idx, _ in selected],
+            "target_language": language
+        }
+
+    def _format_translated_batch(self, result):
+        indices = ", ".join(str(idx) for idx in result.get("email_indices", []))
+        language = result.get("target_language", "")
+        if result.get("job_id"):
+            return (
+                f"🌐 <strong>Translating emails {indices} to {language}...</strong><br>"
+                f"<div class='translation-batch' data-job-id='{result['job_id']}'></div>"
+            )
+        return "<br>".join(self._format_translated_email(details) for details in result.get("results", []))
@@ -1,9 +1,12 @@
 # iata_codes.py
 
 import json
+import logging
 from pathlib import Path
 from rapidfuzz import process
 
+logger = logging.getLogger(__name__)
+
 IATA_CODES = {
     "mumbai": "BOM",
     "delhi": "DEL",
@@ -159,7 +162,7 @@ def get_iata_code(city_name):
 
     # Step 1: Check direct alias match
     if city in CITY_ALIASES:
-        print(f"🔁 Correct match: '{original_input}' → '{CITY_ALIASES[city]}'")
+        logger.debug("🔁 Correct match: '%s' → '%s'", original_input, CITY_ALIASES[city])
         city = CITY_ALIASES[city]
 
     # Step 2: Check IATA_CODES
@@ -171,7 +174,7 @@ def get_iata_code(city_name):
     alias_match, alias_score, _ = process.extractOne(city, CITY_ALIASES.keys())
     if alias_score >= 90:
         canonical = CITY_ALIASES[alias_match]
-        print(f"🔍 Fuzzy alias match: '{city}' → '{alias_match}' → '{canonical}'")
+        logger.debug("🔍 Fuzzy alias match: '%s' → '%s' → '%s'", city, alias_match, canonical)
         if canonical in IATA_CODES:
             #print(f"✅ Found IATA code for '{canonical}': {IATA_CODES[canonical]}")
             return IATA_CODES[canonical]
@@ -179,10 +182,10 @@ def get_iata_code(city_name):
     # Step 4: Try fuzzy match directly against IATA_CODES
     match, score, _ = process.extractOne(city, IATA_CODES.keys())
     if score >= FUZZY_MATCH_THRESHOLD:
-        print(f"🔍 Fuzzy IATA match: '{city}' → '{match}' (score: {score})")
+        logger.debug("🔍 Fuzzy IATA match: '%s' → '%s' (score: %s)", city, match, score)
         return IATA_CODES[match]
 
-    print(f"❌ IATA code not found for '{original_input}' in local database.")
+    logger.info("❌ IATA code not found for '%s' in local database.", original_input)
     #_log_unknown_city(city)
     return None
 
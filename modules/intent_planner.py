@@ -0,0 +1,85 @@
+# modules/intent_planner.py
+
+import os
+import re
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from flask import has_request_context, copy_current_request_context
+
+PLANNER_MAX_WORKERS = int(os.getenv("PLANNER_MAX_WORKERS", "4"))
+PLANNER_MAX_INTENTS = 4
+
+logger = logging.getLogger(__name__)
+
+# "show my events and my 5 latest social emails", "list holidays; then show inbox"
+SPLIT_PATTERN = re.compile(r"\s*;\s*|,?\s+(?:and\s+(?:also\s+|then\s+)?|then\s+|also\s+|plus\s+)", re.IGNORECASE)
+# Requests whose free text legitimately contains "and": email bodies, recipient lists, ranges, index lists
+NO_SPLIT_PATTERN = re.compile(
+    r"\b(send|compose|write|draft|reply|respond|translate|between|saying|subject|body|invite)\b|@",
+    re.IGNORECASE
+)
+
+# Steps that change mail or calendar state; they run on their own, in the order they were asked for
+MUTATING_PATTERN = re.compile(
+    r"\b(send|create|add|schedule|set|make|book|arrange|organi[sz]e|delete|remove|cancel|clear|"
+    r"reply|respond|edit|change|update|move|reschedule|forward|draft)\b",
+    re.IGNORECASE
+)
+
+_executor = ThreadPoolExecutor(max_workers=PLANNER_MAX_WORKERS, thread_name_prefix="planner")
+
+def plan_intents(user_input, is_tool_request):
+    """Split a compound prompt into independent tool requests, or return [user_input]"""
+    if NO_SPLIT_PATTERN.search(user_input):
+        return [user_input]
+    parts = [part.strip(" ,.") for part in SPLIT_PATTERN.split(user_input)]
+    parts = [part for part in parts if part]
+    if not 2 <= len(parts) <= PLANNER_MAX_INTENTS:
+        return [user_input]
+    # Only split when every piece stands on its own as a tool call
+    if not all(is_tool_request(part) for part in parts):
+        return [user_input]
+    return parts
+
+def is_mutating(step):
+    return bool(MUTATING_PATTERN.search(step))
+
+def _bind(fn):
+    """Carry the Flask request (session) and tracing context into a worker thread"""
+    if has_request_context():
+        fn = copy_current_request_context(fn)
+    ctx = contextvars.copy_context()
+    return lambda *args: ctx.run(fn, *args)
+
+def _result(step, fn):
+    try:
+        return fn()
+    except Exception as e:
+        logger.warning("Planned step %r failed: %s", step, e)
+        return f"❌ Error: {e}"
+
+def execute_plan(steps, execute_fn):
+    """
+    Run execute_fn(step) for every step; results come back in plan order.
+
+    Consecutive read-only steps run concurrently. A mutating step waits for the reads before it,
+    runs alone, and finishes before anything after it starts, so "list my events and delete all
+    events" lists what was there before the delete.
+    """
+    results = [None] * len(steps)
+    running = []  # (position, future) of the current group of reads
+
+    def collect():
+        for position, future in running:
+            results[position] = _result(steps[position], future.result)
+        running.clear()
+
+    for position, step in enumerate(steps):
+        if is_mutating(step):
+            collect()
+            results[position] = _result(step, lambda: execute_fn(step))
+        else:
+            running.append((position, _executor.submit(_bind(execute_fn), step)))
+    collect()
+    return results
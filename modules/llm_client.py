@@ -0,0 +1,113 @@
+# modules/llm_client.py
+
+import os
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from huggingface_hub import InferenceClient
+from dotenv import load_dotenv
+from modules.llm_scheduler import llm_scheduler, RateLimitError, RequestCancelled, PRIORITY_INTERACTIVE
+from modules.session_context import get_session_key
+from modules.tracing import span
+
+load_dotenv()
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+HF_TOKEN = os.getenv("HF_TOKEN")
+
+DEFAULT_COMPLETION_TOKENS = 512
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+
+# One keep-alive connection pool for every Groq call instead of a new TCP/TLS handshake per request
+groq_session = requests.Session()
+groq_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+groq_session.headers.update({
+    "Authorization": f"Bearer {GROQ_API_KEY}",
+    "Content-Type": "application/json"
+})
+
+hf_client = InferenceClient(
+    provider="auto",
+    api_key=HF_TOKEN,
+)
+
+def is_configured(provider):
+    return bool({"groq": GROQ_API_KEY, "huggingface": HF_TOKEN}.get(provider))
+
+def estimate_prompt_tokens(messages):
+    """Rough token count of a chat prompt (~4 characters per token)"""
+    return sum(len(m.get("content") or "") for m in messages) // 4 + 4 * len(messages)
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+def _groq_chat(model, messages, max_tokens=None, temperature=None):
+    payload = {"model": model, "messages": messages}
+    if max_tokens:
+        payload["max_tokens"] = max_tokens
+    if temperature is not None:
+        payload["temperature"] = temperature
+    res = groq_session.post(GROQ_API_URL, json=payload, timeout=LLM_REQUEST_TIMEOUT)
+    if res.status_code == 429:
+        raise RateLimitError("Groq rate limit reached", retry_after=_retry_after(res))
+    res.raise_for_status()
+    data = res.json()
+    return data["choices"][0]["message"]["content"], data.get("usage", {}).get("total_tokens")
+
+def _hf_chat(model, messages, max_tokens=None, temperature=None):
+    try:
+        completion = hf_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature,
+        )
+    except Exception as e:
+        response = getattr(e, "response", None)
+        if getattr(response, "status_code", None) == 429:
+            raise RateLimitError("HuggingFace rate limit reached", retry_after=_retry_after(response))
+        raise
+    usage = getattr(completion, "usage", None)
+    return completion.choices[0].message.content, getattr(usage, "total_tokens", None)
+
+PROVIDER_CALLS = {
+    "groq": _groq_chat,
+    "huggingface": _hf_chat,
+}
+
+def chat_completion(provider, model, messages, max_tokens=None, temperature=None,
+                    priority=PRIORITY_INTERACTIVE, session_key=None, cancel_event=None, timing=None):
+    """
+    Run a chat completion through the rate-limit-aware scheduler and return the reply text.
+    If given, timing["request_seconds"] receives the provider round trip without scheduler queueing.
+    """
+    call = PROVIDER_CALLS[provider]
+    est_tokens = estimate_prompt_tokens(messages) + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+    def timed_call():
+        # The scheduler drops a request cancelled while queued; this catches one cancelled right after admission
+        if cancel_event is not None and cancel_event.is_set():
+            raise RequestCancelled(f"{provider} request cancelled")
+        started = time.perf_counter()
+        with span("llm.request"):
+            result = call(model, messages, max_tokens=max_tokens, temperature=temperature)
+        if timing is not None:
+            timing["request_seconds"] = time.perf_counter() - started
+        return result
+
+    # "llm" includes scheduler queueing; "llm.request" is the provider round trip alone
+    with span("llm"):
+        reply, used_tokens = llm_scheduler.run(
+            provider,
+            timed_call,
+            session_key=session_key or get_session_key(),
+            priority=priority,
+            est_tokens=est_tokens,
+            cancel_event=cancel_event
+        )
+    llm_scheduler.record_usage(provider, est_tokens, used_tokens)
+    return reply
@@ -0,0 +1,200 @@
+# modules/llm_failover.py
+
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from modules.llm_client import chat_completion, is_configured, RequestCancelled
+from modules.llm_scheduler import PRIORITY_INTERACTIVE, SchedulerTimeout
+from modules.model_router import MODEL_TIERS
+from modules.session_context import get_session_key
+
+LLM_FAILOVER_ENABLED = os.getenv("LLM_FAILOVER_ENABLED", "1") == "1"
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "1") == "1"
+HEDGE_DEFAULT_DEADLINE = float(os.getenv("HEDGE_DEFAULT_DEADLINE", "8"))  # until enough samples exist
+HEDGE_MIN_DEADLINE = float(os.getenv("HEDGE_MIN_DEADLINE", "1.5"))
+HEDGE_MAX_DEADLINE = float(os.getenv("HEDGE_MAX_DEADLINE", "20"))
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+HEALTH_ALPHA = 0.2
+PROVIDER_MIN_HEALTH = float(os.getenv("PROVIDER_MIN_HEALTH", "0.5"))
+PROVIDER_FAILURE_THRESHOLD = 3  # consecutive failures before a provider is bypassed
+PROVIDER_COOLDOWN_SECONDS = float(os.getenv("PROVIDER_COOLDOWN_SECONDS", "30"))
+
+PROVIDER_FALLBACKS = {"groq": "huggingface", "huggingface": "groq"}
+
+logger = logging.getLogger(__name__)
+
+class ProviderStats:
+    """Recent latencies and a health score for one provider"""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.health = 1.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.hedges = 0
+        self.fallback_wins = 0
+
+    def p95(self):
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def available(self, now):
+        return now >= self.cooldown_until
+
+class FailoverClient:
+    """Chat completions across Groq and HuggingFace with hedging, failover and health scoring"""
+
+    def __init__(self, providers=("groq", "huggingface")):
+        self.stats = {name: ProviderStats(name) for name in providers}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+
+    def equivalent_model(self, provider, model, target):
+        """Map a model of one provider to the same tier on another"""
+        tiers = MODEL_TIERS.get(provider, {})
+        tier = next((name for name, name_model in tiers.items() if name_model == model), "large")
+        return MODEL_TIERS[target][tier]
+
+    def candidates(self, primary):
+        """Primary first, then the fallback; unhealthy providers go last rather than disappearing"""
+        order = [primary]
+        fallback = PROVIDER_FALLBACKS.get(primary)
+        if LLM_FAILOVER_ENABLED and fallback and is_configured(fallback):
+            order.append(fallback)
+        now = time.time()
+        with self._lock:
+            healthy = [name for name in order if self.stats[name].available(now)]
+        return healthy + [name for name in order if name not in healthy]
+
+    def hedge_deadline(self, provider):
+        with self._lock:
+            p95 = self.stats[provider].p95()
+        if p95 is None:
+            return HEDGE_DEFAULT_DEADLINE
+        return min(max(p95, HEDGE_MIN_DEADLINE), HEDGE_MAX_DEADLINE)
+
+    def complete(self, primary, model, messages, max_tokens=None, temperature=None,
+                 priority=PRIORITY_INTERACTIVE, session_key=None, hedge=None):
+        """Return reply text; hedge defaults to on for interactive requests"""
+        session_key = session_key or get_session_key()
+        if hedge is None:
+            hedge = priority == PRIORITY_INTERACTIVE
+        order = self.candidates(primary)
+        if order[0] != primary:
+            logger.warning("Provider %s is unhealthy; using %s first", primary, order[0])
+
+        # Each attempt gets its own cancel flag. It only stops a loser still queued in the scheduler, which then
+        # leaves the queue without using quota; one already sent to its provider runs to completion.
+        attempts = {}
+
+        def launch(provider):
+            cancel = threading.Event()
+            provider_model = model if provider == primary else self.equivalent_model(primary, model, provider)
+            ctx = contextvars.copy_context()
+            future = self._executor.submit(
+                ctx.run, self._call, provider, provider_model, messages, max_tokens, temperature, priority, session_key, cancel
+            )
+            attempts[future] = (provider, cancel)
+            return future
+
+        pending = {launch(order[0])}
+        remaining = order[1:]
+        last_error = None
+        deadline = self.hedge_deadline(order[0]) if hedge and LLM_HEDGING_ENABLED else None
+
+        while pending:
+            done, pending = wait(pending, timeout=deadline if remaining else None, return_when=FIRST_COMPLETED)
+            if not done:
+                # Primary is slower than its p95: race the next provider against it
+                provider = remaining.pop(0)
+                logger.info("Hedging %s request to %s after %.1fs", order[0], provider, deadline)
+                with self._lock:
+                    self.stats[provider].hedges += 1
+                pending.add(launch(provider))
+                continue
+            for future in done:
+                provider, _ = attempts[future]
+                try:
+                    reply = future.result()
+                except Exception as e:
+                    last_error = e
+                    logger.warning("%s request failed: %s", provider, e)
+                    continue
+                for other in pending:
+                    attempts[other][1].set()  # drops it if still queued; an in-flight request still finishes
+                if provider != order[0]:
+                    with self._lock:
+                        self.stats[provider].fallback_wins += 1
+                return reply
+            if not pending and remaining:
+                # Failed outright: fail over without waiting for a deadline
+                pending.add(launch(remaining.pop(0)))
+
+        raise last_error or RuntimeError("No LLM provider available")
+
+    def _call(self, provider, model, messages, max_tokens, temperature, priority, session_key, cancel):
+        # Only the provider round trip is recorded: queueing in the token bucket grows with load,
+        # and counting it would push the hedge deadline out exactly when queues are long
+        timing = {}
+        try:
+            reply = chat_completion(
+                provider, model, messages, max_tokens=max_tokens, temperature=temperature,
+                priority=priority, session_key=session_key, cancel_event=cancel, timing=timing
+            )
+        except (RequestCancelled, SchedulerTimeout):
+            # Our own queueing, not the provider: local load must not push a healthy provider into cooldown
+            raise
+        except Exception:
+            self._record(provider, None)
+            raise
+        self._record(provider, timing.get("request_seconds"))
+        return reply
+
+    def _record(self, provider, latency):
+        now = time.time()
+        with self._lock:
+            stats = self.stats[provider]
+            stats.requests += 1
+            success = latency is not None
+            stats.health = (1 - HEALTH_ALPHA) * stats.health + HEALTH_ALPHA * (1.0 if success else 0.0)
+            if success:
+                stats.latencies.append(latency)
+                stats.consecutive_failures = 0
+                return
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            if stats.consecutive_failures >= PROVIDER_FAILURE_THRESHOLD or stats.health < PROVIDER_MIN_HEALTH:
+                stats.cooldown_until = now + PROVIDER_COOLDOWN_SECONDS
+                # Let it back in with a neutral score once the cooldown expires
+                stats.health = max(stats.health, PROVIDER_MIN_HEALTH)
+                stats.consecutive_failures = 0
+                logger.warning("Bypassing %s for %.0fs after repeated failures", provider, PROVIDER_COOLDOWN_SECONDS)
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            return {
+                name: {
+                    "health": round(s.health, 3),
+                    "available": s.available(now),
+                    "cooldown_remaining": max(0.0, round(s.cooldown_until - now, 1)),
+                    "p95_seconds": round(s.p95(), 3) if s.p95() is not None else None,
+                    "requests": s.requests,
+                    "failures": s.failures,
+                    "hedges": s.hedges,
+                    "fallback_wins": s.fallback_wins,
+                }
+                for name, s in self.stats.items()
+            }
+
+llm_failover = FailoverClient()
@@ -0,0 +1,198 @@
+# modules/llm_scheduler.py
+
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from itertools import count
+
+PRIORITY_INTERACTIVE = 0  # chat turns a user is waiting on
+PRIORITY_BACKGROUND = 1   # translation, draft generation, summarization
+
+LLM_MAX_QUEUE_WAIT = float(os.getenv("LLM_MAX_QUEUE_WAIT", "30"))
+RATE_LIMIT_DEFAULT_BACKOFF = 5.0
+CANCEL_POLL_SECONDS = 0.1  # how often a queued request with a cancel flag checks it
+
+PROVIDER_LIMITS = {
+    "groq": {
+        "rpm": int(os.getenv("GROQ_RPM", "30")),
+        "tpm": int(os.getenv("GROQ_TPM", "6000")),
+        "concurrency": int(os.getenv("GROQ_MAX_CONCURRENCY", "8")),
+    },
+    "huggingface": {
+        "rpm": int(os.getenv("HF_RPM", "60")),
+        "tpm": int(os.getenv("HF_TPM", "20000")),
+        "concurrency": int(os.getenv("HF_MAX_CONCURRENCY", "8")),
+    },
+}
+
+class SchedulerTimeout(Exception):
+    """Raised when a request could not be admitted within its queueing deadline"""
+
+class RequestCancelled(Exception):
+    """The caller no longer needs the reply (e.g. a hedged request already won)"""
+
+class RateLimitError(Exception):
+    """Raised by provider calls on HTTP 429 so the scheduler can back off and retry"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at capacity per minute"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def consume(self, amount, now):
+        self._refill(now)
+        self.level -= amount
+
+class _ProviderState:
+    def __init__(self, limits):
+        self.requests = TokenBucket(limits["rpm"])
+        self.tokens = TokenBucket(limits["tpm"])
+        self.concurrency = limits["concurrency"]
+        self.in_flight = 0
+        self.paused_until = 0.0
+        # priority -> session_key -> deque of tickets; sessions rotate round-robin
+        self.queues = {PRIORITY_INTERACTIVE: OrderedDict(), PRIORITY_BACKGROUND: OrderedDict()}
+
+    def head(self):
+        for priority in sorted(self.queues):
+            sessions = self.queues[priority]
+            if sessions:
+                first_session = next(iter(sessions))
+                return sessions[first_session][0]
+        return None
+
+    def wait_time(self, tokens, now):
+        return max(
+            self.paused_until - now,
+            self.requests.wait_time(1, now),
+            self.tokens.wait_time(min(tokens, self.tokens.capacity), now)
+        )
+
+class LLMScheduler:
+    """Admits LLM calls within per-provider RPM/TPM quotas, fairly across sessions"""
+
+    def __init__(self, limits=PROVIDER_LIMITS):
+        self._cond = threading.Condition()
+        self._providers = {name: _ProviderState(provider_limits) for name, provider_limits in limits.items()}
+        self._ticket_ids = count()
+        self.stats = {"admitted": 0, "timeouts": 0, "rate_limited": 0, "queue_wait_total": 0.0}
+
+    def run(self, provider, fn, session_key="cli", priority=PRIORITY_INTERACTIVE, est_tokens=500, max_wait=LLM_MAX_QUEUE_WAIT,
+            cancel_event=None):
+        """
+        Run fn() once admitted; 429s are turned into queueing delay until max_wait runs out.
+        A request whose cancel_event is set while queued leaves the queue without using any quota.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            self._acquire(provider, session_key, priority, est_tokens, deadline, cancel_event)
+            try:
+                return fn()
+            except RateLimitError as e:
+                self._pause(provider, e.retry_after)
+                if time.monotonic() >= deadline:
+                    raise SchedulerTimeout(f"{provider} rate limit persisted past {max_wait:.0f}s: {e}")
+            finally:
+                self._release(provider)
+
+    def record_usage(self, provider, estimated_tokens, actual_tokens):
+        """Correct the token bucket once the provider reports real usage"""
+        if not actual_tokens:
+            return
+        with self._cond:
+            state = self._providers[provider]
+            state.tokens.consume(actual_tokens - estimated_tokens, time.monotonic())
+
+    def snapshot(self):
+        with self._cond:
+            queued = {
+                name: sum(len(tickets) for sessions in state.queues.values() for tickets in sessions.values())
+                for name, state in self._providers.items()
+            }
+            return {**self.stats, "queued": queued}
+
+    def _acquire(self, provider, session_key, priority, est_tokens, deadline, cancel_event=None):
+        state = self._providers[provider]
+        ticket = next(self._ticket_ids)
+        enqueued_at = time.monotonic()
+        with self._cond:
+            state.queues[priority].setdefault(session_key, deque()).append(ticket)
+            while True:
+                now = time.monotonic()
+                if cancel_event is not None and cancel_event.is_set():
+                    self._dequeue(state, priority, session_key, ticket)
+                    self._cond.notify_all()
+                    raise RequestCancelled(f"{provider} request cancelled while queued")
+                wait = None
+                if state.head() == ticket and state.in_flight < state.concurrency:
+                    wait = state.wait_time(est_tokens, now)
+                    if wait <= 0:
+                        state.requests.consume(1, now)
+                        state.tokens.consume(min(est_tokens, state.tokens.capacity), now)
+                        state.in_flight += 1
+                        self._dequeue(state, priority, session_key)
+                        self.stats["admitted"] += 1
+                        self.stats["queue_wait_total"] += now - enqueued_at
+                        self._cond.notify_all()
+                        return
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._dequeue(state, priority, session_key, ticket)
+                    self.stats["timeouts"] += 1
+                    self._cond.notify_all()
+                    # The queue is unbounded: this is the wait deadline (LLM_MAX_QUEUE_WAIT) running out
+                    raise SchedulerTimeout(
+                        f"{provider} request waited {now - enqueued_at:.0f}s for rate-limit capacity without being admitted, "
+                        "please try again shortly"
+                    )
+                timeout = min(wait, remaining) if wait else remaining
+                if cancel_event is not None:
+                    timeout = min(timeout, CANCEL_POLL_SECONDS)  # nothing notifies us when the flag is set
+                self._cond.wait(timeout=timeout)
+
+    def _dequeue(self, state, priority, session_key, ticket=None):
+        sessions = state.queues[priority]
+        tickets = sessions[session_key]
+        if ticket is None:
+            tickets.popleft()
+        else:
+            tickets.remove(ticket)
+        if not tickets:
+            del sessions[session_key]
+        elif ticket is None:
+            # Served one request for this session; let the others go first
+            sessions.move_to_end(session_key)
+
+    def _release(self, provider):
+        with self._cond:
+            self._providers[provider].in_flight -= 1
+            self._cond.notify_all()
+
+    def _pause(self, provider, retry_after):
+        with self._cond:
+            state = self._providers[provider]
+            state.paused_until = max(state.paused_until, time.monotonic() + (retry_after or RATE_LIMIT_DEFAULT_BACKOFF))
+            self.stats["rate_limited"] += 1
+            self._cond.notify_all()
+
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,135 @@
+# modules/mail_body.py
+
+import os
+import re
+import base64
+import binascii
+import logging
+from html.parser import HTMLParser
+
+EMAIL_BODY_MAX_CHARS = int(os.getenv("EMAIL_BODY_MAX_CHARS", "20000"))
+TRUNCATION_MARKER = "\n\n[... message truncated ...]"
+PART_SEPARATOR = "\n\n---\n\n"
+HTML_FEED_CHUNK = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+CHARSET_PATTERN = re.compile(r'charset="?([\w.:-]+)"?', re.IGNORECASE)
+SKIPPED_TAGS = frozenset(("script", "style", "head", "title", "noscript", "template", "svg"))
+BLOCK_TAGS = frozenset((
+    "p", "div", "br", "li", "tr", "table", "section", "article", "header", "footer", "blockquote",
+    "h1", "h2", "h3", "h4", "h5", "h6", "hr", "ul", "ol", "pre",
+))
+
+class HTMLTextExtractor(HTMLParser):
+    """Streaming HTML to text: drops script/style/head, breaks lines at block tags, stops at max_chars"""
+
+    def __init__(self, max_chars):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.length = 0
+        self.skip_depth = 0
+        self.pieces = []
+
+    @property
+    def full(self):
+        return self.length >= self.max_chars
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._append("\n")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self._append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif tag in BLOCK_TAGS:
+            self._append("\n")
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self._append(data)
+
+    def _append(self, text):
+        if not self.full:
+            self.pieces.append(text)
+            self.length += len(text)
+
+    def text(self):
+        lines = (" ".join(line.split()) for line in "".join(self.pieces).splitlines())
+        return "\n".join(line for line in lines if line)
+
+def html_to_text(html, max_chars=EMAIL_BODY_MAX_CHARS):
+    """Visible text of an HTML document, reading at most as far as max_chars of output"""
+    parser = HTMLTextExtractor(max_chars)
+    for start in range(0, len(html), HTML_FEED_CHUNK):
+        parser.feed(html[start:start + HTML_FEED_CHUNK])
+        if parser.full:
+            break
+    else:
+        parser.close()
+    return parser.text()
+
+def _charset(part):
+    for header in part.get('headers', []):
+        if header.get('name', '').lower() == 'content-type':
+            match = CHARSET_PATTERN.search(header.get('value', ''))
+            if match:
+                return match.group(1)
+    return 'utf-8'
+
+def _decode(part, max_chars):
+    """Decode a part's base64url body, never more than enough bytes for max_chars characters"""
+    data = part.get('body', {}).get('data', '')
+    if not data:
+        return ''
+    limit = (max_chars * 4 // 3 + 4) * 4  # up to 4 bytes per character, base64 adds a third
+    data = data[:limit - limit % 4]
+    try:
+        raw = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+    except (binascii.Error, ValueError):
+        return ''
+    try:
+        return raw.decode(_charset(part), errors='replace')
+    except LookupError:
+        return raw.decode('utf-8', errors='replace')
+
+def _truncate(text, max_chars):
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + TRUNCATION_MARKER
+
+def extract_body(payload, fallback='', max_chars=EMAIL_BODY_MAX_CHARS):
+    """
+    One walk over the MIME tree: all text/plain parts joined, else the first text/html part as
+    text, else fallback. Attachments are skipped and the result is capped at max_chars.
+    """
+    texts, used, first_html = [], 0, None
+    stack = [payload]
+    while stack and used < max_chars:
+        part = stack.pop()
+        mime_type = part.get('mimeType', '')
+        if mime_type.startswith('multipart/'):
+            stack.extend(reversed(part.get('parts', [])))
+        elif part.get('filename'):
+            continue
+        elif mime_type == 'text/plain':
+            text = _decode(part, max_chars - used + 1)  # one extra character tells us to truncate
+            if text:
+                texts.append(text)
+                used += len(text) + len(PART_SEPARATOR)
+        elif mime_type == 'text/html' and first_html is None:
+            first_html = part  # decoded only if no plain text turns up
+    if texts:
+        return _truncate(PART_SEPARATOR.join(texts), max_chars)
+    if first_html is not None:
+        # HTML is far longer than its text: decode generously, the parser stops at max_chars of output
+        text = html_to_text(_decode(first_html, max_chars * 20), max_chars + 1)
+        if text:
+            return _truncate(text, max_chars)
+    return fallback
@@ -0,0 +1,124 @@
+# modules/mail_compose.py
+
+import os
+import uuid
+import base64
+import logging
+import tempfile
+import mimetypes
+from email import policy
+from email.message import EmailMessage, Message
+from email.mime.text import MIMEText
+from googleapiclient.http import MediaFileUpload
+
+# Gmail rejects uploads above 35 MB; above the threshold the message goes up in resumable chunks
+GMAIL_UPLOAD_MAX_BYTES = 35 * 1024 * 1024
+GMAIL_RESUMABLE_THRESHOLD = int(os.getenv("GMAIL_RESUMABLE_THRESHOLD", str(5 * 1024 * 1024)))
+GMAIL_UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024  # must be a multiple of 256 KB
+ENCODE_CHUNK_SIZE = 57 * 1024  # 57 input bytes make one 76-character base64 line
+GENERIC_CONTENT_TYPES = ("", "application/octet-stream", "binary/octet-stream")
+
+logger = logging.getLogger(__name__)
+
+class MessageTooLargeError(ValueError):
+    pass
+
+def guess_content_type(filename, declared=None):
+    """The declared type if it says something, else one guessed from the file name"""
+    if declared and declared.lower() not in GENERIC_CONTENT_TYPES and "/" in declared:
+        return declared
+    guessed, encoding = mimetypes.guess_type(filename)
+    if guessed is None or encoding is not None:  # .tar.gz etc. are opaque archives, not their inner type
+        return "application/octet-stream"
+    return guessed
+
+def _header_block(message):
+    """Folded, RFC 2047-encoded headers of message plus the blank separator line, without any body"""
+    return b"".join(message.policy.fold_binary(name, value) for name, value in message.items()) + b"\r\n"
+
+def _attachment_headers(filename, content_type):
+    part = Message(policy=policy.SMTP)
+    part["Content-Type"] = content_type
+    part["Content-Transfer-Encoding"] = "base64"
+    part.add_header("Content-Disposition", "attachment", filename=filename)
+    return _header_block(part)
+
+def _write_base64(out, path):
+    """Stream a file into out as CRLF-wrapped base64, one chunk in memory at a time"""
+    with open(path, "rb") as source:
+        while True:
+            chunk = source.read(ENCODE_CHUNK_SIZE)
+            if not chunk:
+                break
+            out.write(base64.encodebytes(chunk).replace(b"\n", b"\r\n"))
+
+def write_message(out, to, subject, body, attachments=(), cc=(), bcc=(), message_id=None):
+    """
+    Write a multipart/mixed RFC 822 message to the binary file out.
+
+    Headers and the text part go through the email package; attachments are base64-encoded
+    straight from disk, so memory use does not depend on their size. Returns the attachments
+    actually written (missing files are skipped with a warning).
+    """
+    boundary = f"=_{uuid.uuid4().hex}"
+    headers = EmailMessage(policy=policy.SMTP)
+    headers["To"] = to
+    if cc:
+        headers["Cc"] = ", ".join(cc)
+    if bcc:
+        headers["Bcc"] = ", ".join(bcc)  # Gmail delivers to Bcc and strips the header
+    headers["Subject"] = subject
+    if message_id:
+        headers["Message-ID"] = message_id
+    headers["MIME-Version"] = "1.0"
+    headers["Content-Type"] = f'multipart/mixed; boundary="{boundary}"'
+    out.write(_header_block(headers))
+
+    delimiter = f"--{boundary}\r\n".encode()
+    text_part = MIMEText(body, "plain", "utf-8", policy=policy.SMTP)
+    del text_part["MIME-Version"]
+    out.write(delimiter + text_part.as_bytes() + b"\r\n")
+
+    written = []
+    for att in attachments:
+        filename, file_path = att.get("name"), att.get("path")
+        if not filename or not file_path or not os.path.exists(file_path):
+            logger.warning("Attachment missing or file not found: %s (%s)", filename, file_path)
+            continue
+        content_type = guess_content_type(filename, att.get("type"))
+        out.write(delimiter + _attachment_headers(filename, content_type))
+        _write_base64(out, file_path)
+        out.write(b"\r\n")
+        written.append(att)
+        logger.debug("Attached file: %s (%s) from %s", filename, content_type, file_path)
+    out.write(f"--{boundary}--\r\n".encode())
+    return written
+
+def build_message_file(to, subject, body, attachments=(), cc=(), bcc=(), message_id=None):
+    """Write the message to a temporary .eml file; returns (path, attachments written). Caller removes the file."""
+    with tempfile.NamedTemporaryFile(prefix="outgoing-", suffix=".eml", delete=False) as out:
+        try:
+            written = write_message(out, to, subject, body, attachments, cc, bcc, message_id)
+        except Exception:
+            out.close()
+            os.remove(out.name)
+            raise
+    return out.name, written
+
+def _upload_media(path):
+    size = os.path.getsize(path)
+    if size > GMAIL_UPLOAD_MAX_BYTES:
+        raise MessageTooLargeError(
+            f"Message is {size / (1024 * 1024):.1f} MB; Gmail accepts at most {GMAIL_UPLOAD_MAX_BYTES // (1024 * 1024)} MB"
+        )
+    resumable = size > GMAIL_RESUMABLE_THRESHOLD
+    logger.debug("Uploading %d byte message (%s)", size, "resumable" if resumable else "single request")
+    return MediaFileUpload(path, mimetype="message/rfc822", resumable=resumable, chunksize=GMAIL_UPLOAD_CHUNK_SIZE)
+
+def send_message_file(service, path):
+    """Send an RFC 822 file through Gmail's upload endpoint (resumable for large messages)"""
+    return service.users().messages().send(userId="me", body={}, media_body=_upload_media(path)).execute()
+
+def create_draft_file(service, path):
+    """Upload an RFC 822 file as a Gmail draft; returns the draft ({"id", "message"})"""
+    return service.users().drafts().create(userId="me", body={}, media_body=_upload_media(path)).execute()
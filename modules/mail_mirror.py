@@ -0,0 +1,392 @@
+# modules/mail_mirror.py
+
+import os
+import time
+import logging
+import sqlite3
+import threading
+from googleapiclient.errors import HttpError
+from modules.google_services import google_services, paginate, TOKEN_PATH
+from modules.mail_query import SEARCH_RESULT_LIMIT
+
+MAIL_MIRROR_DB = os.getenv("MAIL_MIRROR_DB")  # optional SQLite file; unset keeps every read live
+MAIL_MIRROR_BACKFILL = int(os.getenv("MAIL_MIRROR_BACKFILL", "500"))
+MAIL_MIRROR_SYNC_SECONDS = float(os.getenv("MAIL_MIRROR_SYNC_SECONDS", "60"))
+MAIL_MIRROR_MAX_STALENESS = float(os.getenv("MAIL_MIRROR_MAX_STALENESS", "300"))  # older than this: read live
+MIRROR_METADATA_HEADERS = ['From', 'Subject', 'Date']
+MIRROR_MESSAGE_FIELDS = "id,threadId,labelIds,snippet,historyId,internalDate,payload/headers"
+HISTORY_TYPES = ['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved']
+UNMIRRORED_LABELS = {"SPAM", "TRASH"}  # the backfill listing leaves these out
+
+logger = logging.getLogger(__name__)
+
+class HistoryExpiredError(Exception):
+    """Raised when Gmail no longer has history from the stored historyId (a full resync is needed)"""
+
+def _fts_phrase(text):
+    """Quote user text as an FTS5 phrase so operators and punctuation are taken literally"""
+    return '"' + text.replace('"', '""') + '"'
+
+def _header(headers, name, default):
+    return next((h['value'] for h in headers if h['name'] == name), default)
+
+class MailMirror:
+    """
+    Local SQLite copy of recent message metadata (and bodies, once opened).
+
+    An initial backfill stores the newest MAIL_MIRROR_BACKFILL messages; after that only
+    users.history.list deltas since the stored historyId are fetched.
+    """
+
+    def __init__(self, db_path=MAIL_MIRROR_DB, backfill=MAIL_MIRROR_BACKFILL, max_staleness=MAIL_MIRROR_MAX_STALENESS):
+        self.enabled = bool(db_path)
+        self.backfill = backfill
+        self.max_staleness = max_staleness
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._db = None
+        self.last_error = None
+        self.metrics = {"syncs": 0, "full_syncs": 0, "messages_added": 0, "messages_deleted": 0,
+                        "reads": 0, "body_hits": 0, "searches": 0}
+        if self.enabled:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id TEXT PRIMARY KEY, thread_id TEXT, internal_date INTEGER NOT NULL, "
+                "sender TEXT, subject TEXT, date TEXT, snippet TEXT, body TEXT, updated_at REAL NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS messages_by_date ON messages (internal_date DESC);"
+                "CREATE TABLE IF NOT EXISTS message_labels ("
+                "message_id TEXT NOT NULL, label TEXT NOT NULL, PRIMARY KEY (label, message_id));"
+                "CREATE INDEX IF NOT EXISTS labels_by_message ON message_labels (message_id);"
+                "CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+                # Full-text index; "body" holds the snippet until the full body has been fetched
+                "CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+                "message_id UNINDEXED, subject, sender, body, tokenize = 'porter unicode61');"
+            )
+            if not self._db.execute("SELECT 1 FROM messages_fts LIMIT 1").fetchone():
+                # Mirrors created before the index existed
+                self._db.execute(
+                    "INSERT INTO messages_fts (message_id, subject, sender, body) "
+                    "SELECT id, subject, sender, COALESCE(body, snippet) FROM messages"
+                )
+            self._db.commit()
+
+    # --- sync state ---
+
+    def _get_state(self, key):
+        row = self._db.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, key, value):
+        self._db.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def last_synced(self):
+        if not self.enabled:
+            return None
+        with self._lock:
+            value = self._get_state("last_synced")
+        return float(value) if value else None
+
+    def staleness(self):
+        """Seconds since the last successful sync, or None if it never synced"""
+        last = self.last_synced()
+        return None if last is None else time.time() - last
+
+    def is_fresh(self):
+        staleness = self.staleness()
+        return staleness is not None and staleness <= self.max_staleness
+
+    # --- writes ---
+
+    def _upsert(self, msg):
+        # Callers hold self._lock and commit
+        headers = msg.get('payload', {}).get('headers', [])
+        self._db.execute(
+            "INSERT INTO messages (id, thread_id, internal_date, sender, subject, date, snippet, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET "
+            "thread_id = excluded.thread_id, internal_date = excluded.internal_date, sender = excluded.sender, "
+            "subject = excluded.subject, date = excluded.date, snippet = excluded.snippet, "
+            "updated_at = excluded.updated_at",
+            (msg['id'], msg.get('threadId'), int(msg.get('internalDate', 0)),
+             _header(headers, 'From', '(Unknown Sender)'), _header(headers, 'Subject', '(No Subject)'),
+             _header(headers, 'Date', ''), msg.get('snippet', ''), time.time())
+        )
+        self._db.execute("DELETE FROM messages_fts WHERE message_id = ?", (msg['id'],))
+        self._db.execute(
+            "INSERT INTO messages_fts (message_id, subject, sender, body) "
+            "SELECT id, subject, sender, COALESCE(body, snippet) FROM messages WHERE id = ?",
+            (msg['id'],)
+        )
+        self._db.execute("DELETE FROM message_labels WHERE message_id = ?", (msg['id'],))
+        self._db.executemany(
+            "INSERT INTO message_labels (message_id, label) VALUES (?, ?)",
+            [(msg['id'], label) for label in msg.get('labelIds', [])]
+        )
+
+    def _store(self, messages):
+        with self._lock:
+            for msg in messages:
+                self._upsert(msg)
+            self._db.commit()
+
+    def _replace_all(self, messages):
+        """
+        Make the mirror hold exactly messages, in one transaction under the lock readers take, so a
+        resync never shows them an empty mirror. Bodies already fetched for kept messages survive.
+        """
+        with self._lock:
+            try:
+                self._db.execute("CREATE TEMP TABLE IF NOT EXISTS resync_ids (id TEXT PRIMARY KEY)")
+                self._db.execute("DELETE FROM resync_ids")
+                self._db.executemany("INSERT OR IGNORE INTO resync_ids (id) VALUES (?)", [(msg['id'],) for msg in messages])
+                for table, column in (("messages", "id"), ("message_labels", "message_id"), ("messages_fts", "message_id")):
+                    self._db.execute(f"DELETE FROM {table} WHERE {column} NOT IN (SELECT id FROM resync_ids)")
+                for msg in messages:
+                    self._upsert(msg)
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+
+    def _delete(self, message_ids):
+        with self._lock:
+            for message_id in message_ids:
+                self._db.execute("DELETE FROM messages WHERE id = ?", (message_id,))
+                self._db.execute("DELETE FROM message_labels WHERE message_id = ?", (message_id,))
+                self._db.execute("DELETE FROM messages_fts WHERE message_id = ?", (message_id,))
+            self._db.commit()
+
+    def store_body(self, message_id, body):
+        """Keep a body fetched by get_email_details so the next open is local"""
+        if not self.enabled or not message_id:
+            return
+        with self._lock:
+            self._db.execute("UPDATE messages SET body = ? WHERE id = ?", (body, message_id))
+            self._db.execute("UPDATE messages_fts SET body = ? WHERE message_id = ?", (body, message_id))
+            self._db.commit()
+
+    # --- reads ---
+
+    def list_messages(self, label, count):
+        """Newest messages carrying label, or None when the mirror can't answer (disabled, stale or too few)"""
+        if label in UNMIRRORED_LABELS or not self.is_fresh():
+            return None
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT m.id, m.sender, m.subject, m.snippet, m.date FROM messages m "
+                "JOIN message_labels l ON l.message_id = m.id WHERE l.label = ? "
+                "ORDER BY m.internal_date DESC LIMIT ?",
+                (label, count)
+            ).fetchall()
+            # Fewer rows than asked for may just mean older mail is beyond the backfill
+            total = self._db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+            self.metrics["reads"] += 1
+        if len(rows) < count and total >= self.backfill:
+            return None
+        return [{"id": r[0], "sender": r[1], "subject": r[2], "snippet": r[3], "date": r[4]} for r in rows]
+
+    def get_message(self, message_id):
+        """Mirrored message with its body, or None if unknown or its body was never fetched"""
+        # A message's headers and body never change, so staleness doesn't matter here
+        if not self.enabled:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, sender, subject, date, body FROM messages WHERE id = ? AND body IS NOT NULL", (message_id,)
+            ).fetchone()
+            if row:
+                self.metrics["body_hits"] += 1
+        if not row:
+            return None
+        return {"id": row[0], "sender": row[1], "subject": row[2], "date": row[3], "body": row[4]}
+
+    def get_bodies(self, message_ids):
+        if not self.enabled or not message_ids:
+            return {}
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT id, body FROM messages WHERE body IS NOT NULL AND id IN ({','.join('?' * len(message_ids))})",
+                list(message_ids)
+            ).fetchall()
+        return dict(rows)
+
+    def search(self, terms=(), sender=None, subject=None, after=None, before=None, labels=(),
+               limit=SEARCH_RESULT_LIMIT, offset=0):
+        """
+        Ranked local search: terms match subject, sender and body (subject weighs most), sender and
+        subject only their column, after/before bound the received time, every label must be present.
+        Spam and trash are left out unless labels asks for them.
+        None when the mirror can't answer (disabled, stale, or results may lie beyond the backfill).
+        """
+        if not self.is_fresh():
+            return None
+        match = [_fts_phrase(term) for term in terms]
+        if sender:
+            match.append(f"sender : {_fts_phrase(sender)}")
+        if subject:
+            match.append(f"subject : {_fts_phrase(subject)}")
+        where, params = [], []
+        if after:
+            where.append("m.internal_date >= ?")
+            params.append(int(after.timestamp() * 1000))
+        if before:
+            where.append("m.internal_date < ?")
+            params.append(int(before.timestamp() * 1000))
+        for label in labels:
+            where.append("m.id IN (SELECT message_id FROM message_labels WHERE label = ?)")
+            params.append(label)
+        hidden = sorted(UNMIRRORED_LABELS - set(labels))
+        if hidden:
+            # Like Gmail's q, leave out spam and trash unless asked for (delta sync can store both)
+            where.append(f"m.id NOT IN (SELECT message_id FROM message_labels WHERE label IN ({','.join('?' * len(hidden))}))")
+            params.extend(hidden)
+        if match:
+            sql = (
+                "SELECT m.id, m.sender, m.subject, m.snippet, m.date FROM messages_fts f "
+                "JOIN messages m ON m.id = f.message_id WHERE messages_fts MATCH ? "
+                + "".join(f"AND {clause} " for clause in where)
+                + "ORDER BY bm25(messages_fts, 0.0, 3.0, 2.0, 1.0), m.internal_date DESC LIMIT ? OFFSET ?"
+            )
+            params = [" AND ".join(match)] + params
+        else:
+            sql = (
+                "SELECT m.id, m.sender, m.subject, m.snippet, m.date FROM messages m "
+                + ("WHERE " + " AND ".join(where) + " " if where else "")
+                + "ORDER BY m.internal_date DESC LIMIT ? OFFSET ?"
+            )
+        with self._lock:
+            rows = self._db.execute(sql, params + [limit, offset]).fetchall()
+            total = self._db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+            self.metrics["searches"] += 1
+        if len(rows) < limit and total >= self.backfill:
+            return None  # older matches may exist that were never mirrored
+        return [{"id": r[0], "sender": r[1], "subject": r[2], "snippet": r[3], "date": r[4]} for r in rows]
+
+    # --- sync ---
+
+    def _fetch_metadata(self, service, message_ids):
+        requests = [
+            service.users().messages().get(
+                userId='me', id=message_id, format='metadata',
+                metadataHeaders=MIRROR_METADATA_HEADERS, fields=MIRROR_MESSAGE_FIELDS
+            )
+            for message_id in message_ids
+        ]
+        fetched, missing = [], []
+        for message_id, (msg, error) in zip(message_ids, google_services.execute_batch(service, requests)):
+            if error is None:
+                fetched.append(msg)
+            elif getattr(getattr(error, "resp", None), "status", None) == 404:
+                missing.append(message_id)  # deleted since the history entry was written
+            else:
+                logger.warning("Mirror could not fetch message %s: %s", message_id, error)
+        return fetched, missing
+
+    def _full_sync(self, service):
+        # Take the historyId first so changes made during the backfill are replayed by the next delta sync
+        history_id = service.users().getProfile(userId='me', fields='historyId').execute()['historyId']
+        message_ids = [
+            msg['id'] for msg in paginate(
+                service.users().messages().list, 'messages', limit=self.backfill, page_size=500,
+                userId='me', fields='messages/id,nextPageToken'
+            )
+        ]
+        fetched, _ = self._fetch_metadata(service, message_ids)
+        self._replace_all(fetched)
+        self.metrics["full_syncs"] += 1
+        self.metrics["messages_added"] += len(fetched)
+        return history_id
+
+    def _delta_sync(self, service, start_history_id):
+        changed, deleted = set(), set()
+        latest = start_history_id
+        records = paginate(
+            service.users().history().list, 'history', page_size=500,
+            userId='me', startHistoryId=start_history_id, historyTypes=HISTORY_TYPES
+        )
+        try:
+            for record in records:
+                for kind in ('messagesAdded', 'labelsAdded', 'labelsRemoved'):
+                    changed.update(item['message']['id'] for item in record.get(kind, []))
+                deleted.update(item['message']['id'] for item in record.get('messagesDeleted', []))
+                latest = max(latest, record['id'], key=int)
+        except HttpError as e:
+            if e.resp.status == 404:
+                raise HistoryExpiredError(start_history_id) from e
+            raise
+        changed -= deleted
+        if changed:
+            fetched, missing = self._fetch_metadata(service, sorted(changed))
+            self._store(fetched)
+            deleted.update(missing)
+            self.metrics["messages_added"] += len(fetched)
+        if deleted:
+            self._delete(deleted)
+            self.metrics["messages_deleted"] += len(deleted)
+        return latest
+
+    def sync(self):
+        """Bring the mirror up to date; returns False when disabled, unauthorised or failing"""
+        if not self.enabled or not os.path.exists(TOKEN_PATH):
+            return False
+        with self._sync_lock:
+            try:
+                service = google_services.get_gmail_service()
+                with self._lock:
+                    history_id = self._get_state("history_id")
+                try:
+                    history_id = self._delta_sync(service, history_id) if history_id else self._full_sync(service)
+                except HistoryExpiredError:
+                    logger.info("Gmail history from %s has expired; resyncing the mirror", history_id)
+                    history_id = self._full_sync(service)
+                with self._lock:
+                    self._set_state("history_id", history_id)
+                    self._set_state("last_synced", time.time())
+                    self._db.commit()
+                self.metrics["syncs"] += 1
+                self.last_error = None
+                return True
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning("Mail mirror sync failed: %s", e)
+                return False
+
+    def status(self):
+        if not self.enabled:
+            return {"enabled": False}
+        staleness = self.staleness()
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+            bodies = self._db.execute("SELECT COUNT(*) FROM messages WHERE body IS NOT NULL").fetchone()[0]
+            history_id = self._get_state("history_id")
+        return {
+            "enabled": True,
+            "fresh": staleness is not None and staleness <= self.max_staleness,
+            "staleness_seconds": round(staleness, 1) if staleness is not None else None,
+            "history_id": history_id,
+            "messages": count,
+            "bodies": bodies,
+            "last_error": self.last_error,
+            **self.metrics,
+        }
+
+mail_mirror = MailMirror()
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def _sync_loop(interval):
+    while True:
+        mail_mirror.sync()
+        time.sleep(interval)
+
+def start_sync_worker(interval=MAIL_MIRROR_SYNC_SECONDS):
+    """Keep the mirror fresh from a daemon thread; a no-op when the mirror is disabled or already running"""
+    global _worker
+    if not mail_mirror.enabled:
+        return None
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_sync_loop, args=(interval,), name="mail-mirror-sync", daemon=True)
+            _worker.start()
+    return _worker
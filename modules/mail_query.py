@@ -0,0 +1,203 @@
+# modules/mail_query.py
+
+import re
+from datetime import datetime, timedelta
+from modules.temporal_parser import parse_datetime, MONTHS
+
+SEARCH_RESULT_LIMIT = 10
+
+# "search emails for invoice", "find mails from hr about leave", "emails from alice last week"
+SEARCH_REQUEST_PATTERN = re.compile(
+    r"\b(?:search|find|look\s+for|look\s+up)\b.*\b(?:e?-?mails?|messages?|inbox)\b"
+    r"|\b(?:search|find)\s+(?:my\s+)?(?:e?-?mails?|messages?|inbox)\b"
+    r"|\b(?:e?-?mails?|messages?)\s+(?:from|about|regarding|mentioning|containing|with\s+(?:the\s+)?subject|with\s+attachments?)\b",
+    re.IGNORECASE
+)
+
+_STOP = r"(?=\s+(?:about|regarding|mentioning|containing|with|from|in|on|since|after|before|between|during|last|this|past|yesterday|today)\b|[?.!,]*$)"
+SENDER_PATTERN = re.compile(rf"\bfrom\s+(?!last\b|this\b|the\s+last\b)(.+?){_STOP}", re.IGNORECASE)
+BETWEEN_PATTERN = re.compile(r"\bbetween\s+(.+?)\s+and\s+(.+?)(?=\s+(?:about|regarding|from|with)\b|[?.!]*$)", re.IGNORECASE)
+SINCE_PATTERN = re.compile(rf"\b(since|after|before)\s+(.+?){_STOP}", re.IGNORECASE)
+LAST_N_PATTERN = re.compile(r"\b(?:in\s+the\s+)?(?:last|past)\s+(\d+)\s+(day|week|month)s?\b", re.IGNORECASE)
+PERIOD_PATTERN = re.compile(
+    rf"\b(?:(last|this|past)\s+(week|month|year)|yesterday|today|(?:in|during)\s+({'|'.join(sorted(MONTHS, key=len, reverse=True))}))\b",
+    re.IGNORECASE
+)
+UNREAD_PATTERN = re.compile(r"\bunread\b|\bnot\s+(?:yet\s+)?read\b", re.IGNORECASE)
+ATTACHMENT_PATTERN = re.compile(
+    r"\b(?:with|having|that\s+have|which\s+have|has|have)\s+(?:an?\s+|any\s+)?attachments?\b|\battachments?\b",
+    re.IGNORECASE
+)
+SUBJECT_PATTERN = re.compile(
+    rf"\b(?:with\s+)?(?:the\s+)?subject(?:\s+line)?\s*(?::|=|is|of|containing)?\s*"
+    rf"(?:\"([^\"]+)\"|'([^']+)'|(.+?){_STOP})",
+    re.IGNORECASE
+)
+CATEGORY_PATTERN = re.compile(r"\b(social|promotions?|promotional|updates|forums?|primary)\b", re.IGNORECASE)
+CATEGORY_NAMES = {
+    "social": "social", "promotion": "promotions", "promotions": "promotions", "promotional": "promotions",
+    "updates": "updates", "forum": "forums", "forums": "forums", "primary": "primary",
+}
+
+COMMAND_WORDS = re.compile(
+    r"\b(?:please|can|could|you|search|find|look|for|up|show|me|my|all|the|any|list|get|e?-?mails?|messages?|inbox|"
+    r"about|regarding|mentioning|containing|with|subject|that|which|are|is|in|of|and|or|to|a|an|"
+    # Prepositions left without an object once the date range was cut ("budget from last month")
+    r"from|since|after|before|between|during)\b",
+    re.IGNORECASE
+)
+
+def _day_start(value):
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _month_start(year, month):
+    return datetime(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+def _period_range(match, now):
+    """(after, before) for "last month", "this week", "yesterday", "in march" ..."""
+    text = match.group(0).lower()
+    today = _day_start(now)
+    if text == "today":
+        return today, today + timedelta(days=1)
+    if text == "yesterday":
+        return today - timedelta(days=1), today
+    if match.group(3):
+        month = MONTHS[match.group(3).lower()]
+        year = now.year if month <= now.month else now.year - 1  # "in march" means the most recent March
+        return _month_start(year, month), _month_start(year, month + 1)
+    which, unit = match.group(1).lower(), match.group(2).lower()
+    if unit == "week":
+        start = today - timedelta(days=today.weekday())
+        return (start - timedelta(days=7), start) if which == "last" else (start, None)
+    if unit == "month":
+        start = _month_start(now.year, now.month)
+        return (_month_start(now.year, now.month - 1), start) if which == "last" else (start, None)
+    start = datetime(now.year, 1, 1)
+    return (datetime(now.year - 1, 1, 1), start) if which == "last" else (start, None)
+
+def extract_date_range(text, now=None):
+    """Return (after, before, remaining_text); either bound may be None"""
+    now = now or datetime.now()
+    after = before = None
+    match = BETWEEN_PATTERN.search(text)
+    if match:
+        start, end = parse_datetime(match.group(1)), parse_datetime(match.group(2))
+        if start and end:
+            return _day_start(start), _day_start(end) + timedelta(days=1), text[:match.start()] + text[match.end():]
+    match = LAST_N_PATTERN.search(text)
+    if match:
+        amount, unit = int(match.group(1)), match.group(2).lower()
+        days = amount * {"day": 1, "week": 7, "month": 30}[unit]
+        return _day_start(now) - timedelta(days=days), None, text[:match.start()] + text[match.end():]
+    match = PERIOD_PATTERN.search(text)
+    if match:
+        after, before = _period_range(match, now)
+        return after, before, text[:match.start()] + text[match.end():]
+    for match in list(SINCE_PATTERN.finditer(text))[::-1]:
+        value = parse_datetime(match.group(2))
+        if value is None:
+            continue
+        if match.group(1).lower() == "before":
+            before = _day_start(value)
+        else:
+            after = _day_start(value)
+        text = text[:match.start()] + text[match.end():]
+    return after, before, text
+
+def is_search_request(text):
+    return bool(SEARCH_REQUEST_PATTERN.search(text))
+
+def _cut(text, match):
+    return text[:match.start()] + " " + text[match.end():]
+
+def parse_mail_query(text, now=None):
+    """
+    Structured constraints from a natural-language mail search:
+    {"terms": [...], "sender", "subject", "category": str|None, "after", "before": datetime|None,
+     "unread", "has_attachment": bool}
+    """
+    after, before, rest = extract_date_range(text, now)
+    query = {"terms": [], "sender": None, "subject": None, "category": None, "after": after, "before": before,
+             "unread": False, "has_attachment": False}
+    match = SUBJECT_PATTERN.search(rest)
+    if match:
+        query["subject"] = next(group for group in match.groups() if group).strip()
+        rest = _cut(rest, match)
+    match = SENDER_PATTERN.search(rest)
+    if match:
+        query["sender"] = match.group(1).strip(" '\"")
+        rest = _cut(rest, match)
+    match = UNREAD_PATTERN.search(rest)
+    if match:
+        query["unread"] = True
+        rest = _cut(rest, match)
+    match = ATTACHMENT_PATTERN.search(rest)
+    if match:
+        query["has_attachment"] = True
+        rest = _cut(rest, match)
+    match = CATEGORY_PATTERN.search(rest)
+    if match:
+        query["category"] = CATEGORY_NAMES[match.group(1).lower()]
+        rest = _cut(rest, match)
+    rest = COMMAND_WORDS.sub(" ", rest)
+    terms = [term.strip(".'") for term in re.findall(r"[\w@.+'-]+", rest)]
+    query["terms"] = [term for term in terms if len(term) > 1 or term.isdigit()]
+    return query
+
+def query_to_state(query):
+    """JSON-safe copy for the session (dates as epoch seconds)"""
+    return {key: value.timestamp() if isinstance(value, datetime) else value for key, value in query.items()}
+
+def query_from_state(state):
+    return {
+        key: datetime.fromtimestamp(value) if key in ("after", "before") and value is not None else value
+        for key, value in state.items()
+    }
+
+def _gmail_value(value):
+    """Quote multi-word or punctuated values for Gmail's search syntax"""
+    value = value.replace('"', "")
+    return f'"{value}"' if re.search(r"[^\w@.+-]", value) else value
+
+def to_gmail_query(query):
+    """
+    Compile parse_mail_query() constraints into a Gmail `q` string so the server does the filtering.
+    Dates are sent as epoch seconds: Gmail reads after:YYYY/MM/DD in Pacific time.
+    """
+    parts = [_gmail_value(term) for term in query.get("terms", [])]
+    if query.get("sender"):
+        parts.append(f"from:{_gmail_value(query['sender'])}")
+    if query.get("subject"):
+        parts.append(f"subject:({query['subject'].replace('(', ' ').replace(')', ' ').strip()})")
+    if query.get("after"):
+        parts.append(f"after:{int(query['after'].timestamp())}")
+    if query.get("before"):
+        parts.append(f"before:{int(query['before'].timestamp())}")
+    if query.get("has_attachment"):
+        parts.append("has:attachment")
+    if query.get("unread"):
+        parts.append("is:unread")
+    if query.get("category"):
+        parts.append(f"category:{query['category']}")
+    return " ".join(parts)
+
+def describe_query(query):
+    """Short human description used as the result title"""
+    parts = []
+    if query.get("unread"):
+        parts.append("unread")
+    if query.get("category"):
+        parts.append(f"in {query['category'].title()}")
+    if query.get("terms"):
+        parts.append(f"about \"{' '.join(query['terms'])}\"")
+    if query.get("subject"):
+        parts.append(f"with subject \"{query['subject']}\"")
+    if query.get("has_attachment"):
+        parts.append("with attachments")
+    if query.get("sender"):
+        parts.append(f"from {query['sender']}")
+    if query.get("after"):
+        parts.append(f"after {query['after'].strftime('%b %d, %Y')}")
+    if query.get("before"):
+        parts.append(f"before {query['before'].strftime('%b %d, %Y')}")
+    return " ".join(parts) or "all mail"
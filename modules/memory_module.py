@@ -2,40 +2,65 @@
 
 from qdrant_client import QdrantClient
 from qdrant_client.http.models import Distance, VectorParams
-from sentence_transformers import SentenceTransformer
 from uuid import uuid4
 import os
+import threading
 from dotenv import load_dotenv
 load_dotenv()
 
 # Qdrant Cloud setup
-QDRANT_API_KEY = os.getenv("QDRANT_API_KEY") 
-QDRANT_URL = os.getenv("QDRANT_URL") 
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
+QDRANT_URL = os.getenv("QDRANT_URL")
 COLLECTION_NAME = "agent_memory"
 EMBEDDING_DIM = 384  # depends on model
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
 
-# Initialize embedding model
-model = SentenceTransformer("all-MiniLM-L6-v2", token = os.getenv("HF_TOKEN"))
+# Loaded lazily (or by modules.prewarm) so importing the agents stays fast
+_model = None
+_client = None
+_model_lock = threading.Lock()
+_client_lock = threading.Lock()
 
-# Initialize Qdrant client
-client = QdrantClient(
-    url=QDRANT_URL,
-    api_key=QDRANT_API_KEY
-)
+def get_embedding_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBEDDING_MODEL_NAME, token=os.getenv("HF_TOKEN"))
+    return _model
+
+def get_qdrant_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                client = QdrantClient(
+                    url=QDRANT_URL,
+                    api_key=QDRANT_API_KEY
+                )
+                initialize_memory_collection(client)
+                _client = client
+    return _client
 
 # Ensure collection exists
-def initialize_memory_collection():
+def initialize_memory_collection(client):
     if COLLECTION_NAME not in [col.name for col in client.get_collections().collections]:
         client.create_collection(
             collection_name=COLLECTION_NAME,
             vectors_config=VectorParams(size=EMBEDDING_DIM, distance=Distance.COSINE)
         )
 
+# Embed text once so callers can reuse the vector (cache lookups, memory search)
+def embed_text(text: str):
+    return get_embedding_model().encode(text).tolist()
+
 # Embed and store a memory
-def store_text_memory(text: str, metadata: dict = {}):
-    vector = model.encode(text).tolist()
+def store_text_memory(text: str, metadata: dict = {}, vector=None):
+    if vector is None:
+        vector = embed_text(text)
     memory_id = str(uuid4())
-    client.upsert(
+    get_qdrant_client().upsert(
         collection_name=COLLECTION_NAME,
         points=[{
             "id": memory_id,
@@ -46,14 +71,12 @@ def store_text_memory(text: str, metadata: dict = {}):
     return memory_id
 
 # Embed and search memory
-def search_similar_memory(query: str, top_k=5):
-    query_vector = model.encode(query).tolist()
-    results = client.search(
+def search_similar_memory(query: str, top_k=5, query_vector=None):
+    if query_vector is None:
+        query_vector = embed_text(query)
+    results = get_qdrant_client().search(
         collection_name=COLLECTION_NAME,
         query_vector=query_vector,
-        limit=5
+        limit=top_k
     )
     return results
-
-# Initialize on import
-initialize_memory_collection()
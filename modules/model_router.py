@@ -0,0 +1,184 @@
+# modules/model_router.py
+
+import os
+import re
+import json
+import logging
+import time
+import queue
+import threading
+from collections import deque
+
+MODEL_TIERS = {
+    "groq": {
+        "small": "llama-3.1-8b-instant",
+        "large": "meta-llama/llama-4-maverick-17b-128e-instruct",
+    },
+    "huggingface": {
+        "small": "meta-llama/Llama-3.1-8B-Instruct",
+        "large": "meta-llama/Llama-3.3-70B-Instruct",
+    },
+}
+
+ROUTING_SMALL_MODEL_THRESHOLD = float(os.getenv("ROUTING_SMALL_MODEL_THRESHOLD", "0.5"))
+ROUTING_LOG_PATH = os.getenv("ROUTING_LOG_PATH", os.path.join("logs", "model_routing.jsonl"))
+ROUTING_HISTORY_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+# Precompiled once; scoring runs on every fallback query
+SIMPLE_INTENT_PATTERN = re.compile(
+    r"^\s*(hi|hello|hey|good (morning|afternoon|evening)|how are you|what is|what's|who is|who was|"
+    r"define|meaning of|translate|spell|convert)\b",
+    re.IGNORECASE
+)
+COMPLEX_KEYWORD_PATTERN = re.compile(
+    r"\b(explain|why|how does|how do|compare|comparison|difference|analy[sz]e|evaluate|design|architecture|"
+    r"step by step|reason|prove|derive|calculate|optimi[sz]e|debug|code|program|function|algorithm|"
+    r"essay|plan|strategy|pros and cons|trade-?offs?|summari[sz]e|itinerary|recommend)\b",
+    re.IGNORECASE
+)
+CODE_PATTERN = re.compile(r"```|\bdef \w+\(|\bclass \w+|[{};]\s*$", re.MULTILINE)
+LOW_CONFIDENCE_PATTERN = re.compile(
+    r"\b(i('m| am) not (sure|certain)|i don'?t know|i do not know|i cannot|i can'?t (help|answer)|"
+    r"unable to (answer|determine)|as an ai|i'm sorry, but|not enough information)\b",
+    re.IGNORECASE
+)
+
+def score_complexity(query):
+    """Cheap 0..1 complexity estimate from length, intent and keywords"""
+    words = len(query.split())
+    features = {
+        "words": words,
+        "questions": query.count("?"),
+        "simple_intent": bool(SIMPLE_INTENT_PATTERN.search(query)),
+        "complex_keywords": len(COMPLEX_KEYWORD_PATTERN.findall(query)),
+        "code": bool(CODE_PATTERN.search(query)),
+    }
+
+    score = min(words / 60.0, 0.5)
+    score += min(features["complex_keywords"] * 0.25, 0.5)
+    if features["questions"] > 1:
+        score += 0.15
+    if features["code"]:
+        score += 0.5
+    if features["simple_intent"] and features["complex_keywords"] == 0:
+        score -= 0.2
+    return max(0.0, min(score, 1.0)), features
+
+def is_low_confidence(query, reply):
+    """Heuristic check that a small-model answer should be retried on the large model"""
+    if not reply or not reply.strip():
+        return True
+    if LOW_CONFIDENCE_PATTERN.search(reply[:400]):
+        return True
+    # A one-liner for a long question usually means the model gave up
+    return len(query.split()) > 25 and len(reply.split()) < 12
+
+class ModelRouter:
+    """Sends easy queries to a small fast model and records every routing decision"""
+
+    def __init__(self, tiers=MODEL_TIERS, threshold=ROUTING_SMALL_MODEL_THRESHOLD, log_path=ROUTING_LOG_PATH):
+        self.tiers = tiers
+        self.threshold = threshold
+        self.log_path = log_path
+        self.decisions = deque(maxlen=ROUTING_HISTORY_SIZE)
+        self._lock = threading.Lock()
+        self._log_queue = queue.SimpleQueue()
+        self._log_writer = None
+
+    def route(self, provider, query, large_model=None):
+        """Pick a model tier for the query; large_model overrides the provider default"""
+        score, features = score_complexity(query)
+        tiers = self.tiers.get(provider, {})
+        large = large_model or tiers.get("large")
+        small = tiers.get("small")
+        tier = "small" if small and score < self.threshold else "large"
+        return {
+            "provider": provider,
+            "score": round(score, 3),
+            "features": features,
+            "tier": tier,
+            "model": small if tier == "small" else large,
+            "large_model": large,
+            "escalated": False,
+        }
+
+    def complete(self, provider, query, call_fn, large_model=None):
+        """
+        Route, call call_fn(model), and log it. A small-model answer that fails or looks
+        low-confidence is retried on the large model, so routing never costs the user an answer.
+        """
+        decision = self.route(provider, query, large_model)
+        started = time.perf_counter()
+        try:
+            reply = call_fn(decision["model"])
+            if decision["tier"] == "small" and is_low_confidence(query, reply):
+                decision["escalation_reason"] = "low_confidence"
+        except Exception as e:
+            if decision["tier"] != "small":
+                decision["error"] = str(e)
+                decision["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                self.record(decision)
+                raise
+            logger.warning("Small model %s failed, escalating to %s: %s", decision["model"], decision["large_model"], e)
+            decision["escalation_reason"] = "error"
+            decision["small_error"] = str(e)
+        if decision.get("escalation_reason"):
+            decision["escalated"] = True
+            decision["small_latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            try:
+                reply = call_fn(decision["large_model"])
+            except Exception as e:
+                decision["error"] = str(e)
+                decision["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                self.record(decision)
+                raise
+        decision["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        decision["reply_chars"] = len(reply or "")
+        self.record(decision)
+        return reply
+
+    def record(self, decision):
+        decision = {"ts": time.time(), **decision}
+        with self._lock:
+            self.decisions.append(decision)
+            if not self.log_path:
+                return
+            if self._log_writer is None:
+                self._log_writer = threading.Thread(target=self._write_log, name="routing-log", daemon=True)
+                self._log_writer.start()
+        # Written by the background thread: a request never waits on the log file
+        self._log_queue.put(decision)
+
+    def _write_log(self):
+        """Append queued decisions to the JSONL log, everything queued so far in one write"""
+        while True:
+            decisions = [self._log_queue.get()]
+            while True:
+                try:
+                    decisions.append(self._log_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(decision) + "\n" for decision in decisions))
+            except OSError as e:
+                logger.warning("Could not write routing log: %s", e)
+
+    def summary(self):
+        """Aggregate counts and median latency per tier for quick analysis"""
+        with self._lock:
+            decisions = list(self.decisions)
+        result = {}
+        for tier in ("small", "large"):
+            latencies = sorted(d["latency_ms"] for d in decisions if d["tier"] == tier and "latency_ms" in d)
+            result[tier] = {
+                "count": len(latencies),
+                "escalated": sum(1 for d in decisions if d["tier"] == tier and d["escalated"]),
+                "median_latency_ms": latencies[len(latencies) // 2] if latencies else None,
+            }
+        return result
+
+model_router = ModelRouter()
@@ -0,0 +1,309 @@
+# modules/outbox.py
+
+import os
+import json
+import time
+import uuid
+import hashlib
+import logging
+import sqlite3
+import threading
+import httplib2
+from email.utils import make_msgid
+from googleapiclient.errors import HttpError
+from modules.google_services import google_services, RETRYABLE_STATUSES
+from modules.mail_compose import build_message_file, create_draft_file
+from modules.tracing import span
+
+OUTBOX_DB = os.getenv("OUTBOX_DB", "outbox.db")
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_RETRY_SECONDS = float(os.getenv("OUTBOX_RETRY_SECONDS", "10"))  # doubled after every failed attempt
+OUTBOX_MAX_RETRY_SECONDS = 15 * 60
+OUTBOX_LEASE_SECONDS = 10 * 60  # a claimed entry whose sender died is picked up again after this
+OUTBOX_LEASE_RENEW_SECONDS = OUTBOX_LEASE_SECONDS / 3  # a live sender keeps extending its lease
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "30"))
+OUTBOX_RETENTION_SECONDS = 7 * 24 * 3600
+OUTBOX_STATUS_LIMIT = 10
+
+QUEUED, SENDING, SENT, FAILED = "queued", "sending", "sent", "failed"
+
+logger = logging.getLogger(__name__)
+
+def idempotency_key(session_key, draft):
+    """Same draft confirmed twice (double click, retried request) gives the same key"""
+    source = f"{session_key}:{draft.get('version', 0)}:{draft.get('updated_at', '')}"
+    return hashlib.sha256(source.encode()).hexdigest()
+
+def _is_retryable(error):
+    if isinstance(error, HttpError):
+        return error.resp.status in RETRYABLE_STATUSES or error.resp.status == 408
+    return isinstance(error, (OSError, httplib2.HttpLib2Error))
+
+class Outbox:
+    """
+    Durable queue of confirmed emails, sent by a background worker.
+
+    Each entry is uploaded as a Gmail draft whose id is stored before drafts.send is called.
+    Gmail deletes a draft once it is sent, so a retry after a timeout or a crash checks whether
+    that draft still exists: if it is gone the earlier send went through and must not be repeated.
+    """
+
+    def __init__(self, db_path=OUTBOX_DB, max_attempts=OUTBOX_MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id TEXT PRIMARY KEY, idempotency_key TEXT NOT NULL UNIQUE, session_key TEXT NOT NULL, "
+            "message_id TEXT NOT NULL, data TEXT NOT NULL, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "next_attempt_at REAL NOT NULL, last_error TEXT, gmail_id TEXT, draft_id TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);"
+            "CREATE INDEX IF NOT EXISTS outbox_by_session ON outbox (session_key, created_at DESC);"
+        )
+        if "draft_id" not in {row[1] for row in self._db.execute("PRAGMA table_info(outbox)")}:
+            # Outboxes created before sends went through drafts
+            self._db.execute("ALTER TABLE outbox ADD COLUMN draft_id TEXT")
+        self._db.commit()
+
+    # --- queue ---
+
+    def enqueue(self, session_key, draft):
+        """Queue a draft for sending; returns the entry (the existing one if this draft was already queued)"""
+        key = idempotency_key(session_key, draft)
+        data = {field: draft.get(field) for field in ("to", "subject", "content", "cc", "bcc", "attachments")}
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO outbox (id, idempotency_key, session_key, message_id, data, status, "
+                "next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (uuid.uuid4().hex, key, session_key, make_msgid(idstring="outbox"), json.dumps(data), QUEUED, now, now, now)
+            )
+            self._db.commit()
+            entry = self._get("idempotency_key", key)
+        self._wakeup.set()
+        return entry
+
+    def _claim(self):
+        """Take the next due entry (or one whose lease ran out); the conditional UPDATE makes this safe across processes"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id FROM outbox WHERE status IN (?, ?) AND next_attempt_at <= ? ORDER BY next_attempt_at LIMIT 1",
+                (QUEUED, SENDING, now)
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = self._db.execute(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, next_attempt_at = ?, updated_at = ? "
+                "WHERE id = ? AND status IN (?, ?) AND next_attempt_at <= ?",
+                (SENDING, now + OUTBOX_LEASE_SECONDS, now, row[0], QUEUED, SENDING, now)
+            ).rowcount
+            self._db.commit()
+            return self._get("id", row[0]) if claimed else None
+
+    def _renew_lease(self, entry):
+        """Extend the lease while this attempt still holds it; False once another sender took over"""
+        with self._lock:
+            renewed = self._db.execute(
+                "UPDATE outbox SET next_attempt_at = ?, updated_at = ? WHERE id = ? AND status = ? AND attempts = ?",
+                (time.time() + OUTBOX_LEASE_SECONDS, time.time(), entry["id"], SENDING, entry["attempts"])
+            ).rowcount
+            self._db.commit()
+        return bool(renewed)
+
+    def _keep_leased(self, entry, stop):
+        while not stop.wait(OUTBOX_LEASE_RENEW_SECONDS):
+            if not self._renew_lease(entry):
+                logger.warning("Outbox entry %s lost its lease while sending", entry["id"])
+                return
+
+    def _set_draft(self, entry_id, draft_id):
+        with self._lock:
+            self._db.execute("UPDATE outbox SET draft_id = ?, updated_at = ? WHERE id = ?", (draft_id, time.time(), entry_id))
+            self._db.commit()
+
+    def _finish(self, entry_id, status, gmail_id=None, error=None, retry_at=None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE outbox SET status = ?, gmail_id = COALESCE(?, gmail_id), last_error = ?, "
+                "next_attempt_at = COALESCE(?, next_attempt_at), updated_at = ? WHERE id = ?",
+                (status, gmail_id, error, retry_at, time.time(), entry_id)
+            )
+            self._db.commit()
+
+    # --- sending ---
+
+    @staticmethod
+    def _draft_exists(service, draft_id):
+        try:
+            service.users().drafts().get(userId="me", id=draft_id, format="minimal", fields="id").execute()
+        except HttpError as e:
+            if e.resp.status == 404:
+                return False
+            raise
+        return True
+
+    @staticmethod
+    def _find_draft(service, message_id):
+        """Id of a draft carrying message_id (left by a drafts.create that timed out), or None"""
+        response = service.users().drafts().list(
+            userId="me", q=f"rfc822msgid:{message_id.strip('<>')}", maxResults=1, fields="drafts/id"
+        ).execute()
+        drafts = response.get("drafts", [])
+        return drafts[0]["id"] if drafts else None
+
+    def _deliver(self, entry):
+        data = entry["data"]
+        service = google_services.get_gmail_service()
+        draft_id = entry["draft_id"]
+        if draft_id:
+            if not self._draft_exists(service, draft_id):
+                # Gmail deletes a draft when it is sent: an earlier attempt got through
+                logger.info("Outbox entry %s was already delivered (draft %s is gone)", entry["id"], draft_id)
+                return entry["gmail_id"]
+        elif entry["attempts"] > 1:
+            draft_id = self._find_draft(service, entry["message_id"])
+        if not draft_id:
+            message_path, _ = build_message_file(
+                data["to"], data["subject"], data["content"], data.get("attachments") or [],
+                data.get("cc") or [], data.get("bcc") or [], message_id=entry["message_id"]
+            )
+            try:
+                draft_id = create_draft_file(service, message_path)["id"]
+            finally:
+                os.remove(message_path)
+        if draft_id != entry["draft_id"]:
+            self._set_draft(entry["id"], draft_id)
+        return service.users().drafts().send(userId="me", body={"id": draft_id}).execute().get("id")
+
+    def process_one(self):
+        """Send the next due entry; returns False when nothing was due"""
+        entry = self._claim()
+        if entry is None:
+            return False
+        stop = threading.Event()
+        renewer = threading.Thread(target=self._keep_leased, args=(entry, stop), name="outbox-lease", daemon=True)
+        renewer.start()
+        try:
+            with span("gmail.outbox_send"):
+                gmail_id = self._deliver(entry)
+        except Exception as e:
+            if _is_retryable(e) and entry["attempts"] < self.max_attempts:
+                delay = min(OUTBOX_RETRY_SECONDS * 2 ** (entry["attempts"] - 1), OUTBOX_MAX_RETRY_SECONDS)
+                logger.warning("Sending outbox entry %s failed (attempt %d), retrying in %.0fs: %s",
+                               entry["id"], entry["attempts"], delay, e)
+                self._finish(entry["id"], QUEUED, error=str(e), retry_at=time.time() + delay)
+            else:
+                logger.error("Giving up on outbox entry %s after %d attempts: %s", entry["id"], entry["attempts"], e)
+                self._finish(entry["id"], FAILED, error=str(e))
+                self._remove_attachments(entry)
+            return True
+        finally:
+            stop.set()
+        logger.info("Outbox entry %s sent as %s", entry["id"], gmail_id)
+        self._finish(entry["id"], SENT, gmail_id=gmail_id)
+        self._remove_attachments(entry)
+        return True
+
+    @staticmethod
+    def _remove_attachments(entry):
+        for att in entry["data"].get("attachments") or []:
+            file_path = att.get("path")
+            try:
+                if file_path and os.path.exists(file_path):
+                    os.remove(file_path)
+                    logger.debug("Attachment file removed: %s", file_path)
+            except OSError as e:
+                logger.debug("Failed to remove attachment %s: %s", file_path, e)
+
+    def seconds_until_due(self, default):
+        """Time until the earliest queued entry (or lease) is due, at most default"""
+        with self._lock:
+            due = self._db.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status IN (?, ?)", (QUEUED, SENDING)
+            ).fetchone()[0]
+        return default if due is None else max(0.0, min(default, due - time.time()))
+
+    def prune(self, max_age=OUTBOX_RETENTION_SECONDS):
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM outbox WHERE status IN (?, ?) AND updated_at < ?", (SENT, FAILED, time.time() - max_age)
+            )
+            self._db.commit()
+
+    # --- status ---
+
+    def _get(self, column, value):
+        row = self._db.execute(f"SELECT * FROM outbox WHERE {column} = ?", (value,)).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["data"] = json.loads(entry["data"])
+        return entry
+
+    @staticmethod
+    def _public(entry):
+        return {
+            "id": entry["id"],
+            "to": entry["data"].get("to", ""),
+            "subject": entry["data"].get("subject", ""),
+            "status": entry["status"],
+            "attempts": entry["attempts"],
+            "last_error": entry["last_error"],
+            "gmail_id": entry["gmail_id"],
+            "created_at": entry["created_at"],
+            "updated_at": entry["updated_at"],
+        }
+
+    def get(self, session_key, entry_id):
+        """One entry of this session, or None"""
+        with self._lock:
+            entry = self._get("id", entry_id)
+        if entry is None or entry["session_key"] != session_key:
+            return None
+        return self._public(entry)
+
+    def list_entries(self, session_key, limit=OUTBOX_STATUS_LIMIT):
+        """The session's most recent entries, newest first"""
+        with self._lock:
+            ids = [row[0] for row in self._db.execute(
+                "SELECT id FROM outbox WHERE session_key = ? ORDER BY created_at DESC LIMIT ?", (session_key, limit)
+            )]
+            return [self._public(self._get("id", entry_id)) for entry_id in ids]
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in (QUEUED, SENDING, SENT, FAILED)}
+
+outbox = Outbox()
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def _send_loop(poll_interval):
+    last_pruned = 0
+    while True:
+        outbox._wakeup.clear()
+        try:
+            while outbox.process_one():
+                pass
+            if time.time() - last_pruned > 3600:
+                outbox.prune()
+                last_pruned = time.time()
+        except Exception as e:
+            logger.warning("Outbox worker error: %s", e)
+        # Woken at once by enqueue(); otherwise sleep until the next retry, polling for other processes' entries
+        outbox._wakeup.wait(outbox.seconds_until_due(poll_interval))
+
+def start_outbox_worker(poll_interval=OUTBOX_POLL_SECONDS):
+    """Send queued mail from a daemon thread; safe to call repeatedly"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_send_loop, args=(poll_interval,), name="outbox-sender", daemon=True)
+            _worker.start()
+    return _worker
@@ -0,0 +1,119 @@
+# modules/payloads.py
+
+# Typed tool results. The web UI renders these client-side (templates/index2.html);
+# the session history and the CLI get a compact text summary instead of HTML.
+
+PAYLOAD_TYPES = ("email_list", "event_list", "holiday_list", "flight_list", "multi")
+SUMMARY_MAX_ITEMS = 10
+SNIPPET_MAX_CHARS = 150
+
+def is_payload(result):
+    return isinstance(result, dict) and result.get("type") in PAYLOAD_TYPES
+
+def _truncate(text, limit):
+    text = text or ""
+    return text[:limit] + "..." if len(text) > limit else text
+
+def email_list_payload(emails, title, read_more=True, snippet_chars=SNIPPET_MAX_CHARS, list_id=None):
+    """Only the fields the list view shows; bodies stay out of the payload. list_id scopes Read More to this list."""
+    return {
+        "type": "email_list",
+        "title": title,
+        "read_more": read_more,
+        "list_id": list_id,
+        "emails": [
+            {
+                "index": i,
+                "sender": email.get("sender", "Unknown"),
+                "subject": email.get("subject", "(No Subject)"),
+                "date": email.get("date", ""),
+                "snippet": _truncate(email.get("snippet", ""), snippet_chars),
+            }
+            for i, email in enumerate(emails, 1)
+        ],
+    }
+
+def event_list_payload(events, title="📅 Upcoming Events"):
+    return {
+        "type": "event_list",
+        "title": title,
+        "events": [
+            {"index": i, "title": event.get("title", ""), "date": event.get("date", ""), "event_id": event.get("event_id", "")}
+            for i, event in enumerate(events, 1)
+        ],
+    }
+
+def holiday_list_payload(regions, title):
+    return {
+        "type": "holiday_list",
+        "title": title,
+        "regions": [
+            {"region": region, "holidays": [{"title": h.get("title", ""), "date": h.get("date", "")} for h in holidays]}
+            for region, holidays in regions.items()
+        ],
+    }
+
+def flight_list_payload(flights, title="✈️ Flight Search Results"):
+    return {"type": "flight_list", "title": title, "flights": flights}
+
+def multi_payload(results, title=None):
+    """Results of several planned tool calls, in request order; plain results are kept as HTML"""
+    parts = [result if is_payload(result) else {"type": "html", "html": str(result)} for result in results]
+    return {"type": "multi", "title": title or f"🧩 {len(parts)} results", "parts": parts}
+
+def _part_text(part, full):
+    if part["type"] == "html":
+        return part["html"]
+    return render_text(part) if full else payload_summary(part)
+
+def _summary_lines(payload):
+    kind = payload["type"]
+    if kind == "email_list":
+        return [f"{e['index']}. {e['sender']} - {e['subject']} ({e['date']})" for e in payload["emails"]]
+    if kind == "event_list":
+        return [f"{e['index']}. {e['title']} - {e['date']} (ID: {e['event_id']})" for e in payload["events"]]
+    if kind == "holiday_list":
+        return [f"{r['region']}: " + ", ".join(f"{h['title']} ({h['date']})" for h in r["holidays"]) for r in payload["regions"]]
+    if kind == "flight_list":
+        return [
+            f"{i}. {' / '.join(s['airline'] for s in f['segments']) or 'Flight'}: "
+            f"{f['departure_time']} -> {f['arrival_time']}, {f['duration']}, {f['price']}"
+            for i, f in enumerate(payload["flights"], 1)
+        ]
+    return []
+
+def payload_summary(payload, max_items=SUMMARY_MAX_ITEMS):
+    """Short plain-text version kept in the session history and given to the LLM as context"""
+    if payload["type"] == "multi":
+        return "\n\n".join(_part_text(part, full=False) for part in payload["parts"])
+    lines = _summary_lines(payload)
+    text = "\n".join([payload["title"]] + lines[:max_items])
+    if len(lines) > max_items:
+        text += f"\n... and {len(lines) - max_items} more"
+    return text
+
+def render_text(result):
+    """CLI rendering: payloads as full plain text, anything else unchanged"""
+    if not is_payload(result):
+        return result
+    if result["type"] == "multi":
+        return "\n\n".join(_part_text(part, full=True) for part in result["parts"])
+    if result["type"] == "email_list":
+        blocks = [
+            f"📨 Email {e['index']}\nFrom: {e['sender']}\nSubject: {e['subject']}\nDate: {e['date']}\nPreview: {e['snippet']}"
+            for e in result["emails"]
+        ]
+        return "\n\n".join([result["title"]] + blocks)
+    if result["type"] == "flight_list":
+        blocks = [result["title"]]
+        for i, flight in enumerate(result["flights"], 1):
+            lines = [f"✈️ Flight {i}: {flight['departure_time']} -> {flight['arrival_time']} ({flight['duration']})"]
+            for segment in flight["segments"]:
+                lines.append(
+                    f"  {segment['airline']} {segment['flight_number']}: "
+                    f"{segment['from']['code']} {segment['from']['time']} -> {segment['to']['code']} {segment['to']['time']}"
+                )
+            lines.append(f"  💰 {flight['price']}  🔄 {flight['stops_label']}")
+            blocks.append("\n".join(lines))
+        return "\n\n".join(blocks)
+    return payload_summary(result, max_items=len(_summary_lines(result)))
@@ -0,0 +1,100 @@
+# modules/prewarm.py
+
+import os
+import time
+import threading
+
+GROQ_MODELS_URL = "https://api.groq.com/openai/v1/models"
+
+_status = {
+    "started": False,
+    "ready": False,
+    "stages": {},
+    "started_at": None,
+    "finished_at": None,
+}
+_status_lock = threading.Lock()
+_thread = None
+
+def _warm_embedder():
+    from modules.memory_module import get_embedding_model
+    # Encode only: nothing is written to the memory store
+    get_embedding_model().encode("warm-up")
+
+def _warm_connections():
+    from modules.memory_module import get_qdrant_client
+    from modules.llm_client import groq_session
+    get_qdrant_client()
+    # Listing models opens the pooled TLS connection without spending any tokens
+    groq_session.get(GROQ_MODELS_URL, timeout=10)
+
+def _warm_google_services():
+    from modules.google_services import google_services, TOKEN_PATH
+    if not os.path.exists(TOKEN_PATH):
+        return "skipped (no credentials/token.json)"
+    # Parses the discovery documents and loads (refreshing if needed) the token once for every later call
+    google_services.get_gmail_service()
+    google_services.get_calendar_service()
+
+def _warm_routers():
+    from modules.groq import GroqAgent, normalize_action
+    from modules.hf_agent import HFAgent
+    from modules.model_router import score_complexity
+    from modules.response_cache import is_cacheable_query
+    from modules.temporal_parser import parse_datetime
+
+    # Pure routing helpers only: fills the re cache and dateparser's lazily loaded English locale data
+    sample = "schedule a meeting tomorrow at 3pm"
+    score_complexity(sample)
+    is_cacheable_query(sample)
+    normalize_action(sample)
+    parse_datetime("tomorrow 3pm", prefer_future=True)
+    parse_datetime("next friday 3pm ist", prefer_future=True)  # not a fast-path form: loads dateparser
+    for agent_cls in (GroqAgent, HFAgent):
+        agent_cls(agent_name="prewarm")._extract_category("show social emails")
+
+PREWARM_STAGES = [
+    ("embedder", _warm_embedder),
+    ("connections", _warm_connections),
+    ("google_services", _warm_google_services),
+    ("routers", _warm_routers),
+]
+
+def prewarm():
+    """Load models, open pooled connections and build clients without touching user data"""
+    with _status_lock:
+        _status["started"] = True
+        _status["started_at"] = time.time()
+    for name, stage in PREWARM_STAGES:
+        started = time.perf_counter()
+        try:
+            outcome = stage() or "ok"
+        except Exception as e:
+            outcome = f"failed: {e}"
+        with _status_lock:
+            _status["stages"][name] = {
+                "status": outcome,
+                "seconds": round(time.perf_counter() - started, 3)
+            }
+    with _status_lock:
+        _status["ready"] = True
+        _status["finished_at"] = time.time()
+    return get_prewarm_status()
+
+def start_prewarm():
+    """Run prewarm() once in a daemon thread; later calls are no-ops"""
+    global _thread
+    with _status_lock:
+        if _thread is not None:
+            return _thread
+        _thread = threading.Thread(target=prewarm, name="prewarm", daemon=True)
+        _thread.start()
+    return _thread
+
+def is_ready():
+    with _status_lock:
+        return _status["ready"]
+
+def get_prewarm_status():
+    with _status_lock:
+        return {**_status, "stages": dict(_status["stages"])}
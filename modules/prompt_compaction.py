@@ -0,0 +1,128 @@
+# modules/prompt_compaction.py
+
+import os
+import re
+import logging
+from collections import Counter
+from modules.conversation_module import estimate_tokens
+
+EMAIL_PROMPT_TOKEN_BUDGET = int(os.getenv("EMAIL_PROMPT_TOKEN_BUDGET", "600"))
+SUMMARY_MARKER = "[...]"
+
+logger = logging.getLogger(__name__)
+
+# Everything from a reply header / forwarded original onwards is quoted history
+QUOTE_HEADER_PATTERN = re.compile(
+    r"^\s*(?:On .{0,200}?wrote:|-{2,}\s*Original Message\s*-{2,}|_{5,}|From:\s.+\n\s*(?:Sent|Date):\s.+)\s*$",
+    re.IGNORECASE | re.MULTILINE
+)
+QUOTED_LINE_PATTERN = re.compile(r"^\s*>.*$\n?", re.MULTILINE)
+SIGNATURE_PATTERN = re.compile(
+    r"^(?:--\s*$|Sent from my \w+|Get Outlook for \w+|This (?:e-?mail|message) (?:and any attachments )?(?:is|may be) confidential)",
+    re.IGNORECASE | re.MULTILINE
+)
+SENTENCE_PATTERN = re.compile(r"[^.!?\n]+(?:[.!?]+|\n|$)")
+WORD_PATTERN = re.compile(r"[a-zA-Z]{3,}")
+STOPWORDS = frozenset(
+    "the and for are but not you your with this that have has was were will would could should from they them "
+    "their there here what when where which who about into over than then also just been being our ours its".split()
+)
+
+# Edit replies: one block per change, so the model only writes what it changes
+EDIT_BLOCK_PATTERN = re.compile(r"<<<FIND\s*\n(.*?)\n===\s*\n(.*?)\n?>>>", re.DOTALL)
+EDIT_FORMAT_INSTRUCTIONS = """Reply ONLY with edit blocks in exactly this format (one block per change):
+<<<FIND
+exact text copied from the current email
+===
+replacement text
+>>>
+To insert text, FIND the sentence just before the insertion point and repeat it followed by the new text.
+To delete text, leave the replacement empty.
+If the instruction changes most of the email, reply with the line REWRITE followed by the complete new email body."""
+
+def strip_quoted_history(body):
+    """Drop "On ... wrote:" / Original Message tails and ">" quoted lines"""
+    match = QUOTE_HEADER_PATTERN.search(body)
+    if match and match.start() > 0:
+        body = body[:match.start()]
+    return QUOTED_LINE_PATTERN.sub("", body)
+
+def strip_signature(body):
+    match = SIGNATURE_PATTERN.search(body)
+    if match and match.start() > 0:
+        body = body[:match.start()]
+    return body
+
+def extractive_summary(text, token_budget):
+    """Keep the highest-scoring sentences (word frequency, earlier is better) in original order"""
+    sentences = [s.strip() for s in SENTENCE_PATTERN.findall(text) if s.strip()]
+    if not sentences:
+        return text[:token_budget * 4]
+    frequencies = Counter(w for w in WORD_PATTERN.findall(text.lower()) if w not in STOPWORDS)
+
+    def score(item):
+        position, sentence = item
+        words = [w for w in WORD_PATTERN.findall(sentence.lower()) if w not in STOPWORDS]
+        if not words:
+            return 0.0
+        return sum(frequencies[w] for w in words) / len(words) + 2.0 / (1 + position)
+
+    chosen, used = set(), 0
+    for position, sentence in sorted(enumerate(sentences), key=score, reverse=True):
+        cost = estimate_tokens(sentence)
+        if used + cost > token_budget:
+            continue
+        chosen.add(position)
+        used += cost
+
+    parts, previous = [], -1
+    for position in sorted(chosen):
+        if position != previous + 1:
+            parts.append(SUMMARY_MARKER)
+        parts.append(sentences[position])
+        previous = position
+    if previous != len(sentences) - 1:
+        parts.append(SUMMARY_MARKER)
+    return " ".join(parts)
+
+def compact_email_body(body, token_budget=EMAIL_PROMPT_TOKEN_BUDGET):
+    """Email body reduced for a prompt: no quoted thread or signature, capped to token_budget"""
+    if not body:
+        return ""
+    compacted = strip_signature(strip_quoted_history(body))
+    compacted = re.sub(r"\n\s*\n+", "\n\n", compacted).strip() or body.strip()
+    if estimate_tokens(compacted) > token_budget:
+        compacted = extractive_summary(compacted, token_budget)
+    logger.debug("Compacted email body from ~%d to ~%d tokens", estimate_tokens(body), estimate_tokens(compacted))
+    return compacted
+
+def _locate(content, find):
+    """Exact match first, then a whitespace-insensitive one; returns (start, end) or None"""
+    index = content.find(find)
+    if index >= 0:
+        return index, index + len(find)
+    tokens = find.split()
+    if not tokens:
+        return None
+    match = re.search(r"\s+".join(re.escape(t) for t in tokens), content)
+    return (match.start(), match.end()) if match else None
+
+def apply_edit_reply(content, reply):
+    """
+    Apply an edit reply in EDIT_FORMAT_INSTRUCTIONS format to content.
+    Returns the new content, or None if the reply can't be applied cleanly.
+    """
+    reply = (reply or "").strip()
+    if reply.upper().startswith("REWRITE"):
+        rewritten = reply[len("REWRITE"):].lstrip(":").strip()
+        return rewritten or None
+    blocks = EDIT_BLOCK_PATTERN.findall(reply)
+    if not blocks:
+        return None
+    for find, replacement in blocks:
+        span = _locate(content, find.strip())
+        if span is None:
+            logger.debug("Edit block did not match the draft: %r", find[:80])
+            return None
+        content = content[:span[0]] + replacement.strip() + content[span[1]:]
+    return re.sub(r"[ \t]+\n", "\n", content)
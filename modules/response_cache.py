@@ -0,0 +1,126 @@
+# modules/response_cache.py
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+
+CACHE_SIMILARITY_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+
+# Queries whose answer depends on live data, the clock or the user's own tools
+TIME_SENSITIVE_PATTERN = re.compile(
+    r"\b(today|tonight|tomorrow|yesterday|now|current(ly)?|latest|recent|upcoming|"
+    r"this (week|month|year)|next (week|month|year)|weather|news|price|stock|score|live|"
+    r"what time|what day|what date|deadline)\b",
+    re.IGNORECASE
+)
+TOOL_DEPENDENT_PATTERN = re.compile(
+    r"\b(e-?mails?|inbox|mails?|messages?|drafts?|reply|send|attach\w*|calendar|events?|meetings?|"
+    r"appointments?|reminders?|holidays?|flights?|travel|remember|my|mine)\b",
+    re.IGNORECASE
+)
+# Follow-ups only make sense against the conversation history sent with them
+CONTEXT_DEPENDENT_PATTERN = re.compile(
+    r"\b(it|its|that|this|these|those|they|them|he|she|him|her|above|previous|earlier|again|more|else)\b",
+    re.IGNORECASE
+)
+
+def normalize_query(query):
+    """Lower-case and collapse whitespace/punctuation so trivial variants share a key"""
+    query = re.sub(r"[^\w\s]", " ", query.lower())
+    return re.sub(r"\s+", " ", query).strip()
+
+def is_cacheable_query(query):
+    """Only general-knowledge questions are safe to answer from the cache"""
+    if not query or not query.strip():
+        return False
+    if TIME_SENSITIVE_PATTERN.search(query):
+        return False
+    if TOOL_DEPENDENT_PATTERN.search(query):
+        return False
+    if CONTEXT_DEPENDENT_PATTERN.search(query):
+        return False
+    return True
+
+class SemanticCache:
+    """In-process LLM answer cache keyed by query embedding, scoped per tenant"""
+
+    def __init__(self, threshold=CACHE_SIMILARITY_THRESHOLD, ttl_seconds=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (tenant, namespace, normalized query) -> entry, oldest first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, tenant, namespace, query, vector):
+        """Return a cached reply for a semantically equivalent query, or None"""
+        key = (tenant, namespace, normalize_query(query))
+        now = time.time()
+        query_vec = _unit(vector)
+
+        with self._lock:
+            self._purge_expired(now)
+
+            entry = self._entries.get(key)
+            best_key = key if entry else None
+            if best_key is None:
+                best_score = self.threshold
+                for entry_key, candidate in self._entries.items():
+                    if entry_key[0] != tenant or entry_key[1] != namespace:
+                        continue
+                    score = float(np.dot(query_vec, candidate["vector"]))
+                    if score >= best_score:
+                        best_key, best_score = entry_key, score
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            return self._entries[best_key]["reply"]
+
+    def store(self, tenant, namespace, query, vector, reply):
+        """Cache a reply, evicting the least recently used entries over capacity"""
+        key = (tenant, namespace, normalize_query(query))
+        with self._lock:
+            self._entries[key] = {
+                "vector": _unit(vector),
+                "reply": reply,
+                "expires_at": time.time() + self.ttl_seconds
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self, tenant=None):
+        """Drop all entries, or only those belonging to one tenant"""
+        with self._lock:
+            if tenant is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == tenant]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _purge_expired(self, now):
+        expired = [k for k, entry in self._entries.items() if entry["expires_at"] <= now]
+        for key in expired:
+            del self._entries[key]
+
+def _unit(vector):
+    vec = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+# Shared by all agents; entries are namespaced by model so providers never mix answers
+response_cache = SemanticCache()
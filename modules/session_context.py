@@ -0,0 +1,45 @@
+# modules/session_context.py
+
+import threading
+from uuid import uuid4
+from flask import has_request_context, session
+
+CLI_SESSION_KEY = "cli"
+EMAIL_LISTS_KEPT = 4  # the session is a cookie: only ids of the few most recent lists
+
+# Planned steps share one session from several threads; list bookkeeping is read-modify-write
+_email_lists_lock = threading.Lock()
+
+def get_session_key(default=CLI_SESSION_KEY):
+    """Return the id of the current Flask session, or a fixed key for CLI use"""
+    try:
+        if has_request_context():
+            if 'session_id' not in session:
+                session['session_id'] = str(uuid4())
+            return session['session_id']
+    except Exception:
+        pass
+    return default
+
+def remember_email_list(emails):
+    """
+    Store a list of emails shown to the user. Returns its list id, which the payload's Read More
+    buttons send back, so each list resolves its own indices even when several are shown at once.
+    """
+    list_id = uuid4().hex[:8]
+    if not has_request_context():
+        return list_id
+    with _email_lists_lock:
+        session["last_email_list"] = emails
+        # A list of pairs rather than a dict: the session serializer sorts dict keys
+        lists = [entry for entry in session.get("email_lists", []) if entry[0] != list_id]
+        lists.append([list_id, [email.get("id") for email in emails]])
+        session["email_lists"] = lists[-EMAIL_LISTS_KEPT:]
+    return list_id
+
+def email_list_ids(list_id):
+    """Message ids of a remembered list, or None if it is unknown or has been dropped"""
+    if not has_request_context():
+        return None
+    with _email_lists_lock:
+        return next((ids for entry_id, ids in session.get("email_lists", []) if entry_id == list_id), None)
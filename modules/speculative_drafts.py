@@ -0,0 +1,109 @@
+# modules/speculative_drafts.py
+
+import os
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+SPECULATIVE_DRAFTS_ENABLED = os.getenv("SPECULATIVE_DRAFTS_ENABLED", "0") == "1"
+SPECULATIVE_MAX_JOBS = int(os.getenv("SPECULATIVE_MAX_JOBS", "2"))
+SPECULATIVE_CACHE_SIZE = int(os.getenv("SPECULATIVE_CACHE_SIZE", "64"))
+SPECULATIVE_TTL_SECONDS = float(os.getenv("SPECULATIVE_TTL_SECONDS", "900"))
+SPECULATIVE_WAIT_SECONDS = float(os.getenv("SPECULATIVE_WAIT_SECONDS", "10"))  # how long a reply waits on an in-flight job
+
+logger = logging.getLogger(__name__)
+
+# What is left of "reply to this email please" once the filler is removed: nothing specific
+GENERIC_REPLY_FILLER = re.compile(
+    r"\b(reply|respond|answer|write|draft|send|a|an|to|this|that|the|it|him|her|them|email|mail|message|"
+    r"please|pls|back|now|quick|quickly|for|me)\b|[^\w\s]",
+    re.IGNORECASE
+)
+
+def is_generic_reply_instruction(context):
+    """True when the reply request carries no instructions beyond "reply" itself"""
+    return not GENERIC_REPLY_FILLER.sub(" ", context or "").strip()
+
+class SpeculativeDrafts:
+    """Reply drafts generated in the background while the user reads an email, keyed by message id"""
+
+    def __init__(self, enabled=SPECULATIVE_DRAFTS_ENABLED, max_jobs=SPECULATIVE_MAX_JOBS,
+                 max_entries=SPECULATIVE_CACHE_SIZE, ttl_seconds=SPECULATIVE_TTL_SECONDS):
+        self.enabled = enabled
+        self.max_jobs = max_jobs
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # message_id -> {"future": Future, "created": float}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_jobs), thread_name_prefix="speculative-draft")
+        self.metrics = {"scheduled": 0, "skipped_busy": 0, "hits": 0, "pending_hits": 0, "misses": 0, "refined": 0, "failed": 0}
+
+    def _in_flight(self):
+        return sum(1 for entry in self._entries.values() if not entry["future"].done())
+
+    def schedule(self, message_id, generate_fn):
+        """Start generate_fn() for message_id unless disabled, already cached, or at the job cap"""
+        if not self.enabled or not message_id:
+            return False
+        with self._lock:
+            entry = self._entries.get(message_id)
+            if entry and time.time() - entry["created"] < self.ttl_seconds:
+                return False
+            if self._in_flight() >= self.max_jobs:
+                # Speculation is best effort: never queue behind real work
+                self.metrics["skipped_busy"] += 1
+                return False
+            self._entries[message_id] = {"future": self._executor.submit(generate_fn), "created": time.time()}
+            self._entries.move_to_end(message_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.metrics["scheduled"] += 1
+        logger.debug("Speculative reply draft scheduled for %s", message_id)
+        return True
+
+    def take(self, message_id, wait_seconds=SPECULATIVE_WAIT_SECONDS):
+        """Return the pre-generated draft for message_id (waiting briefly on an in-flight job) or None"""
+        if not self.enabled or not message_id:
+            return None
+        with self._lock:
+            entry = self._entries.pop(message_id, None)
+            if entry is None or time.time() - entry["created"] >= self.ttl_seconds:
+                self.metrics["misses"] += 1
+                return None
+            future = entry["future"]
+            pending = not future.done()
+        try:
+            content = future.result(timeout=wait_seconds if pending else 0)
+        except FutureTimeout:
+            with self._lock:
+                self.metrics["misses"] += 1
+            return None
+        except Exception as e:
+            logger.warning("Speculative reply draft for %s failed: %s", message_id, e)
+            with self._lock:
+                self.metrics["failed"] += 1
+                self.metrics["misses"] += 1
+            return None
+        with self._lock:
+            self.metrics["pending_hits" if pending else "hits"] += 1
+        return content
+
+    def record_refined(self):
+        with self._lock:
+            self.metrics["refined"] += 1
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self.metrics)
+            metrics["cached"] = len(self._entries)
+            metrics["in_flight"] = self._in_flight()
+        served = metrics["hits"] + metrics["pending_hits"]
+        lookups = served + metrics["misses"]
+        metrics["enabled"] = self.enabled
+        metrics["hit_rate"] = round(served / lookups, 3) if lookups else None
+        return metrics
+
+speculative_drafts = SpeculativeDrafts()
@@ -0,0 +1,215 @@
+# modules/temporal_parser.py
+
+import os
+import re
+import logging
+from functools import lru_cache
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+
+TEMPORAL_CACHE_SIZE = int(os.getenv("TEMPORAL_CACHE_SIZE", "1024"))
+DATEPARSER_LANGUAGES = ["en"]
+
+logger = logging.getLogger(__name__)
+
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4,
+    "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8,
+    "september": 9, "sept": 9, "sep": 9, "october": 10, "oct": 10, "november": 11, "nov": 11,
+    "december": 12, "dec": 12,
+}
+WEEKDAYS = {
+    "monday": 0, "mon": 0, "tuesday": 1, "tue": 1, "tues": 1, "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thur": 3, "thurs": 3, "friday": 4, "fri": 4,
+    "saturday": 5, "sat": 5, "sunday": 6, "sun": 6,
+}
+RELATIVE_DAYS = {"yesterday": -1, "today": 0, "tomorrow": 1, "day after tomorrow": 2, "the day after tomorrow": 2}
+
+_MONTH_NAMES = "|".join(sorted(MONTHS, key=len, reverse=True))
+_WEEKDAY_NAMES = "|".join(sorted(WEEKDAYS, key=len, reverse=True))
+
+# Compiled once: these run on every calendar/email prompt
+TIME_PATTERN = re.compile(
+    r"(?:\bat\s+)?(?:"
+    r"\b(?P<h>\d{1,2})(?::(?P<m>[0-5]\d))?\s*(?P<ampm>am|pm)\b"
+    r"|\b(?P<h24>[01]?\d|2[0-3]):(?P<m24>[0-5]\d)\b"
+    r"|\b(?P<word>noon|midnight)\b)"
+)
+RELATIVE_PATTERN = re.compile(r"^(?P<rel>the day after tomorrow|day after tomorrow|yesterday|today|tomorrow)$")
+WEEKDAY_PATTERN = re.compile(rf"^(?:(?P<mod>this|next|coming)\s+)?(?P<wd>{_WEEKDAY_NAMES})$")
+ISO_DATE_PATTERN = re.compile(r"^(?P<y>\d{4})-(?P<mo>\d{1,2})-(?P<d>\d{1,2})$")
+DAY_MONTH_PATTERN = re.compile(
+    rf"^(?P<d>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<mon>{_MONTH_NAMES})\.?(?:,?\s+(?P<y>\d{{4}}))?$"
+)
+MONTH_DAY_PATTERN = re.compile(
+    rf"^(?P<mon>{_MONTH_NAMES})\.?\s+(?P<d>\d{{1,2}})(?:st|nd|rd|th)?(?:,?\s+(?P<y>\d{{4}}))?$"
+)
+FILLER_PATTERN = re.compile(r"^(?:on|at|for|by)\s+|\s+(?:on|at)$|[,.!?]+$")
+
+def _reference(relative_base):
+    return (relative_base or datetime.now()).replace(second=0, microsecond=0)
+
+def _parse_time(match):
+    if match.group("word"):
+        return (12, 0) if match.group("word") == "noon" else (0, 0)
+    if match.group("h24"):
+        return int(match.group("h24")), int(match.group("m24"))
+    hour, minute = int(match.group("h")), int(match.group("m") or 0)
+    if not 1 <= hour <= 12:
+        return None
+    if match.group("ampm") == "pm" and hour != 12:
+        hour += 12
+    elif match.group("ampm") == "am" and hour == 12:
+        hour = 0
+    return hour, minute
+
+def _weekday_offset(modifier, weekday, base, prefer_future, time_of_day):
+    """
+    Days from base to the named weekday, or None to leave the phrase to dateparser.
+
+    A bare weekday follows dateparser: the next one when preferring the future (a week ahead if it
+    is today), otherwise the most recent one. dateparser cannot parse "this/next <weekday>", and the
+    calendar has always resolved those itself: "next" is the following week, "this" the current
+    one, rolled a week forward once that time has passed.
+    """
+    days_ahead = (weekday - base.weekday()) % 7
+    if not modifier:
+        if prefer_future:
+            return days_ahead or 7
+        return days_ahead - 7 if days_ahead else 0
+    if time_of_day is None:
+        return None  # unparsed, as before, so the calendar applies its default time
+    if modifier == "next":
+        return days_ahead + 7 if days_ahead else 7
+    if prefer_future and days_ahead == 0 and time_of_day <= (base.hour, base.minute):
+        return 7
+    return days_ahead
+
+def _parse_date(text, base, prefer_future, time_of_day=None):
+    """Return (date, is_relative) for the supported date forms, or None"""
+    match = RELATIVE_PATTERN.match(text)
+    if match:
+        return (base + timedelta(days=RELATIVE_DAYS[match.group("rel")])).date(), True
+
+    match = WEEKDAY_PATTERN.match(text)
+    if match:
+        days_ahead = _weekday_offset(match.group("mod"), WEEKDAYS[match.group("wd")], base, prefer_future, time_of_day)
+        if days_ahead is None:
+            return None
+        return (base + timedelta(days=days_ahead)).date(), False
+
+    match = ISO_DATE_PATTERN.match(text)
+    if match:
+        return datetime(int(match.group("y")), int(match.group("mo")), int(match.group("d"))).date(), False
+
+    match = DAY_MONTH_PATTERN.match(text) or MONTH_DAY_PATTERN.match(text)
+    if match:
+        month, day = MONTHS[match.group("mon")], int(match.group("d"))
+        year = int(match.group("y")) if match.group("y") else base.year
+        parsed = datetime(year, month, day).date()
+        if prefer_future and not match.group("y") and parsed < base.date():
+            parsed = parsed.replace(year=year + 1)
+        return parsed, False
+
+    return None
+
+def _fast_parse(text, base, prefer_future):
+    """Precompiled-pattern parser for the forms our prompts use; None means "not handled"."""
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+
+    time_of_day = None
+    time_match = TIME_PATTERN.search(text)
+    if time_match:
+        time_of_day = _parse_time(time_match)
+        if time_of_day is None:
+            return None
+        text = (text[:time_match.start()] + " " + text[time_match.end():]).strip()
+        text = FILLER_PATTERN.sub("", re.sub(r"\s+", " ", text)).strip()
+
+    if not text:
+        # Time only: today at that time, like dateparser
+        hour, minute = time_of_day
+        return base.replace(hour=hour, minute=minute)
+
+    try:
+        parsed = _parse_date(text, base, prefer_future, time_of_day)
+    except ValueError:
+        return None  # e.g. 31 February
+    if parsed is None:
+        return None
+    day, is_relative = parsed
+    if time_of_day:
+        hour, minute = time_of_day
+    elif is_relative:
+        hour, minute = base.hour, base.minute  # "tomorrow" keeps the current time, as dateparser does
+    else:
+        hour, minute = 0, 0
+    return datetime(day.year, day.month, day.day, hour, minute)
+
+def _settings(base, prefer_future):
+    settings = {"RELATIVE_BASE": base}
+    if prefer_future:
+        settings["PREFER_DATES_FROM"] = "future"
+    return settings
+
+@lru_cache(maxsize=TEMPORAL_CACHE_SIZE)
+def _dateparser_parse(text, prefer_future, base):
+    import dateparser
+    return dateparser.parse(text, languages=DATEPARSER_LANGUAGES, settings=_settings(base, prefer_future))
+
+@lru_cache(maxsize=TEMPORAL_CACHE_SIZE)
+def _dateparser_search(text, prefer_future, base):
+    from dateparser.search import search_dates
+    return tuple(search_dates(text, languages=DATEPARSER_LANGUAGES, settings=_settings(base, prefer_future)) or ())
+
+def normalize_text(text):
+    text = re.sub(r"\s+", " ", (text or "").strip().lower())
+    return FILLER_PATTERN.sub("", text).strip()
+
+def parse_datetime(text, prefer_future=False, relative_base=None):
+    """
+    Replacement for dateparser.parse: common forms are handled by precompiled patterns, anything
+    else goes to an English-only dateparser behind an LRU keyed on (text, reference minute).
+    "this/next <weekday> at <time>", which dateparser cannot parse, resolves the way the calendar
+    fallback always resolved it.
+    """
+    normalized = normalize_text(text)
+    if not normalized:
+        return None
+    base = _reference(relative_base)
+    result = _fast_parse(normalized, base, prefer_future)
+    if result is not None:
+        return result
+    try:
+        return _dateparser_parse(normalized, prefer_future, base)
+    except Exception as e:
+        logger.debug("dateparser failed for %r: %s", normalized, e)
+        return None
+
+def search_datetimes(text, prefer_future=False, relative_base=None):
+    """Cached dateparser.search.search_dates (English only); returns a new list of (phrase, datetime)"""
+    if not text or not text.strip():
+        return []
+    try:
+        return list(_dateparser_search(text, prefer_future, _reference(relative_base)))
+    except Exception as e:
+        logger.debug("search_dates failed for %r: %s", text, e)
+        return []
+
+def parse_email_date(value):
+    """Parse an RFC 2822 Date header into a naive local datetime comparable with parse_datetime results"""
+    if not value:
+        return None
+    try:
+        dt = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        dt = parse_datetime(value)
+    if dt is not None and dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt
+
+def cache_info():
+    return {"parse": _dateparser_parse.cache_info()._asdict(), "search": _dateparser_search.cache_info()._asdict()}
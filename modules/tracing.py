@@ -0,0 +1,93 @@
+# modules/tracing.py
+
+import time
+import threading
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Seconds; covers in-memory routing (ms) up to slow LLM calls (tens of seconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRIC_NAME = "knowledge_worker_stage_latency_seconds"
+
+_request_spans = ContextVar("request_spans", default=None)
+
+class Histogram:
+    """Cumulative latency histogram per stage, exported in Prometheus text format"""
+
+    def __init__(self, name, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.buckets = buckets
+        self._series = {}  # stage -> {"counts": [...], "sum": float, "count": int}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            series = self._series.get(stage)
+            if series is None:
+                series = self._series[stage] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += seconds
+            series["count"] += 1
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} Latency of request stages (routing, memory, tools, LLM, formatting).",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self._lock:
+            for stage in sorted(self._series):
+                series = self._series[stage]
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f'{self.name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{stage="{stage}",le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{stage="{stage}"}} {series["sum"]:.6f}')
+                lines.append(f'{self.name}_count{{stage="{stage}"}} {series["count"]}')
+        return "\n".join(lines) + "\n"
+
+stage_latency = Histogram(METRIC_NAME)
+
+def start_request_trace():
+    """Begin collecting spans for the current request (used for the Server-Timing header)"""
+    spans = []
+    _request_spans.set(spans)
+    return spans
+
+def get_request_spans():
+    return _request_spans.get() or []
+
+@contextmanager
+def span(stage):
+    """Time a block, record it in the histogram and in the current request's spans"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_latency.observe(stage, elapsed)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+def traced(stage):
+    """Decorator form of span()"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def server_timing_header(spans):
+    """Aggregate spans by stage into a Server-Timing header value (durations in ms)"""
+    totals = {}
+    for stage, elapsed in spans:
+        totals[stage] = totals.get(stage, 0.0) + elapsed
+    # Server-Timing metric names are tokens: no dots or spaces
+    return ", ".join(f"{stage.replace('.', '-')};dur={elapsed * 1000:.1f}" for stage, elapsed in totals.items())
+
+def render_metrics():
+    return stage_latency.render()
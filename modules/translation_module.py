@@ -0,0 +1,244 @@
+# modules/translation_module.py
+
+import os
+import re
+import hashlib
+import logging
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "256"))
+TRANSLATION_CHUNK_CHARS = int(os.getenv("TRANSLATION_CHUNK_CHARS", "2500"))
+TRANSLATION_MAX_WORKERS = int(os.getenv("TRANSLATION_MAX_WORKERS", "4"))
+TRANSLATION_BATCH_CONCURRENCY = int(os.getenv("TRANSLATION_BATCH_CONCURRENCY", "3"))
+TRANSLATION_BATCH_MAX_EMAILS = int(os.getenv("TRANSLATION_BATCH_MAX_EMAILS", "20"))
+TRANSLATION_MAX_JOBS = 64
+
+logger = logging.getLogger(__name__)
+
+# Languages identified by their script alone
+SCRIPT_RANGES = {
+    "hindi": re.compile(r"[ऀ-ॿ]"),
+    "arabic": re.compile(r"[؀-ۿ]"),
+    "russian": re.compile(r"[Ѐ-ӿ]"),
+    "greek": re.compile(r"[Ͱ-Ͽ]"),
+    "hebrew": re.compile(r"[֐-׿]"),
+    "thai": re.compile(r"[฀-๿]"),
+    "korean": re.compile(r"[가-힯]"),
+    "japanese": re.compile(r"[぀-ヿ]"),
+    "chinese": re.compile(r"[一-鿿]"),
+    "bengali": re.compile(r"[ঀ-৿]"),
+    "tamil": re.compile(r"[஀-௿]"),
+}
+
+# Latin-script languages told apart by their most frequent function words
+STOPWORDS = {
+    "english": {"the", "and", "is", "are", "to", "of", "you", "for", "with", "this", "that", "have", "your", "be", "on"},
+    "spanish": {"el", "la", "los", "las", "y", "es", "de", "que", "en", "por", "para", "con", "una", "su", "del"},
+    "french": {"le", "la", "les", "et", "est", "des", "que", "pour", "dans", "vous", "une", "avec", "sur", "du", "pas"},
+    "german": {"der", "die", "das", "und", "ist", "nicht", "mit", "sie", "ein", "eine", "zu", "auf", "für", "den", "ich"},
+    "italian": {"il", "la", "di", "che", "e", "è", "per", "con", "una", "non", "sono", "del", "della", "gli", "le"},
+    "portuguese": {"o", "a", "os", "as", "e", "de", "que", "em", "para", "com", "não", "uma", "do", "da", "você"},
+    "dutch": {"de", "het", "een", "en", "is", "van", "dat", "niet", "met", "voor", "op", "je", "zijn", "ik", "u"},
+}
+
+LANGUAGE_ALIASES = {
+    "en": "english", "es": "spanish", "fr": "french", "de": "german", "it": "italian",
+    "pt": "portuguese", "nl": "dutch", "hi": "hindi", "ar": "arabic", "ru": "russian",
+    "el": "greek", "he": "hebrew", "th": "thai", "ko": "korean", "ja": "japanese",
+    "zh": "chinese", "bn": "bengali", "ta": "tamil", "mandarin": "chinese",
+}
+
+WORD_PATTERN = re.compile(r"[^\W\d_]+", re.UNICODE)
+PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+def normalize_language(language):
+    language = (language or "").strip().lower()
+    return LANGUAGE_ALIASES.get(language, language)
+
+def detect_language(text, sample_chars=2000):
+    """Best-effort local language guess; returns None when unsure"""
+    sample = text[:sample_chars]
+    letters = WORD_PATTERN.findall(sample)
+    if not letters:
+        return None
+
+    total_chars = sum(len(w) for w in letters)
+    for language, pattern in SCRIPT_RANGES.items():
+        if len(pattern.findall(sample)) > total_chars * 0.3:
+            return language
+
+    words = [w.lower() for w in letters]
+    if len(words) < 5:
+        return None
+    scores = {language: sum(1 for w in words if w in stopwords) for language, stopwords in STOPWORDS.items()}
+    best = max(scores, key=scores.get)
+    ranked = sorted(scores.values(), reverse=True)
+    # Require a clear winner that covers a meaningful share of the text
+    if ranked[0] < max(3, len(words) * 0.08) or ranked[0] < ranked[1] * 1.5:
+        return None
+    return best
+
+def split_into_chunks(text, max_chars=TRANSLATION_CHUNK_CHARS):
+    """Split on paragraph boundaries into chunks of at most max_chars (long paragraphs by sentence)"""
+    pieces = []
+    for paragraph in PARAGRAPH_SPLIT.split(text):
+        if not paragraph.strip():
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        current = ""
+        for sentence in SENTENCE_SPLIT.split(paragraph):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                pieces.append(current)
+                current = ""
+            current = f"{current} {sentence}" if current else sentence
+        if current:
+            pieces.append(current)
+
+    # Pack small paragraphs together so short emails stay a single request
+    chunks = []
+    for piece in pieces:
+        if chunks and len(chunks[-1]) + len(piece) + 2 <= max_chars:
+            chunks[-1] = f"{chunks[-1]}\n\n{piece}"
+        else:
+            chunks.append(piece)
+    return chunks
+
+class TranslationCache:
+    """LRU of translations keyed by (message id, body hash, target language)"""
+
+    def __init__(self, max_entries=TRANSLATION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(message_id, text, target_language):
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return (message_id or "", digest, normalize_language(target_language))
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+translation_cache = TranslationCache()
+_executor = ThreadPoolExecutor(max_workers=TRANSLATION_MAX_WORKERS, thread_name_prefix="translate")
+
+def translate_text(text, target_language, translate_fn, message_id=None):
+    """
+    Translate text with translate_fn(chunk, target_language), caching the result.
+    Long texts are translated paragraph-chunk by chunk in parallel and reassembled in order.
+    """
+    if not text or not text.strip():
+        return text
+
+    key = translation_cache.make_key(message_id, text, target_language)
+    cached = translation_cache.get(key)
+    if cached is not None:
+        logger.debug("Translation cache hit for message %s (%s)", message_id, target_language)
+        return cached
+
+    if detect_language(text) == normalize_language(target_language):
+        logger.debug("Message %s is already in %s; skipping translation", message_id, target_language)
+        translation_cache.put(key, text)
+        return text
+
+    chunks = split_into_chunks(text)
+    if len(chunks) == 1:
+        translated = translate_fn(chunks[0], target_language).strip()
+    else:
+        logger.debug("Translating message %s in %d chunks", message_id, len(chunks))
+        # map() preserves chunk order and re-raises the first failure
+        translated = "\n\n".join(part.strip() for part in _executor.map(lambda c: translate_fn(c, target_language), chunks))
+
+    translation_cache.put(key, translated)
+    return translated
+
+# Separate pool for whole emails so batch workers never wait on their own chunk pool
+_batch_executor = ThreadPoolExecutor(max_workers=TRANSLATION_BATCH_CONCURRENCY, thread_name_prefix="translate-batch")
+
+def translate_batch(items, target_language, translate_fn):
+    """
+    Translate (message_id, text) items with bounded concurrency.
+    Yields (position, translated_text, error) in completion order.
+    """
+    futures = {
+        _batch_executor.submit(translate_text, text, target_language, translate_fn, message_id): position
+        for position, (message_id, text) in enumerate(items)
+    }
+    for future in as_completed(futures):
+        position = futures[future]
+        try:
+            yield position, future.result(), None
+        except Exception as e:
+            logger.warning("Batch translation of item %d failed: %s", position, e)
+            yield position, None, str(e)
+
+class TranslationJobs:
+    """Background batch translations whose results are picked up incrementally by the web UI"""
+
+    def __init__(self, max_jobs=TRANSLATION_MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, session_key, items, target_language, translate_fn, render_fn):
+        """Run translate_batch in a thread; render_fn(position, translated, error) builds each result"""
+        job_id = uuid.uuid4().hex
+        job = {"session_key": session_key, "total": len(items), "results": [], "done": False}
+        with self._lock:
+            self._jobs[job_id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+        def run():
+            try:
+                for position, translated, error in translate_batch(items, target_language, translate_fn):
+                    result = {"position": position, "html": render_fn(position, translated, error)}
+                    with self._lock:
+                        job["results"].append(result)
+            finally:
+                with self._lock:
+                    job["done"] = True
+
+        threading.Thread(target=run, name=f"translation-job-{job_id[:8]}", daemon=True).start()
+        return job_id
+
+    def poll(self, session_key, job_id, since=0):
+        """Results completed after the first `since`, or None for unknown or foreign jobs"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["session_key"] != session_key:
+                return None
+            return {
+                "results": list(job["results"][since:]),
+                "received": len(job["results"]),
+                "total": job["total"],
+                "done": job["done"],
+            }
+
+translation_jobs = TranslationJobs()
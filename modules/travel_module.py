@@ -1,16 +1,20 @@
 # travel_module.py
 
 import os
+import logging
 import re
 import requests
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from modules.iata_codes import IATA_CODES, get_iata_code
-import dateparser
-from dateparser.search import search_dates
+from modules.tracing import span
+from modules.temporal_parser import parse_datetime, search_datetimes
+from modules.payloads import flight_list_payload
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 RAPIDAPI_KEY = os.getenv("RAPIDAPI_KEY")
 RAPIDAPI_HOST = "google-flights2.p.rapidapi.com"
 
@@ -130,7 +134,7 @@ def format_date(date_str):
     
     # Try using dateparser for complex dates
     try:
-        parsed_date = dateparser.parse(date_str, settings={'PREFER_DATES_FROM': 'future'})
+        parsed_date = parse_datetime(date_str, prefer_future=True)
         if parsed_date:
             return parsed_date.strftime("%Y-%m-%d")
     except:
@@ -171,89 +175,99 @@ def format_date(date_str):
     
     return None
 
-def print_flight_results(data):
-    output = []
-    output.append(f"✈️ <b>FLIGHT SEARCH RESULTS</b><br>")
-    if not data.get("status", True):
-        output.append(f"❌ <b>API Error:</b> {data.get('message', 'Unknown error')}<br>")
-        return "".join(output)
+def _stops(layovers):
+    if not layovers:
+        return "Direct Flight", []
+    if isinstance(layovers, list):
+        stops = [
+            {
+                "city": stop.get("city", "Unknown City"),
+                "airport_code": stop.get("airport_code", ""),
+                "airport_name": stop.get("airport_name", ""),
+                "duration": stop.get("duration_label", ""),
+            }
+            for stop in layovers
+        ]
+        return f"{len(stops)} Stop(s)", stops
+    if isinstance(layovers, int):
+        return f"{layovers} Stop(s)", []
+    return "Layover information unavailable", []
 
+def extract_flights(data):
+    """Reduce the RapidAPI response to the fields the UI shows"""
     itineraries = data.get("data", {}).get("itineraries", {})
     flights = itineraries.get("topFlights") or itineraries.get("flights", [])
-
-    if not flights:
-        output.append("❌ <b>No flights found in the response.</b><br>")
-        return "".join(output)
-
-    output.append(f"<b>Found {len(flights)} flight option(s):</b><br>")
-
-    for i, flight in enumerate(flights, 1):
-        output.append(f"<b>✈️ Flight {i}</b><br>")
-        output.append(f"<b>🛫 Departure:</b> {flight.get('departure_time', 'Unknown')}<br>")
-        output.append(f"<b>🛬 Arrival:</b> {flight.get('arrival_time', 'Unknown')}<br>")
-        duration = flight.get("duration", {})
-        output.append(f"<b>⏱️ Duration:</b> {duration.get('text', 'Unknown')}<br>")
-        for j, segment in enumerate(flight.get("flights", [])):
-            output.append(f"<b>Segment {j+1}:</b><br>")
-            output.append(f"🏷️ <b>Airline:</b> {segment.get('airline', 'Unknown Airline')} {segment.get('flight_number', 'Unknown')}<br>")
-            output.append(f"🛩️ <b>Aircraft:</b> {segment.get('aircraft', 'Unknown Aircraft')}<br>")
-            dep = segment.get('departure_airport', {})
-            arr = segment.get('arrival_airport', {})
-            output.append(f"🏁 <b>From:</b> {dep.get('airport_name', '')} ({dep.get('airport_code', '')}) at {dep.get('time', '')}<br>")
-            output.append(f"🎯 <b>To:</b> {arr.get('airport_name', '')} ({arr.get('airport_code', '')}) at {arr.get('time', '')}<br>")
-            output.append(f"💺 <b>Seat:</b> {segment.get('seat', '')} ({segment.get('legroom', '')})<br>")
+    results = []
+    for flight in flights:
+        segments = []
+        for segment in flight.get("flights", []):
+            dep = segment.get("departure_airport", {})
+            arr = segment.get("arrival_airport", {})
+            segments.append({
+                "airline": segment.get("airline", "Unknown Airline"),
+                "flight_number": segment.get("flight_number", "Unknown"),
+                "aircraft": segment.get("aircraft", "Unknown Aircraft"),
+                "from": {"name": dep.get("airport_name", ""), "code": dep.get("airport_code", ""), "time": dep.get("time", "")},
+                "to": {"name": arr.get("airport_name", ""), "code": arr.get("airport_code", ""), "time": arr.get("time", "")},
+                "seat": segment.get("seat", ""),
+                "legroom": segment.get("legroom", ""),
+            })
         price = flight.get("price") or flight.get("total_price", {})
         if isinstance(price, dict):
-            output.append(f"💰 <b>Price:</b> Rs. {price.get('value', 'N/A')} {price.get('currency', 'INR')}<br>")
-        else:
-            output.append(f"💰 <b>Price:</b> {price}<br>")
-        bags = flight.get("bags", {})
-        output.append(f"🧳 <b>Baggage:</b> {bags.get('carry_on', 0)} carry-on, {bags.get('checked', 0)} checked<br>")
+            price = f"Rs. {price.get('value', 'N/A')} {price.get('currency', 'INR')}"
         carbon = flight.get("carbon_emissions", {})
         co2e = carbon.get("CO2e")
-        if co2e is not None:
-            output.append(f"🌱 <b>Emissions:</b> {co2e / 1000:.0f} kg CO2e ({carbon.get('difference_percent', 0):+d}% vs typical)<br>")
-        if flight.get("delay", {}).get("values") is False:
-            output.append("✅ <b>On-time performance:</b> Good<br>")
-        layovers = flight.get("layovers")
-        if not layovers or (isinstance(layovers, int) and layovers == 0):
-            output.append("✅ <b>Direct Flight</b><br>")
-        elif isinstance(layovers, list) and layovers:
-            output.append(f"🔄 <b>{len(layovers)} Stop(s):</b><br>")
-            for stop in layovers:
-                output.append(f" - {stop.get('city', 'Unknown City')} ({stop.get('airport_code', '')}): {stop.get('airport_name', '')}, {stop.get('duration_label', '')}<br>")
-        elif isinstance(layovers, int):
-            output.append(f"🔄 <b>{layovers} Stop(s)</b><br>")
-        else:
-            output.append("🔄 <b>Layover information unavailable</b><br>")
-        output.append("<hr>")
-    return "".join(output)
+        stops_label, layovers = _stops(flight.get("layovers"))
+        bags = flight.get("bags", {})
+        results.append({
+            "departure_time": flight.get("departure_time", "Unknown"),
+            "arrival_time": flight.get("arrival_time", "Unknown"),
+            "duration": flight.get("duration", {}).get("text", "Unknown"),
+            "segments": segments,
+            "price": str(price),
+            "bags": {"carry_on": bags.get("carry_on", 0), "checked": bags.get("checked", 0)},
+            "co2e_kg": round(co2e / 1000) if co2e is not None else None,
+            "co2e_diff_percent": carbon.get("difference_percent", 0) if co2e is not None else None,
+            "on_time": flight.get("delay", {}).get("values") is False,
+            "stops_label": stops_label,
+            "layovers": layovers,
+        })
+    return results
+
+def build_flight_results(data):
+    """Flight list payload for the UI, or an error message"""
+    if not data.get("status", True):
+        return f"❌ <b>API Error:</b> {data.get('message', 'Unknown error')}<br>"
+    flights = extract_flights(data)
+    if not flights:
+        return "❌ <b>No flights found in the response.</b><br>"
+    return flight_list_payload(flights, title=f"✈️ Flight Search Results ({len(flights)} option(s))")
 
 def get_flight_info(user_input):
     """
     Enhanced flight search with better error handling and debugging
     """
-    print(f"🔍 DEBUG: Processing input: '{user_input}'")
+    logger.debug("Processing input: '%s'", user_input)
     
     # Preprocess relative dates
     processed_input = preprocess_relative_dates(user_input)
-    print(f"🔍 DEBUG: After date preprocessing: '{processed_input}'")
+    logger.debug("After date preprocessing: '%s'", processed_input)
 
     origin_city, destination_city, date_str = extract_flight_details(processed_input)
-    print(f"🔍 DEBUG: Extracted - Origin: '{origin_city}', Destination: '{destination_city}', Date: '{date_str}'")
+    logger.debug("Extracted - Origin: '%s', Destination: '%s', Date: '%s'", origin_city, destination_city, date_str)
 
     if not origin_city or not destination_city:
         return f"❌ <b>Could not extract city names from:</b> '{user_input}'<br>Detected: Origin='{origin_city}', Destination='{destination_city}'<br>"
 
     departure_id = get_iata_code(origin_city)
     arrival_id = get_iata_code(destination_city)
-    print(f"🔍 DEBUG: IATA codes - Origin: '{departure_id}', Destination: '{arrival_id}'")
+    logger.debug("IATA codes - Origin: '%s', Destination: '%s'", departure_id, arrival_id)
 
     if not departure_id or not arrival_id:
         return f"❌ <b>Could not resolve IATA codes for:</b> '{origin_city}' → '{departure_id}', '{destination_city}' → '{arrival_id}'<br>"
 
     outbound_date = format_date(date_str or "")
-    print(f"🔍 DEBUG: Formatted date: '{outbound_date}' from '{date_str}'")
+    logger.debug("Formatted date: '%s' from '%s'", outbound_date, date_str)
     
     if not outbound_date:
         return f"❌ <b>Invalid or missing date:</b> '{date_str}'<br>Please use formats like: '30 August', 'tomorrow', '2025-08-30'<br>"
@@ -272,11 +286,13 @@ def get_flight_info(user_input):
 
     try:
         url = f"https://{RAPIDAPI_HOST}/api/v1/searchFlights"
-        print(f"🔍 DEBUG: Making API call with params: {querystring}")
-        response = requests.get(url, headers=HEADERS, params=querystring)
-        response.raise_for_status()
-        data = response.json()
-        return print_flight_results(data)
+        logger.debug("Making API call with params: %s", querystring)
+        with span("rapidapi.search_flights"):
+            response = requests.get(url, headers=HEADERS, params=querystring)
+            response.raise_for_status()
+            data = response.json()
+        with span("format"):
+            return build_flight_results(data)
     except Exception as e:
         return f"❌ <b>API flight search failed:</b> {str(e)}<br>"
 
@@ -286,7 +302,7 @@ def preprocess_relative_dates(text):
     """
     # Use dateparser search to find all date phrases
     try:
-        result = search_dates(text, settings={'PREFER_DATES_FROM': 'future'})
+        result = search_datetimes(text, prefer_future=True)
         if result:
             # Sort by length (longest first) to avoid partial replacements
             result.sort(key=lambda x: len(x[0]), reverse=True)
@@ -0,0 +1,16 @@
+import os
+import sys
+
+# Keep the outbox out of the working tree; it is created when modules.email_module is imported
+os.environ.setdefault("OUTBOX_DB", ":memory:")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from flask import Flask
+
+@pytest.fixture
+def request_context():
+    app = Flask(__name__)
+    app.secret_key = "test"
+    with app.test_request_context("/"):
+        yield
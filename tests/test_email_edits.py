@@ -0,0 +1,44 @@
+import modules.email_module as email_module
+from modules.prompt_compaction import apply_edit_reply
+
+DRAFT = "Hi team,\n\nThe review is on Monday at 3pm.\nPlease bring your notes.\n\nBest regards,\nRMM"
+
+
+def _block(find, replacement):
+    return f"<<<FIND\n{find}\n===\n{replacement}\n>>>"
+
+
+def test_edit_blocks_are_applied_in_place():
+    reply = _block("on Monday at 3pm.", "on Tuesday at 4pm.") + "\n" + _block("Please bring your notes.", "")
+    assert apply_edit_reply(DRAFT, reply) == "Hi team,\n\nThe review is on Tuesday at 4pm.\n\n\nBest regards,\nRMM"
+
+
+def test_find_text_tolerates_reflowed_whitespace():
+    assert "Friday" in apply_edit_reply(DRAFT, _block("The review is on\nMonday", "The review is on Friday"))
+
+
+def test_unmatched_find_or_unknown_reply_does_not_apply():
+    assert apply_edit_reply(DRAFT, _block("on Sunday", "on Tuesday")) is None
+    assert apply_edit_reply(DRAFT, "Sure, I moved it to Tuesday.") is None
+
+
+def test_rewrite_replaces_the_whole_body():
+    assert apply_edit_reply(DRAFT, "REWRITE\nHello all,\nCancelled.") == "Hello all,\nCancelled."
+    assert apply_edit_reply(DRAFT, "REWRITE:") is None
+
+
+def test_rewritten_edit_gets_the_same_cleanup_as_a_full_draft(monkeypatch):
+    monkeypatch.setattr(email_module, "chat_completion",
+                        lambda *args, **kwargs: "REWRITE\nHere is the updated email: Hi team,\n\nThe review is cancelled.")
+    content = email_module.generate_smart_email_content(
+        "team@example.com", "Review", "cancel the review", previous_content=DRAFT, is_edit=True)
+    assert content == "Hi team,\n\nThe review is cancelled.\n\nBest regards,\nRMM"
+
+
+def test_unmatched_edit_falls_back_to_a_full_rewrite(monkeypatch):
+    replies = [_block("on Sunday", "on Tuesday"), "Hi team,\n\nThe review moved to Tuesday.\n\nBest regards,\nRMM"]
+    monkeypatch.setattr(email_module, "chat_completion", lambda *args, **kwargs: replies.pop(0))
+    content = email_module.generate_smart_email_content(
+        "team@example.com", "Review", "move it to Tuesday", previous_content=DRAFT, is_edit=True)
+    assert content == "Hi team,\n\nThe review moved to Tuesday.\n\nBest regards,\nRMM"
+    assert replies == []
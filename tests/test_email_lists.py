@@ -0,0 +1,50 @@
+import pytest
+import modules.groq as groq
+import modules.hf_agent as hf_agent
+
+INBOX = [{"id": f"inbox-{i}", "sender": "a@example.com", "subject": f"Inbox {i}", "date": "", "snippet": ""} for i in range(1, 4)]
+RESULTS = [{"id": f"hit-{i}", "sender": "hr@example.com", "subject": f"Invoice {i}", "date": "", "snippet": ""} for i in range(1, 4)]
+
+@pytest.fixture(params=[(groq, "GroqAgent"), (hf_agent, "HFAgent")], ids=["groq", "hf"])
+def agent(request, monkeypatch, request_context):
+    module, name = request.param
+    opened = []
+    monkeypatch.setattr(module, "read_emails_by_category", lambda count=5, label="INBOX": {
+        "action": "read_emails", "emails": INBOX[:count], "category": label})
+    monkeypatch.setattr(module, "search_emails", lambda query, **kwargs: {
+        "action": "search_emails", "emails": RESULTS, "query": "about \"invoice\""})
+    monkeypatch.setattr(module, "get_email_details", lambda email_id: opened.append(email_id) or {
+        "action": "email_details", "email": {"id": email_id, "sender": "", "subject": "", "date": "", "body": ""}})
+    instance = getattr(module, name)()
+    instance.opened = opened
+    return instance
+
+def test_read_more_on_search_result_opens_that_result(agent):
+    agent._handle_email_request("search emails for invoice")
+    agent._handle_email_request("email 2 details")
+    assert agent.opened == ["hit-2"]
+
+def test_email_number_without_a_stored_list_counts_from_the_inbox(agent):
+    agent._handle_email_request("email 2 details")
+    assert agent.opened == ["2"]
+
+def test_category_listing_returns_an_email_list_payload(agent):
+    payload = agent.run("show me 5 social mails")
+    assert isinstance(payload, dict)
+    assert payload["type"] == "email_list"
+    assert payload["read_more"] is True
+    assert [email["subject"] for email in payload["emails"]] == ["Inbox 1", "Inbox 2", "Inbox 3"]
+    agent._handle_email_request("email 3 details")
+    assert agent.opened == ["inbox-3"]
+
+def test_lists_shown_together_keep_their_own_read_more_indices(agent):
+    payload = agent.run("show emails and search emails for invoice")
+    assert payload["type"] == "multi"
+    inbox_list, search_list = payload["parts"]
+    assert inbox_list["list_id"] != search_list["list_id"]
+    agent._handle_email_request(f"email 2 details from list {search_list['list_id']}")
+    agent._handle_email_request(f"email 2 details from list {inbox_list['list_id']}")
+    assert agent.opened == ["hit-2", "inbox-2"]
+
+def test_read_more_on_an_expired_list_says_so(agent):
+    assert "expired" in agent._handle_email_request("email 2 details from list 0123abcd")
@@ -0,0 +1,25 @@
+import modules.email_module as email_module
+
+QUERY = {"terms": ["invoice"], "sender": None, "subject": None, "category": None, "after": None, "before": None,
+         "unread": False, "has_attachment": False}
+
+
+def test_next_mirror_page_does_not_restart_on_gmail(monkeypatch):
+    gmail_calls = []
+    monkeypatch.setattr(email_module.mail_mirror, "search", lambda *args, **kwargs: None)
+    monkeypatch.setattr(email_module, "query_gmail", lambda *args, **kwargs: gmail_calls.append(kwargs) or ([], None))
+
+    result = email_module.search_emails(QUERY, offset=10)
+
+    assert "Please search again" in result["error"]
+    assert gmail_calls == []
+
+
+def test_first_page_falls_back_to_gmail_when_mirror_declines(monkeypatch):
+    monkeypatch.setattr(email_module.mail_mirror, "search", lambda *args, **kwargs: None)
+    monkeypatch.setattr(email_module, "query_gmail", lambda *args, **kwargs: ([{"id": "g1"}], "token-2"))
+
+    result = email_module.search_emails(QUERY)
+
+    assert result["source"] == "gmail"
+    assert result["next_page_token"] == "token-2"
@@ -0,0 +1,43 @@
+import threading
+import time
+from modules.intent_planner import execute_plan, is_mutating
+
+def test_read_only_steps_run_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+
+    def execute(step):
+        barrier.wait()  # only returns if both steps are running at the same time
+        return step
+
+    assert execute_plan(["show my events", "show emails"], execute) == ["show my events", "show emails"]
+
+def test_mutating_step_runs_after_earlier_reads_and_before_later_ones():
+    log = []
+
+    def execute(step):
+        log.append(("start", step))
+        time.sleep(0.05)
+        log.append(("end", step))
+        return step
+
+    steps = ["list my events", "delete all events", "show my events"]
+    assert execute_plan(steps, execute) == steps
+    assert log.index(("end", "list my events")) < log.index(("start", "delete all events"))
+    assert log.index(("end", "delete all events")) < log.index(("start", "show my events"))
+
+def test_writes_are_classified_as_mutating():
+    assert is_mutating("create a meeting tomorrow at 3pm")
+    assert is_mutating("delete all events")
+    assert is_mutating("reply to the last email")
+    assert not is_mutating("show my events")
+    assert not is_mutating("search emails for invoice")
+
+def test_failed_step_does_not_hide_the_others():
+    def execute(step):
+        if step == "delete all events":
+            raise RuntimeError("boom")
+        return step
+
+    results = execute_plan(["show my events", "delete all events"], execute)
+    assert results[0] == "show my events"
+    assert results[1].startswith("❌")
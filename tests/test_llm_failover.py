@@ -0,0 +1,49 @@
+import time
+import threading
+import pytest
+import modules.llm_client as llm_client
+from modules.llm_failover import FailoverClient
+from modules.llm_scheduler import LLMScheduler, SchedulerTimeout, RequestCancelled
+
+def test_recorded_latency_excludes_scheduler_queueing(monkeypatch):
+    def queued_run(provider, fn, **kwargs):
+        time.sleep(0.3)  # waiting for the token bucket
+        return fn()
+
+    monkeypatch.setattr(llm_client.llm_scheduler, "run", queued_run)
+    monkeypatch.setitem(llm_client.PROVIDER_CALLS, "groq", lambda model, messages, **kwargs: ("hi", 10))
+    client = FailoverClient()
+    assert client._call("groq", "model", [{"role": "user", "content": "hi"}], None, None, 0, "test", None) == "hi"
+    assert list(client.stats["groq"].latencies) and client.stats["groq"].latencies[0] < 0.1
+
+def test_scheduler_timeout_does_not_count_against_provider_health(monkeypatch):
+    def timed_out(provider, fn, **kwargs):
+        raise SchedulerTimeout("waited too long")
+
+    monkeypatch.setattr(llm_client.llm_scheduler, "run", timed_out)
+    client = FailoverClient()
+    for _ in range(5):
+        with pytest.raises(SchedulerTimeout):
+            client._call("groq", "model", [{"role": "user", "content": "hi"}], None, None, 0, "test", None)
+    stats = client.stats["groq"]
+    assert (stats.health, stats.failures, stats.requests) == (1.0, 0, 0)
+    assert stats.available(time.time())
+
+def test_cancelled_request_leaves_the_queue_without_using_quota():
+    scheduler = LLMScheduler({"groq": {"rpm": 60, "tpm": 100000, "concurrency": 1}})
+    scheduler._pause("groq", 5)  # nothing is admitted for a while
+    cancel = threading.Event()
+    threading.Timer(0.2, cancel.set).start()
+    started = time.monotonic()
+    with pytest.raises(RequestCancelled):
+        scheduler.run("groq", lambda: "never", session_key="s", cancel_event=cancel, max_wait=5)
+    assert time.monotonic() - started < 1
+    assert scheduler.stats["admitted"] == 0
+    assert scheduler.snapshot()["queued"]["groq"] == 0
+
+def test_queue_timeout_reports_the_wait_not_a_full_queue():
+    scheduler = LLMScheduler({"groq": {"rpm": 60, "tpm": 100000, "concurrency": 1}})
+    scheduler._pause("groq", 5)
+    with pytest.raises(SchedulerTimeout, match=r"waited 0s for rate-limit capacity") as error:
+        scheduler.run("groq", lambda: "never", session_key="s", max_wait=0.2)
+    assert "full" not in str(error.value)
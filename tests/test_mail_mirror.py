@@ -0,0 +1,63 @@
+import time
+import threading
+
+from modules.mail_mirror import MailMirror
+
+
+def _message(message_id, subject="Invoice", labels=("INBOX",)):
+    return {
+        "id": message_id, "threadId": message_id, "internalDate": "1", "snippet": subject,
+        "labelIds": list(labels),
+        "payload": {"headers": [{"name": "From", "value": "a@example.com"}, {"name": "Subject", "value": subject}]},
+    }
+
+
+def _fresh_mirror(messages):
+    mirror = MailMirror(db_path=":memory:", backfill=100000)
+    mirror._store(messages)
+    with mirror._lock:
+        mirror._set_state("last_synced", time.time())
+        mirror._db.commit()
+    return mirror
+
+
+def test_replace_all_drops_gone_messages_and_keeps_bodies():
+    mirror = _fresh_mirror([_message("a"), _message("b")])
+    mirror.store_body("a", "full body of a")
+
+    mirror._replace_all([_message("a"), _message("c")])
+
+    assert {m["id"] for m in mirror.list_messages("INBOX", 10)} == {"a", "c"}
+    assert mirror.get_message("a")["body"] == "full body of a"
+    assert mirror.get_message("b") is None
+    assert [m["id"] for m in mirror.search(terms=["body"])] == ["a"]
+
+
+def test_readers_never_see_an_empty_mirror_during_resync():
+    old = [_message(f"old{i}") for i in range(200)]
+    mirror = _fresh_mirror(old)
+    new = [_message(f"new{i}") for i in range(2000)]
+    seen, done = [], threading.Event()
+
+    def read():
+        while not done.is_set():
+            seen.append(len(mirror.list_messages("INBOX", 5000)))
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    for _ in range(5):
+        mirror._replace_all(new)
+        mirror._replace_all(old)
+    done.set()
+    reader.join()
+
+    assert seen and set(seen) <= {200, 2000}
+
+
+def test_search_leaves_out_spam_and_trash_unless_asked():
+    mirror = _fresh_mirror([_message("inbox"), _message("spam", labels=("SPAM",)),
+                            _message("trash", labels=("TRASH",))])
+
+    assert [m["id"] for m in mirror.search(terms=["invoice"])] == ["inbox"]
+    assert [m["id"] for m in mirror.search()] == ["inbox"]
+    assert [m["id"] for m in mirror.search(terms=["invoice"], labels=["TRASH"])] == ["trash"]
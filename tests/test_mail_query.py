@@ -0,0 +1,24 @@
+from datetime import datetime
+
+from modules.mail_query import parse_mail_query, to_gmail_query
+
+NOW = datetime(2026, 10, 19, 12, 0)
+
+
+def test_preposition_before_a_date_is_not_a_search_term():
+    query = parse_mail_query("emails about the budget from last month", NOW)
+
+    assert query["terms"] == ["budget"]
+    assert query["sender"] is None
+    assert (query["after"], query["before"]) == (datetime(2026, 9, 1), datetime(2026, 10, 1))
+    assert to_gmail_query(query) == (
+        f"budget after:{int(datetime(2026, 9, 1).timestamp())} before:{int(datetime(2026, 10, 1).timestamp())}"
+    )
+
+
+def test_sender_is_still_taken_from_from():
+    query = parse_mail_query("find emails from alice about invoices last week", NOW)
+
+    assert query["sender"] == "alice"
+    assert query["terms"] == ["invoices"]
+    assert query["after"] == datetime(2026, 10, 12)
@@ -0,0 +1,44 @@
+import json
+import time
+import pytest
+from modules.model_router import ModelRouter
+
+SMALL, LARGE = "small-model", "large-model"
+TIERS = {"groq": {"small": SMALL, "large": LARGE}}
+
+def test_small_model_failure_escalates_to_the_large_model():
+    router = ModelRouter(tiers=TIERS, log_path=None)
+    calls = []
+
+    def call(model):
+        calls.append(model)
+        if model == SMALL:
+            raise TimeoutError("small model timed out")
+        return "Paris is the capital of France."
+
+    assert router.complete("groq", "what is the capital of france", call) == "Paris is the capital of France."
+    assert calls == [SMALL, LARGE]
+    decision = router.decisions[-1]
+    assert decision["escalated"] and decision["escalation_reason"] == "error"
+    assert "timed out" in decision["small_error"]
+
+def test_large_model_failure_is_raised_and_recorded():
+    router = ModelRouter(tiers=TIERS, log_path=None)
+
+    def call(model):
+        raise RuntimeError(f"{model} down")
+
+    with pytest.raises(RuntimeError, match="large-model down"):
+        router.complete("groq", "what is the capital of france", call)
+    assert router.decisions[-1]["error"] == "large-model down"
+
+def test_routing_log_is_written_in_the_background(tmp_path):
+    log_path = tmp_path / "routing.jsonl"
+    router = ModelRouter(tiers=TIERS, log_path=str(log_path))
+    router.complete("groq", "hello", lambda model: "Hi! How can I help you today?")
+    deadline = time.time() + 5
+    while not log_path.exists() and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+    entries = [json.loads(line) for line in log_path.read_text().splitlines()]
+    assert [entry["model"] for entry in entries] == [SMALL]
@@ -0,0 +1,165 @@
+import time
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+import modules.outbox as outbox_module
+from modules.outbox import Outbox, QUEUED, SENDING, SENT, FAILED, OUTBOX_RETRY_SECONDS
+
+DRAFT = {"to": "bob@example.com", "subject": "Hi", "content": "Hello", "version": 1, "updated_at": "t1"}
+
+
+def _http_error(status):
+    return HttpError(httplib2.Response({"status": status}), b"")
+
+
+class _Call:
+    def __init__(self, fn):
+        self.fn = fn
+
+    def execute(self):
+        return self.fn()
+
+
+class FakeGmail:
+    """Just enough of users().drafts() for the outbox: drafts live here until sent"""
+
+    def __init__(self):
+        self.stored = {}
+        self.sent = []
+        self.send_errors = []
+
+    def users(self):
+        return self
+
+    def drafts(self):
+        return self
+
+    def create(self, userId, body, media_body):
+        def run():
+            draft_id = f"draft-{len(self.stored) + len(self.sent) + 1}"
+            self.stored[draft_id] = media_body
+            return {"id": draft_id, "message": {"id": f"msg-{draft_id}"}}
+        return _Call(run)
+
+    def get(self, userId, id, **kwargs):
+        def run():
+            if id not in self.stored:
+                raise _http_error(404)
+            return {"id": id}
+        return _Call(run)
+
+    def list(self, userId, q, **kwargs):
+        return _Call(lambda: {})
+
+    def send(self, userId, body):
+        def run():
+            self.stored.pop(body["id"])
+            self.sent.append(body["id"])
+            if self.send_errors:
+                raise self.send_errors.pop(0)  # sent, but the reply never arrived
+            return {"id": f"msg-{body['id']}"}
+        return _Call(run)
+
+
+@pytest.fixture
+def gmail(monkeypatch):
+    service = FakeGmail()
+    monkeypatch.setattr(outbox_module.google_services, "get_gmail_service", lambda: service)
+    return service
+
+
+@pytest.fixture
+def box():
+    return Outbox(db_path=":memory:", max_attempts=3)
+
+
+def _make_due(box, entry_id):
+    with box._lock:
+        box._db.execute("UPDATE outbox SET next_attempt_at = 0 WHERE id = ?", (entry_id,))
+        box._db.commit()
+
+
+def test_enqueue_same_draft_twice_gives_one_entry(box):
+    first = box.enqueue("session", DRAFT)
+    second = box.enqueue("session", DRAFT)
+    assert first["id"] == second["id"]
+    assert box.stats()[QUEUED] == 1
+    assert box.enqueue("session", {**DRAFT, "version": 2})["id"] != first["id"]
+
+
+def test_sends_through_a_draft(box, gmail):
+    entry = box.enqueue("session", DRAFT)
+    assert box.process_one()
+    assert gmail.sent == ["draft-1"]
+    assert box.get("session", entry["id"])["status"] == SENT
+    assert box.get("session", entry["id"])["gmail_id"] == "msg-draft-1"
+
+
+def test_retryable_failure_backs_off(box, gmail, monkeypatch):
+    monkeypatch.setattr(outbox_module, "create_draft_file", lambda service, path: (_ for _ in ()).throw(_http_error(503)))
+    entry = box.enqueue("session", DRAFT)
+    before = time.time()
+    box.process_one()
+
+    stored = box._get("id", entry["id"])
+    assert stored["status"] == QUEUED and stored["attempts"] == 1
+    assert stored["next_attempt_at"] >= before + OUTBOX_RETRY_SECONDS
+    assert not box.process_one()  # not due yet
+
+
+def test_gives_up_after_max_attempts_or_permanent_error(box, gmail, monkeypatch):
+    monkeypatch.setattr(outbox_module, "create_draft_file", lambda service, path: (_ for _ in ()).throw(_http_error(503)))
+    entry = box.enqueue("session", DRAFT)
+    for _ in range(3):
+        _make_due(box, entry["id"])
+        box.process_one()
+    assert box.get("session", entry["id"])["status"] == FAILED
+
+    monkeypatch.setattr(outbox_module, "create_draft_file", lambda service, path: (_ for _ in ()).throw(_http_error(400)))
+    other = box.enqueue("session", {**DRAFT, "version": 2})
+    box.process_one()
+    assert box.get("session", other["id"])["status"] == FAILED
+    assert box.get("session", other["id"])["attempts"] == 1
+
+
+def test_retry_after_a_lost_reply_does_not_send_twice(box, gmail):
+    gmail.send_errors.append(TimeoutError("read timed out"))
+    entry = box.enqueue("session", DRAFT)
+    box.process_one()
+    assert box._get("id", entry["id"])["status"] == QUEUED
+
+    _make_due(box, entry["id"])
+    box.process_one()
+    assert gmail.sent == ["draft-1"]
+    assert box.get("session", entry["id"])["status"] == SENT
+
+
+def test_retry_sends_the_stored_draft_when_it_was_not_sent(box, gmail):
+    entry = box.enqueue("session", DRAFT)
+    entry = box._claim()
+    draft_id = gmail.create("me", {}, None).execute()["id"]
+    box._set_draft(entry["id"], draft_id)
+    box._finish(entry["id"], QUEUED, error="timed out", retry_at=0)
+
+    box.process_one()
+    assert gmail.sent == [draft_id]
+    assert len(gmail.stored) == 0
+
+
+def test_lease_blocks_other_senders_and_is_renewed_by_its_holder(box):
+    entry = box.enqueue("session", DRAFT)
+    claimed = box._claim()
+    assert claimed["status"] == SENDING
+    assert box._claim() is None  # leased
+
+    _make_due(box, entry["id"])
+    assert box._renew_lease(claimed)
+    assert box._get("id", entry["id"])["next_attempt_at"] > time.time()
+    assert box._claim() is None
+
+    _make_due(box, entry["id"])
+    taken = box._claim()  # lease ran out: another sender takes over
+    assert taken["attempts"] == 2
+    assert not box._renew_lease(claimed)
@@ -0,0 +1,33 @@
+from datetime import datetime
+import dateparser
+import pytest
+from modules.temporal_parser import parse_datetime
+
+BASE = datetime(2026, 10, 19, 10, 0)  # a Monday
+
+@pytest.mark.parametrize("text, expected", [
+    ("next friday at 3pm", datetime(2026, 10, 30, 15, 0)),
+    ("next monday at 9am", datetime(2026, 10, 26, 9, 0)),
+    ("this monday at 9am", datetime(2026, 10, 26, 9, 0)),  # already past today: next week
+    ("this monday at 11am", datetime(2026, 10, 19, 11, 0)),
+    ("this friday at 3pm", datetime(2026, 10, 23, 15, 0)),
+])
+def test_weekday_with_modifier_matches_the_calendar_fallback(text, expected):
+    assert parse_datetime(text, prefer_future=True, relative_base=BASE) == expected
+
+@pytest.mark.parametrize("text", ["next friday", "this monday"])
+def test_weekday_with_modifier_and_no_time_is_left_unparsed(text):
+    # dateparser returns None here too; the calendar then applies its own default time
+    assert parse_datetime(text, prefer_future=True, relative_base=BASE) is None
+
+@pytest.mark.parametrize("text", [
+    "friday", "monday", "fri", "sat", "friday at 3pm", "monday 9am", "monday at 11am", "sunday 9pm",
+    "tomorrow", "tomorrow at 3pm",
+])
+@pytest.mark.parametrize("prefer_future", [True, False])
+def test_bare_weekdays_match_dateparser(text, prefer_future):
+    settings = {"RELATIVE_BASE": BASE}
+    if prefer_future:
+        settings["PREFER_DATES_FROM"] = "future"
+    expected = dateparser.parse(text, languages=["en"], settings=settings)
+    assert parse_datetime(text, prefer_future=prefer_future, relative_base=BASE) == expected